@@ -0,0 +1,172 @@
+"""
+原始响应存档
+每次抓取到的响应体按SHA-256内容寻址、gzip压缩后保存，内容相同的响应体只保存一份；
+每次抓取在索引文件中追加一行JSON（URL、来源、抓取时间、所属运行的参考时间、状态码、响应头和响应体哈希），
+解析逻辑修改后可以用 scraper.py --reparse 离线重放存档中的响应。
+超过保留期限或总大小上限的运行在运行结束时按最早的运行优先删除（evict）
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+
+ARCHIVE_DIR = os.path.join(".cache", "archive")
+
+# gzip压缩级别，在压缩率和抓取线程中的压缩耗时之间折中
+ARCHIVE_COMPRESS_LEVEL = 6
+
+# 存档的保留期限（秒，按所属运行的参考时间）和压缩后响应体的总大小上限（字节）
+ARCHIVE_TTL = 30 * 24 * 3600
+ARCHIVE_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ResponseArchive:
+    """内容寻址的响应存档，可在多个线程中同时写入"""
+
+    def __init__(self, archive_dir=ARCHIVE_DIR, ttl=ARCHIVE_TTL, max_bytes=ARCHIVE_MAX_BYTES):
+        self.archive_dir = archive_dir
+        self.index_path = os.path.join(archive_dir, "index.jsonl")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {'responses': 0, 'stored': 0, 'deduplicated': 0, 'bytes': 0, 'stored_bytes': 0, 'evicted': 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(archive_dir, "objects"), exist_ok=True)
+
+    def _blob_path(self, digest):
+        return os.path.join(self.archive_dir, "objects", digest[:2], digest + ".gz")
+
+    def add(self, url, source, body, status, headers, run_at, fetched_at=None):
+        """保存一次抓取的响应，返回响应体的哈希"""
+        return self.add_file(url, source, io.BytesIO(body), hashlib.sha256(body).hexdigest(), len(body),
+                             status, headers, run_at, fetched_at)
+
+    def add_file(self, url, source, body_file, digest, size, status, headers, run_at, fetched_at=None):
+        """
+        保存一次抓取的响应，响应体从文件对象的当前位置逐块读出并压缩，digest和size为响应体的SHA-256和字节数
+        返回响应体的哈希
+        """
+        path = self._blob_path(digest)
+        stored = 0
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再改名，多个线程同时保存相同的响应体时结果一致
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=ARCHIVE_COMPRESS_LEVEL, mtime=0) as compressed:
+                    shutil.copyfileobj(body_file, compressed)
+                stored = f.tell()
+            os.replace(temp_path, path)
+
+        entry = {
+            'url': url,
+            'source': source,
+            'fetched_at': round(fetched_at or time.time(), 3),
+            'run_at': run_at,
+            'status': status,
+            'headers': dict(headers),
+            'body': digest,
+            'size': size,
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            self.stats['responses'] += 1
+            self.stats['bytes'] += size
+            if stored:
+                self.stats['stored'] += 1
+                self.stats['stored_bytes'] += stored
+            else:
+                self.stats['deduplicated'] += 1
+        return digest
+
+    def entries(self, source=None, since=None):
+        """按写入顺序逐行读取索引，可按来源和运行时间过滤，不把整个索引读入内存"""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 写入中断留下的不完整行
+                    continue
+                if source is not None and entry['source'] != source:
+                    continue
+                if since is not None and entry['run_at'] < since:
+                    continue
+                yield entry
+
+    def evict(self, now=None):
+        """
+        删除所属运行早于保留期限的索引行；其余响应体压缩后的总大小超过上限时，再从最早的运行开始整次删除
+        （至少保留最近一次运行），然后删除不再被索引引用的响应体。
+        在没有其他线程或进程写入存档时调用（如运行结束时），返回删除的响应体个数
+        """
+        if not os.path.exists(self.index_path):
+            return 0
+        cutoff = (now or time.time()) - self.ttl
+        lines = []
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry['run_at'] >= cutoff:
+                    lines.append((entry, line))
+
+        # 从最近的运行往前累计被引用的响应体大小，超过上限时删除这次运行及更早的运行
+        if lines:
+            latest_run = lines[-1][0]['run_at']
+            counted = set()
+            total = 0
+            for entry, _ in reversed(lines):
+                digest = entry['body']
+                if digest in counted:
+                    continue
+                counted.add(digest)
+                try:
+                    total += os.path.getsize(self._blob_path(digest))
+                except OSError:
+                    continue
+                if total > self.max_bytes:
+                    cutoff = min(entry['run_at'] + 1, latest_run)
+                    lines = [(entry, line) for entry, line in lines if entry['run_at'] >= cutoff]
+                    break
+
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.writelines(line for _, line in lines)
+        os.replace(temp_path, self.index_path)
+
+        referenced = {entry['body'] for entry, _ in lines}
+        removed = 0
+        objects_dir = os.path.join(self.archive_dir, "objects")
+        for prefix in os.listdir(objects_dir):
+            for name in os.listdir(os.path.join(objects_dir, prefix)):
+                if name.endswith(".gz") and name[:-3] not in referenced:
+                    os.remove(os.path.join(objects_dir, prefix, name))
+                    removed += 1
+        self.stats['evicted'] += removed
+        return removed
+
+    def read(self, digest):
+        """读取并解压响应体"""
+        return read_blob(self.archive_dir, digest)
+
+    def summary(self):
+        stats = self.stats
+        return (f"响应存档: 本次 {stats['responses']} 个响应（{stats['bytes']} 字节），"
+                f"新保存 {stats['stored']} 个（压缩后 {stats['stored_bytes']} 字节），"
+                f"与已有内容相同 {stats['deduplicated']} 个，清理过期响应体 {stats['evicted']} 个")
+
+
+def read_blob(archive_dir, digest):
+    """读取存档中的响应体，可在解析进程中直接调用"""
+    with open(os.path.join(archive_dir, "objects", digest[:2], digest + ".gz"), 'rb') as f:
+        return gzip.decompress(f.read())
@@ -0,0 +1,93 @@
+"""
+getList分页采集基准测试
+在本地替身站点上对比不同每页条数和并发页数下完整采集接口的耗时，检查是否采集到列表中的全部记录；
+再模拟两次运行之间新增记录的情况，检查第二次运行是否在遇到已采集过的页后提前结束且结果仍然完整
+
+用法: python benchmarks/bench_api_pages.py [--scale 10] [--latency 0.05] [--page-sizes 50 100 200] [--workers 1 2 4]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import scraper
+import stand_in
+from store import RecordStore
+
+API_PATH = '/api/gameAd/getList'
+
+
+def crawl(api_url, page_size, workers, known=None):
+    """运行一次分页采集，返回记录、耗时和采集结果的统计"""
+    run_metrics = scraper.reset_metrics()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            records = scraper.scrape_api_data(api_url, known=known, page_size=page_size, workers=workers)
+    finally:
+        scraper.close_sessions()
+    elapsed = time.perf_counter() - start
+    requests = sum(1 for url in run_metrics.sources if url.startswith(api_url + '?'))
+    return records, elapsed, requests, run_metrics.sources[api_url]
+
+
+def expected_total(server, scale):
+    return stand_in.BASE_ROWS[API_PATH] * scale + server.api_added
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.05, help="替身站点每个请求的模拟延迟（秒）")
+    parser.add_argument('--page-sizes', type=int, nargs='+', default=[50, 100, 200])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--added', type=int, default=30, help="第二次运行前在列表最前面新增的记录数")
+    args = parser.parse_args()
+
+    server = stand_in.create_server(args.scale, args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _, api_url = stand_in.site_urls(f"http://127.0.0.1:{server.server_port}")
+    # 并发页数同时受每个主机的连接数限制，测试时放开该限制
+    scraper.PER_HOST_LIMIT = max(args.workers)
+
+    total = expected_total(server, args.scale)
+    print(f"完整采集: 列表共 {total} 条，模拟延迟 {args.latency}s")
+    print(f"{'每页条数':>8} {'并发页数':>8} {'请求数':>6} {'记录数':>6} {'耗时(s)':>8} {'完整':>4}")
+    for page_size in args.page_sizes:
+        for workers in args.workers:
+            records, elapsed, requests, _ = crawl(api_url, page_size, workers)
+            complete = len({record.unique_id for record in records}) == total
+            print(f"{page_size:>8} {workers:>8} {requests:>6} {len(records):>6} {elapsed:>8.3f} "
+                  f"{'是' if complete else '否':>4}")
+
+    # 增量采集：第一次完整采集写入存储，新增记录后第二次运行遇到已采集过的页时提前结束
+    page_size, workers = args.page_sizes[0], max(args.workers)
+    with tempfile.TemporaryDirectory(prefix="scraper-bench-") as workdir:
+        store = RecordStore(os.path.join(workdir, "records.db"))
+        try:
+            first, _, _, _ = crawl(api_url, page_size, workers)
+            store.upsert(first, 1)
+            server.api_added += args.added
+            second, elapsed, requests, info = crawl(api_url, page_size, workers, known=store.last_run(scraper.SOURCE_API))
+        finally:
+            store.close()
+    full, _, full_requests, _ = crawl(api_url, page_size, workers)
+    same = [record.unique_id for record in second] == [record.unique_id for record in full]
+    print(f"\n增量采集: 新增 {args.added} 条后列表共 {expected_total(server, args.scale)} 条，每页 {page_size} 条")
+    print(f"  请求数 {requests}（完整采集 {full_requests}），提前结束: {'是' if info['stopped_early'] else '否'}，"
+          f"沿用上次结果 {info['carried']} 条，耗时 {elapsed:.3f}s")
+    print(f"  结果与完整采集{'一致' if same else '不一致'}: {len(second)} 条")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
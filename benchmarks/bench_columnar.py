@@ -0,0 +1,200 @@
+"""
+列式输出的往返检查与基准测试
+1. 往返检查（不一致时退出码为1，GitHub Actions在采集后运行）：
+   - data/ 中每个每行一条记录的文件：读出的记录写成列式文件再读回，记录相同，且按原格式输出与原文件的有效行逐字节相同
+   - data/ 中已有同名列式文件时（采集时生成），其记录与文本文件一致：字段中含制表符或换行的记录在文本文件中
+     是损坏的行，只在列式文件中完整保存，不参与比较
+   - 字段含制表符、换行、空字符串、emoji，时间戳为负数或相同，以及没有记录的文件
+2. 用 data/ 中的记录合成指定倍数的记录，对比文本文件与列式文件的大小，以及读取全部记录、只读取时间戳、
+   查询1小时内开区的记录的耗时
+
+用法: python benchmarks/bench_columnar.py [--data-dir data] [--scales 1 10 100] [--repeat 3]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+from columnar import ColumnarFile, index_path_of, write_columnar
+from output import format_line, iter_lines, write_lines
+from records import SINKS, SOURCE_9PK, SOURCE_API, SOURCE_JJJ, ServerRecord
+from registry import SINK_SOURCES
+
+# 查询的开区时间范围（秒）
+RANGE_SECONDS = 3600
+
+EDGE_RECORDS = [
+    ServerRecord(SOURCE_9PK, "带\t制表符", "http://a.example.com/", "复古", 1760594400, "", "描述\t第二段", "特色"),
+    ServerRecord(SOURCE_JJJ, "带\n换行", "http://b.example.com/", "", 1760594400, "100", "第一行\r\n第二行", ""),
+    ServerRecord(SOURCE_API, "", "", "", 0, "", "", ""),
+    ServerRecord(SOURCE_9PK, "表情🐉", "http://c.example.com:8080/x?y=1", "█单职业█", -3600, "１・７６", "", "𠀀"),
+    ServerRecord(SOURCE_9PK, "沉默", "http://d.example.com/", "1.76", 1760594400, "", "", ""),
+]
+
+
+def has_separator(record):
+    """字段中有制表符或换行，文本文件无法完整保存"""
+    return any(char in value for value in record.to_tuple() if isinstance(value, str) for char in '\t\n\r')
+
+
+def check_round_trip(records, path):
+    """写成列式文件再读回，返回读回的记录是否相同（包括来源）以及时间范围查询是否与逐条过滤相同"""
+    write_columnar(records, path)
+    with ColumnarFile(path) as columnar:
+        same = list(columnar) == records and len(columnar) == len(records)
+        if records:
+            timestamps = sorted(record.timestamp for record in records)
+            start, end = timestamps[len(timestamps) // 2], timestamps[len(timestamps) // 2] + RANGE_SECONDS
+            expected = sorted((record for record in records if start <= record.timestamp <= end),
+                              key=lambda record: record.timestamp)
+            same = same and list(columnar.time_range(start, end)) == expected
+            same = same and list(columnar.time_range()) == sorted(records, key=lambda record: record.timestamp)
+    return same
+
+
+def check_lines_file(lines_path, source, work_dir):
+    """文本文件的记录写成列式文件再读回，按原格式输出与原文件的有效行相同；返回(是否一致, 记录数, 无效行数)"""
+    invalid = []
+    records = list(iter_lines(lines_path, source, invalid))
+    same = check_round_trip(records, os.path.join(work_dir, 'lines.col'))
+    with open(lines_path, 'r', encoding='utf-8') as f:
+        valid_lines = [line for line_number, line in enumerate(f, 1) if line_number not in set(invalid)]
+    with ColumnarFile(os.path.join(work_dir, 'lines.col')) as columnar:
+        same = same and [format_line(record) for record in columnar] == [
+            line if line.endswith('\n') else line + '\n' for line in valid_lines]
+    return same, len(records), len(invalid)
+
+
+def check_stored_columnar(columnar_path, lines_path, source):
+    """
+    采集时生成的列式文件与文本文件一致（文本文件不记录来源，只比较来源以外的字段）
+    返回(是否一致, 列式文件中的记录数, 字段含制表符或换行的记录数)
+    """
+    with ColumnarFile(columnar_path) as columnar:
+        records = list(columnar)
+    complete = [record.to_tuple()[1:] for record in records if not has_separator(record)]
+    lines = [record.to_tuple()[1:] for record in iter_lines(lines_path, source)]
+    return complete == lines, len(records), len(records) - len(complete)
+
+
+def synthesize(records, scale):
+    """把记录复制scale份，第k份的开区时间推后k周，URL加上份号"""
+    week = 7 * 86400
+    return [record if copy == 0 else
+            ServerRecord(record.source, record.server_name, f"{record.server_url}/{copy}", record.server_type,
+                         record.timestamp + copy * week, record.low_consumption, record.description,
+                         record.features)
+            for copy in range(scale) for record in records]
+
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, result
+
+
+def lines_range(path, start, end):
+    return [record for record in iter_lines(path, SOURCE_9PK) if start <= record.timestamp <= end]
+
+
+def columnar_range(path, start, end):
+    with ColumnarFile(path) as columnar:
+        return list(columnar.time_range(start, end))
+
+
+def lines_timestamps(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return max(int(line.split('\t', 4)[3]) for line in f)
+
+
+def columnar_timestamps(path):
+    with ColumnarFile(path) as columnar:
+        return max(columnar.timestamps)
+
+
+def columnar_records(path):
+    with ColumnarFile(path) as columnar:
+        return list(columnar)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'data'))
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100], help="合成记录的倍数")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    failures = []
+    work_dir = tempfile.mkdtemp(prefix='bench_columnar_')
+    try:
+        templates = []
+        for sink in SINKS:
+            lines_path = os.path.join(args.data_dir, f"{sink}.txt")
+            if not os.path.exists(lines_path):
+                continue
+            same, count, invalid = check_lines_file(lines_path, SINK_SOURCES[sink], work_dir)
+            print(f"{sink}.txt 往返: {count} 条记录，{invalid} 行无效，{'一致' if same else '不一致'}")
+            if not same:
+                failures.append(f"{sink}.txt 往返不一致")
+            columnar_path = os.path.join(args.data_dir, f"{sink}.col")
+            if os.path.exists(columnar_path) and os.path.exists(index_path_of(columnar_path)):
+                same, count, broken = check_stored_columnar(columnar_path, lines_path, SINK_SOURCES[sink])
+                print(f"{sink}.col 与 {sink}.txt: {count} 条记录，{broken} 条含制表符或换行，"
+                      f"{'一致' if same else '不一致'}")
+                if not same:
+                    failures.append(f"{sink}.col 与 {sink}.txt 不一致")
+            if sink == SINKS[0]:
+                templates = list(iter_lines(lines_path, SINK_SOURCES[sink]))
+
+        for name, records in (("特殊字段", EDGE_RECORDS), ("没有记录", [])):
+            same = check_round_trip(records, os.path.join(work_dir, 'edge.col'))
+            print(f"{name}往返: {'一致' if same else '不一致'}")
+            if not same:
+                failures.append(f"{name}往返不一致")
+
+        if not templates:
+            templates = [record for record in EDGE_RECORDS if not has_separator(record)]
+        print(f"{'倍数':>6} {'记录数':>8} {'文本(KB)':>9} {'列式+索引(KB)':>13} {'读取全部(ms)':>22} "
+              f"{'只读时间戳(ms)':>20} {'1小时范围(ms)':>20}")
+        for scale in args.scales:
+            records = synthesize(templates, scale)
+            lines_path = os.path.join(work_dir, f"scale{scale}.txt")
+            columnar_path = os.path.join(work_dir, f"scale{scale}.col")
+            write_lines(records, lines_path)
+            write_columnar(records, columnar_path)
+            start = sorted(record.timestamp for record in records)[len(records) // 2]
+            end = start + RANGE_SECONDS
+            lines_all, _ = timed(lambda: list(iter_lines(lines_path, SOURCE_9PK)), args.repeat)
+            columnar_all, _ = timed(lambda: columnar_records(columnar_path), args.repeat)
+            lines_max, expected_max = timed(lambda: lines_timestamps(lines_path), args.repeat)
+            columnar_max, actual_max = timed(lambda: columnar_timestamps(columnar_path), args.repeat)
+            lines_query, expected = timed(lambda: lines_range(lines_path, start, end), args.repeat)
+            columnar_query, actual = timed(lambda: columnar_range(columnar_path, start, end), args.repeat)
+            if (sorted(record.to_tuple() for record in expected) != sorted(record.to_tuple() for record in actual)
+                    or expected_max != actual_max):
+                failures.append(f"{scale}倍记录的查询结果不一致")
+            sizes = os.path.getsize(columnar_path) + os.path.getsize(index_path_of(columnar_path))
+            print(f"{scale:>6} {len(records):>8} {os.path.getsize(lines_path) / 1024:>9.0f} {sizes / 1024:>13.0f} "
+                  f"{lines_all:>10.1f} / {columnar_all:>9.1f} {lines_max:>9.1f} / {columnar_max:>8.3f} "
+                  f"{lines_query:>9.1f} / {columnar_query:>8.3f}")
+        print("耗时为 文本 / 列式")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for failure in failures:
+        print(f"失败: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+响应体读取基准测试
+用录制页面合成指定行数的UTF-8编码9pk页面，对比逐块解码为文本后解析与字节直接交给lxml解析的耗时和峰值内存，
+并核对两者的记录和行统计一致；测量编码识别（charset.sniff_charset）每次的耗时；
+在gb2312编码的jjj.com页面中混入GBK扩展字符和四字节字符，对比按gb2312和按gb18030解码时含有U+FFFD的记录数
+
+用法: python benchmarks/bench_ingest.py [--rows 2810 28100] [--repeat 3]
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import scraper
+import stand_in
+from charset import SNIFF_BYTES, sniff_charset
+from records import SOURCE_9PK, SOURCE_JJJ
+
+# 混入jjj.com页面的字符：GBK扩展字符（gb2312中没有）和gb18030的四字节字符
+RARE_CHARACTERS = ('鍂', '珺', '𠀀')
+
+
+def build_page(path, rows):
+    """合成指定行数的页面字节"""
+    template, _ = stand_in.load_site()[path]
+    return b"".join(template.chunks(rows))
+
+
+def ingest(body, as_bytes):
+    """按scrape_url的方式逐块读取响应体并解析，as_bytes为False时逐块解码为文本，返回记录元组列表和行统计"""
+    metrics = scraper.reset_metrics()
+    if as_bytes:
+        chunks = scraper.iter_body_bytes(io.BytesIO(body))
+    else:
+        chunks = scraper.iter_body_text(SOURCE_9PK, io.BytesIO(body), 'utf-8')
+    records = scraper.parse_stream(SOURCE_9PK, chunks, len(body))
+    return [record.to_tuple() for record in records], metrics.row_counts()
+
+
+def run_ingest(body, as_bytes, repeat):
+    """多次解析取中位数耗时，另外单独运行一次测量峰值内存，返回(耗时, 峰值内存字节数, 记录, 行统计)"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records, rows = ingest(body, as_bytes)
+        samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    ingest(body, as_bytes)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(samples), peak, records, rows
+
+
+def rare_jjj_page(rows):
+    """合成jjj.com页面，每隔几条o4调用把服务器名称的第一个字符换成RARE_CHARACTERS中的字符，按gb18030编码"""
+    text = build_page('/jjj.com/', rows).decode('gb2312')
+    parts = text.split('o4("')
+    for index in range(1, len(parts), 3):
+        parts[index] = RARE_CHARACTERS[index % len(RARE_CHARACTERS)] + parts[index][1:]
+    return 'o4("'.join(parts).encode('gb18030')
+
+
+def count_replaced(body, encoding):
+    """按指定编码解码jjj.com页面并解析，返回(名称含有U+FFFD的记录数, 记录数)"""
+    scraper.reset_metrics()
+    # 直接用codecs解码，scraper中的解码会把gb2312换成gb18030
+    records = list(scraper.parse_stream(SOURCE_JJJ, [body.decode(encoding, errors='replace')]))
+    return sum(1 for record in records if '�' in record.server_name), len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[2810, 28100], help="9pk页面的行数")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    scraper.reset_time_parser()
+    # 只比较当前进程中的解析
+    scraper.PARSE_WORKERS = 1
+    print(f"{'行数':>8} {'字节数':>10} {'方式':>6} {'耗时(s)':>8} {'峰值内存(MB)':>12} {'一致':>4}")
+    for rows in args.rows:
+        body = build_page('/9pk/', rows)
+        text_time, text_peak, expected, expected_rows = run_ingest(body, False, args.repeat)
+        bytes_time, bytes_peak, records, rows_counts = run_ingest(body, True, args.repeat)
+        same = records == expected and rows_counts == expected_rows
+        print(f"{rows:>8} {len(body):>10} {'文本':>6} {text_time:>8.3f} {text_peak / 1e6:>12.2f} {'是':>4}")
+        print(f"{rows:>8} {len(body):>10} {'字节':>6} {bytes_time:>8.3f} {bytes_peak / 1e6:>12.2f} "
+              f"{'是' if same else '否':>4}")
+
+    head = build_page('/jjj.com/', 287)[:SNIFF_BYTES]
+    count = 100000
+    start = time.perf_counter()
+    for _ in range(count):
+        charset = sniff_charset(head, 'text/html', 'utf-8')
+    elapsed = time.perf_counter() - start
+    print(f"编码识别: jjj.com页面识别为 {charset}，每次 {elapsed / count * 1e6:.1f} 微秒")
+
+    body = rare_jjj_page(287)
+    for encoding in ('gb2312', 'gb18030'):
+        replaced, total = count_replaced(body, encoding)
+        print(f"jjj.com页面按 {encoding} 解码: {total} 条记录中 {replaced} 条的名称含有U+FFFD")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+近似重复检测基准测试
+用data目录中的记录合成指定条数的原始记录（URL互不相同，同一模板的副本开区时间相隔较远），
+并为其中一部分生成变体：末尾斜杠不同、增加路径、名称加█/﹌等装饰或改用全角字符、时间相差几分钟、来源不同。
+测量neardup.cluster_records在不同规模下的耗时，统计变体与原始记录归入同一簇的比例（召回率）
+和包含多条不同原始记录的簇的比例（误合并率）
+
+用法: python benchmarks/bench_neardup.py [--sizes 1000 10000 100000] [--variants 0.3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from neardup import NEAR_TIME_WINDOW, cluster_records, host_key, normalize_text
+from records import SOURCES, ServerRecord
+
+FULL_WIDTH = str.maketrans('0123456789.', '０１２３４５６７８９．')
+DECORATIONS = ['█', '﹌', '★', '▇▅▃', '╋']
+
+
+def load_templates():
+    """读取data目录下的记录作为合成模板，主机名或规范化名称相同的记录只保留第一条，保证各模板是不同的服务器"""
+    templates = []
+    seen = set()
+    for name in ('9pk.txt', '30ok.txt', 'jjj.txt'):
+        path = os.path.join(ROOT, "data", name)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) < 7:
+                    continue
+                keys = {('host', host_key(fields[1])), ('name', normalize_text(fields[0]))}
+                if keys & seen:
+                    continue
+                seen.update(keys)
+                templates.append(fields)
+    return templates
+
+
+def variant_of(record, rng):
+    """生成同一服务器在其他来源中的写法"""
+    url = record.server_url
+    kind = rng.randrange(3)
+    if kind == 0:
+        url = url.rstrip('/') if url.endswith('/') else url + '/'
+    elif kind == 1:
+        url = url.rstrip('/') + '/index.html'
+    name = record.server_name
+    if rng.random() < 0.5:
+        name = name.translate(FULL_WIDTH)
+    decoration = rng.choice(DECORATIONS)
+    name = decoration + name + decoration
+    source = rng.choice([source for source in SOURCES if source != record.source])
+    return ServerRecord(source, name, url, record.server_type, record.timestamp + rng.randint(-1200, 1200),
+                        record.low_consumption, record.description, record.features)
+
+
+def synthesize(count, variant_ratio, rng):
+    """合成count条记录，返回记录列表和每条记录对应的原始记录编号"""
+    templates = load_templates()
+    now = int(time.time())
+    records, origins = [], []
+    index = 0
+    while len(records) < count:
+        name, url, server_type, _, low, description, features = templates[index % len(templates)][:7]
+        cycle = index // len(templates)
+        if cycle:
+            url = f"{url.rstrip('/')}/p{cycle}"
+        # 同一模板的各个副本开区时间至少相隔NEAR_TIME_WINDOW，模拟同一服务器在不同日期开新区
+        timestamp = now + cycle * 3 * NEAR_TIME_WINDOW + rng.randint(0, NEAR_TIME_WINDOW)
+        record = ServerRecord(SOURCES[index % len(SOURCES)], name, url, server_type, timestamp,
+                              low, description, features)
+        records.append(record)
+        origins.append(index)
+        if rng.random() < variant_ratio and len(records) < count:
+            records.append(variant_of(record, rng))
+            origins.append(index)
+        index += 1
+    return records, origins
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--variants', type=float, default=0.3, help="生成变体的原始记录比例")
+    args = parser.parse_args()
+
+    print(f"{'记录数':>8} {'耗时(s)':>8} {'微秒/条':>8} {'簇数':>8} {'召回率':>7} {'误合并率':>8}")
+    for size in args.sizes:
+        rng = random.Random(size)
+        records, origins = synthesize(size, args.variants, rng)
+        start = time.perf_counter()
+        cluster_ids = cluster_records(records)
+        elapsed = time.perf_counter() - start
+
+        counts = {}
+        for origin in origins:
+            counts[origin] = counts.get(origin, 0) + 1
+        found = {}
+        for cluster_id, origin in zip(cluster_ids, origins):
+            if counts[origin] > 1:
+                found.setdefault(origin, set()).add(cluster_id)
+        recall = sum(1 for clusters in found.values() if len(clusters) == 1) / len(found) if found else 1.0
+        members = {}
+        for cluster_id, origin in zip(cluster_ids, origins):
+            members.setdefault(cluster_id, set()).add(origin)
+        merged = sum(1 for origin_set in members.values() if len(origin_set) > 1) / len(members)
+        print(f"{len(records):>8} {elapsed:>8.2f} {elapsed / len(records) * 1e6:>8.1f} {len(members):>8} "
+              f"{recall:>7.1%} {merged:>8.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+解析进程池基准测试
+用录制页面合成不同行数的9pk和jjj页面，分别在当前进程中和不同进程数的解析进程池中解析，
+测量耗时和相对当前进程解析的加速比，并核对记录和丢弃原因统计与当前进程解析的结果一致。
+进程池的启动耗时单独列出，不计入解析耗时
+
+用法: python benchmarks/bench_parse_pool.py [--rows 2810 28100 56200] [--workers 2 4] [--repeat 3]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import scraper
+import stand_in
+from records import SOURCE_9PK, SOURCE_JJJ
+
+
+def build_page(path, rows):
+    """合成指定行数的页面文本"""
+    template, _ = stand_in.load_site()[path]
+    return b"".join(template.chunks(rows)).decode(template.encoding)
+
+
+def run_parse(source, page_text, repeat):
+    """多次解析取中位数耗时（秒），返回(耗时, 记录元组列表, 行统计)"""
+    samples = []
+    for _ in range(repeat):
+        metrics = scraper.reset_metrics()
+        start = time.perf_counter()
+        records = scraper.parse_page(source, page_text)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), [record.to_tuple() for record in records], metrics.row_counts()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[2810, 28100], help="9pk页面的行数")
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({2, 4, os.cpu_count() or 1} - {0, 1}) or [2])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    scraper.reset_time_parser()
+    print(f"CPU核数: {os.cpu_count()}，自动选择时不足 {scraper.PARSE_POOL_MIN_CHARS} 个字符的页面在当前进程中解析")
+    print(f"{'页面':<6} {'行数':>8} {'字符数':>10} {'进程数':>6} {'耗时(s)':>8} {'加速比':>6} {'一致':>4}")
+    # jjj页面的行数按与9pk页面的比例合成（1倍规模下分别为287和2810行）
+    cases = [(SOURCE_9PK, '/9pk/', rows) for rows in args.rows]
+    cases += [(SOURCE_JJJ, '/jjj.com/', rows * 287 // 2810) for rows in args.rows]
+    for source, path, rows in cases:
+        page_text = build_page(path, rows)
+        scraper.PARSE_WORKERS = 1
+        baseline, expected, expected_rows = run_parse(source, page_text, args.repeat)
+        print(f"{source:<6} {rows:>8} {len(page_text):>10} {'当前':>6} {baseline:>8.3f} {1.0:>6.2f} {'是':>4}")
+
+        for workers in args.workers:
+            scraper.close_parse_pool()
+            scraper.PARSE_WORKERS = workers
+            scraper.PARSE_POOL_MIN_CHARS = 0
+            start = time.perf_counter()
+            pool = scraper.get_parse_pool()
+            # 每个进程完成一次导入后再计时
+            list(pool.map(time.sleep, [0.05] * workers))
+            startup = time.perf_counter() - start
+            elapsed, records, rows_counts = run_parse(source, page_text, args.repeat)
+            same = records == expected and rows_counts == expected_rows
+            print(f"{source:<6} {rows:>8} {len(page_text):>10} {workers:>6} {elapsed:>8.3f} "
+                  f"{baseline / elapsed:>6.2f} {'是' if same else '否':>4}  （进程池启动 {startup:.2f}s）")
+        scraper.close_parse_pool()
+
+
+if __name__ == "__main__":
+    main()
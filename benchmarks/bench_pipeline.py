@@ -0,0 +1,191 @@
+"""
+端到端基准测试
+启动本地替身站点，按不同倍数合成页面，完整运行scraper.main()的采集流程，
+统计各阶段耗时（抓取、解析、时间解析、写入存储、汇总、输出、变更文件）、每秒处理记录数、峰值内存和每条记录的平均内存
+
+每个倍数在独立的子进程中运行，峰值内存互不影响；运行目录为临时目录，不会改动data/。
+--scrape-only只运行各数据源的抓取和解析（记录写入暂存文件），不写入存储，
+用于在1000倍等完整流程耗时过长的倍数下测量页面大小对峰值内存的影响
+
+用法: python benchmarks/bench_pipeline.py [--scales 1 10 100] [--latency 0.2] [--warm] [--scrape-only] [--json out.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import stand_in
+
+# 各阶段耗时取自运行报告，time_parse由替换的时间解析函数统计（包含在parse中）
+STAGES = ['fetch', 'parse', 'time_parse', 'store', 'rollup', 'output', 'feed']
+
+
+class StageClock:
+    """累计各阶段耗时，多个线程中的耗时相加"""
+
+    def __init__(self):
+        self.totals = {'time_parse': 0.0}
+        self.lock = threading.Lock()
+
+    def wrap(self, stage, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    self.totals[stage] += elapsed
+        return timed
+
+
+def instrument(scraper, clock):
+    """替换scraper中的时间解析函数，记录耗时"""
+    scraper.parse_time_text = clock.wrap('time_parse', scraper.parse_time_text)
+    scraper.parse_api_time = clock.wrap('time_parse', scraper.parse_api_time)
+
+
+def count_rows(data_dir):
+    """统计输出文件中的记录数"""
+    rows = {}
+    for name in ('9pk.txt', '30ok.txt', 'jjj.txt'):
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                rows[name] = sum(1 for _ in f)
+    return rows
+
+
+def scrape_only(scraper):
+    """只抓取和解析各数据源，记录写入暂存文件，返回各数据源的记录数"""
+    from spool import RecordSpool
+
+    run_metrics = scraper.reset_metrics()
+    scraper.reset_time_parser()
+    rows = {}
+    try:
+        for url in scraper.URLS + [scraper.API_URL]:
+            with RecordSpool() as spool:
+                if url == scraper.API_URL:
+                    scraper.scrape_api_data(url, sink=spool)
+                else:
+                    scraper.scrape_url(url, sink=spool)
+                rows[url] = len(spool)
+    finally:
+        scraper.close_sessions()
+        scraper.close_parse_pool()
+    run_metrics.write_report()
+    return rows
+
+
+def run_pipeline(base_url, warm, only_scrape=False):
+    """在当前进程中运行一次采集流程（子进程入口），返回统计结果"""
+    import scraper
+
+    scraper.URLS, scraper.API_URL = stand_in.site_urls(base_url)
+    workdir = tempfile.mkdtemp(prefix="scraper-bench-")
+    os.chdir(workdir)
+
+    # 预热运行：填充HTTP缓存，测量的运行将走304/跳过解析的路径
+    if warm:
+        with contextlib.redirect_stdout(io.StringIO()):
+            scraper.main()
+
+    clock = StageClock()
+    instrument(scraper, clock)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if only_scrape:
+            rows = scrape_only(scraper)
+        else:
+            scraper.main()
+            rows = count_rows(os.path.join(workdir, scraper.DATA_DIR))
+    wall = time.perf_counter() - start
+
+    with open(os.path.join(workdir, scraper.DATA_DIR, "run_report.json"), 'r', encoding='utf-8') as f:
+        stages = json.load(f)['stages']
+    totals = {stage: stages.get(stage, 0.0) for stage in STAGES}
+    totals.update(clock.totals)
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        'wall': wall,
+        'stages': totals,
+        'rows': rows,
+        'rows_per_second': sum(rows.values()) / wall if wall else 0.0,
+        'peak_rss_mb': peak_rss_mb,
+        'bytes_per_row': peak_rss_mb * 1024 * 1024 / max(sum(rows.values()), 1),
+    }
+
+
+def serve(scale, latency, port_queue):
+    """替身站点进程入口"""
+    server = stand_in.create_server(scale, latency)
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+def bench_scale(scale, latency, warm, only_scrape=False):
+    """启动替身站点进程，在子进程中运行采集流程"""
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(scale, latency, port_queue), daemon=True)
+    server.start()
+    try:
+        base_url = f"http://127.0.0.1:{port_queue.get(timeout=30)}"
+        command = [sys.executable, os.path.abspath(__file__), '--run', base_url]
+        if warm:
+            command.append('--warm')
+        if only_scrape:
+            command.append('--scrape-only')
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        return json.loads(output.strip().splitlines()[-1])
+    finally:
+        server.terminate()
+        server.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端基准测试")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100],
+                        help="合成页面相对当前记录数的倍数，如 1 10 100 1000")
+    parser.add_argument('--latency', type=float, default=0.0, help="替身站点每个请求的模拟延迟（秒）")
+    parser.add_argument('--warm', action='store_true', help="先预热HTTP缓存，测量缓存命中时的运行")
+    parser.add_argument('--scrape-only', action='store_true', help="只运行抓取和解析，不写入存储")
+    parser.add_argument('--json', help="将结果另存为JSON文件")
+    parser.add_argument('--run', metavar='BASE_URL', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_pipeline(args.run, args.warm, args.scrape_only)))
+        return
+
+    results = {}
+    header = f"{'倍数':>6} {'记录数':>9} {'总耗时':>8} " + " ".join(f"{stage:>10}" for stage in STAGES) + \
+             f" {'记录/秒':>10} {'峰值内存MB':>10} {'字节/条':>8}"
+    print(header)
+    for scale in args.scales:
+        result = bench_scale(scale, args.latency, args.warm, args.scrape_only)
+        results[scale] = result
+        stages = " ".join(f"{result['stages'][stage]:>10.3f}" for stage in STAGES)
+        print(f"{scale:>6} {sum(result['rows'].values()):>9} {result['wall']:>8.3f} {stages} "
+              f"{result['rows_per_second']:>10.0f} {result['peak_rss_mb']:>10.1f} {result['bytes_per_row']:>8.0f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
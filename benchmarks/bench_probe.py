@@ -0,0 +1,146 @@
+"""
+存活探测基准测试
+在本机启动替身监听端口：正常响应HEAD请求的端口、接受连接但不响应的端口，以及未监听的端口，
+用127.0.0.0/8中不同的回环地址合成指定数量的不重复地址（每个地址对应多条记录），
+测量probe.probe_urls探测全部地址的耗时，核对每个地址的探测结果，并测量有效期内再次探测（全部复用结果）的耗时
+
+只适用于Linux（整个127.0.0.0/8网段都指向本机）；替身端口监听在所有网卡上，运行结束后关闭
+
+用法: python benchmarks/bench_probe.py [--targets 10000] [--listings 3] [--concurrency 512] [--head]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import probe
+from store import RecordStore
+
+EXPECT_ALIVE = 'alive'
+EXPECT_SILENT = 'silent'
+EXPECT_REFUSED = 'refused'
+
+
+async def _respond(reader, writer):
+    """读取请求后返回200，客户端不发送请求直接关闭时也随之关闭"""
+    try:
+        if await reader.readline():
+            writer.write(b"HTTP/1.0 200 OK\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+
+async def _silent(reader, writer):
+    """接受连接但不响应，直到客户端关闭"""
+    try:
+        await reader.read()
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+
+def start_listeners():
+    """在后台线程的事件循环中启动替身端口，返回(事件循环, 正常端口, 不响应端口, 未监听端口)"""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    ports = {}
+
+    async def setup():
+        alive = await asyncio.start_server(_respond, '0.0.0.0', 0, backlog=4096)
+        silent = await asyncio.start_server(_silent, '0.0.0.0', 0, backlog=4096)
+        ports['alive'] = alive.sockets[0].getsockname()[1]
+        ports['silent'] = silent.sockets[0].getsockname()[1]
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(setup())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    # 绑定后立即关闭的端口视为未监听
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        ports['refused'] = sock.getsockname()[1]
+    return loop, ports['alive'], ports['silent'], ports['refused']
+
+
+def synthesize(count, listings, ports, rng):
+    """合成count个不重复地址，每个地址对应listings条记录的URL，返回(URL列表, {地址: 预期结果})"""
+    alive_port, silent_port, refused_port = ports
+    urls, expected = [], {}
+    for index in range(count):
+        host = f"127.{1 + index // 65025}.{index // 255 % 255}.{1 + index % 255}"
+        kind = rng.choices([EXPECT_ALIVE, EXPECT_SILENT, EXPECT_REFUSED], weights=[7, 1, 2])[0]
+        port = {EXPECT_ALIVE: alive_port, EXPECT_SILENT: silent_port, EXPECT_REFUSED: refused_port}[kind]
+        expected[f"{host}:{port}"] = kind
+        urls.extend(f"http://{host}:{port}/" if listing == 0 else f"http://{host}:{port}/s{listing}"
+                    for listing in range(listings))
+    rng.shuffle(urls)
+    return urls, expected
+
+
+def check(results, expected, head):
+    """统计探测结果与预期不一致的地址数"""
+    wrong = 0
+    for endpoint, kind in expected.items():
+        result = results.get(endpoint)
+        if result is None:
+            wrong += 1
+        elif kind == EXPECT_REFUSED:
+            wrong += result.alive or result.error != probe.ERROR_REFUSED
+        elif not result.alive:
+            wrong += 1
+        elif head:
+            ok = result.status == 200 if kind == EXPECT_ALIVE else result.error == probe.ERROR_HEAD
+            wrong += not ok
+    return wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--targets', type=int, default=10000)
+    parser.add_argument('--listings', type=int, default=3, help="每个地址对应的记录数")
+    parser.add_argument('--concurrency', type=int, default=probe.PROBE_CONCURRENCY)
+    parser.add_argument('--timeout', type=float, default=1.0)
+    parser.add_argument('--head', action='store_true', help="同时测试HEAD请求（不响应的端口会等到超时）")
+    args = parser.parse_args()
+
+    loop, *ports = start_listeners()
+    urls, expected = synthesize(args.targets, args.listings, ports, random.Random(0))
+    with tempfile.TemporaryDirectory() as workdir:
+        store = RecordStore(os.path.join(workdir, "records.db"))
+        try:
+            start = time.perf_counter()
+            results, probed = probe.probe_urls(urls, store, timeout=args.timeout,
+                                               concurrency=args.concurrency, head=args.head)
+            elapsed = time.perf_counter() - start
+            alive = sum(1 for result in results.values() if result.alive)
+            print(f"{len(urls)} 条URL，{len(expected)} 个地址，探测 {probed} 个，耗时 {elapsed:.2f}s "
+                  f"（{probed / elapsed:.0f} 个/秒），可达 {alive} 个，结果不一致 {check(results, expected, args.head)} 个")
+
+            start = time.perf_counter()
+            results, probed = probe.probe_urls(urls, store, timeout=args.timeout,
+                                               concurrency=args.concurrency, head=args.head)
+            print(f"有效期内再次探测: 探测 {probed} 个，复用 {len(results) - probed} 个，"
+                  f"耗时 {time.perf_counter() - start:.2f}s")
+        finally:
+            store.close()
+    loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+查询索引基准测试
+用data目录中的记录合成指定条数的开区信息（开区时间分布在前后30天内），载入query.RecordIndex，
+测量时间范围、类型、主机和组合条件查询的耗时，以及增量加入新记录的耗时，并与逐条扫描的结果对比
+
+用法: python benchmarks/bench_query.py [--records 300000] [--repeat 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from query import RecordIndex, host_of
+from records import SOURCES, ServerRecord
+
+
+def load_templates():
+    """读取data目录下的记录作为合成模板"""
+    templates = []
+    for name in ('9pk.txt', '30ok.txt', 'jjj.txt'):
+        path = os.path.join(ROOT, "data", name)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) >= 7:
+                    templates.append(fields)
+    return templates
+
+
+def synthesize(count, now, rng, offset=0):
+    """合成序号从offset开始的count条记录，URL按序号区分，开区时间在now前后30天内"""
+    templates = load_templates()
+    records = []
+    for index in range(offset, offset + count):
+        name, url, server_type, _, low, description, features = templates[index % len(templates)][:7]
+        cycle = index // len(templates)
+        if cycle:
+            url = f"{url.rstrip('/')}/p{cycle}"
+        timestamp = now + rng.randint(-30 * 86400, 30 * 86400)
+        records.append(ServerRecord(SOURCES[index % len(SOURCES)], name, url, server_type, timestamp,
+                                    low, description, features))
+    return records
+
+
+def scan(records, start, end, server_type, host, limit):
+    """不使用索引的逐条扫描，用于核对结果"""
+    results = sorted((record for record in records
+                      if start <= record.timestamp <= end and
+                      (not server_type or server_type.lower() in record.server_type.lower()) and
+                      (not host or host_of(record.server_url) == host)),
+                     key=lambda record: record.timestamp)
+    return results[:limit]
+
+
+def measure(func, repeat):
+    """多次运行取中位数耗时（微秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--records', type=int, default=300000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    now = int(time.time())
+    records = synthesize(args.records, now, rng)
+
+    index = RecordIndex()
+    start = time.perf_counter()
+    index.update(records)
+    print(f"载入 {len(index)} 条记录耗时 {time.perf_counter() - start:.2f}s")
+
+    common_type = max(index.type_index, key=lambda gram: len(index.type_index[gram]))
+    sample = records[len(records) // 2]
+    cases = [
+        ("未来3小时", now, now + 3 * 3600, None, None),
+        ("未来30天", now, now + 30 * 86400, None, None),
+        (f"类型含“{sample.server_type[:4]}”", now - 30 * 86400, now + 30 * 86400, sample.server_type[:4], None),
+        (f"类型含“{common_type}”+未来3小时", now, now + 3 * 3600, common_type, None),
+        ("主机", now - 30 * 86400, now + 30 * 86400, None, host_of(sample.server_url)),
+    ]
+
+    print(f"{'条件':<24} {'结果数':>6} {'耗时(微秒)':>10} {'一致':>4}")
+    for label, low, high, server_type, host in cases:
+        elapsed, result = measure(lambda: index.query(low, high, server_type, host, limit=args.limit), args.repeat)
+        expected = scan(records, low, high, server_type, host, args.limit)
+        same = [record.timestamp for record in result] == [record.timestamp for record in expected]
+        print(f"{label:<24} {len(result):>6} {elapsed:>10.1f} {'是' if same else '否':>4}")
+
+    # 增量刷新：每批1000条新记录
+    batch = synthesize(1000, now, rng, offset=args.records)
+    start = time.perf_counter()
+    index.update(batch)
+    print(f"增量加入 {len(batch)} 条耗时 {(time.perf_counter() - start) * 1000:.1f}ms，共 {len(index)} 条")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+任务队列基准测试
+启动本地替身站点，生成包含大量9pk页面（同一模板页面加上不同的查询参数）、jjj.com页面和getList接口的注册表，
+分别用不同数量的worker进程执行同一批任务：先 --enqueue 创建运行，再同时启动N个 --worker 进程，最后 --merge 合并，
+统计worker阶段的耗时、每秒完成的任务数和相对1个worker的加速比，并检查各次合并得到的输出文件是否相同
+
+每个worker数在独立的临时运行目录中运行，不会改动data/和.cache/。
+抓取受网络延迟限制时加速比接近worker数；解析受CPU限制时加速比不超过机器的CPU核数
+
+用法: python benchmarks/bench_queue.py [--sites 50] [--workers 1 2 4] [--latency 1.0] [--scale 1] [--json out.json]
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import stand_in
+
+OUTPUTS = ('9pk.txt', '30ok.txt', 'jjj.txt')
+
+
+def write_registry(path, base_url, sites):
+    """生成注册表：sites个9pk页面、jjj.com页面和getList接口"""
+    urls, api_url = stand_in.site_urls(base_url)
+    sources = [{'name': f"9pk-{index}", 'url': f"{urls[index % 2]}?site={index}", 'parser': 'table_rows',
+                'sink': '9pk'} for index in range(sites)]
+    sources.append({'name': 'jjj', 'url': urls[2], 'parser': 'o4_calls', 'encoding': 'gb2312', 'sink': 'jjj'})
+    sources.append({'name': 'api', 'url': api_url, 'parser': 'json_api', 'sink': '30ok'})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'sources': sources}, f, ensure_ascii=False, indent=2)
+
+
+def scraper_command(*args):
+    return [sys.executable, os.path.join(ROOT, 'scraper.py'), '--sources', 'sources.json',
+            '--queue', os.path.join('.cache', 'queue.db'), *args]
+
+
+def run_workers(base_url, sites, workers):
+    """在新的运行目录中创建运行、启动workers个worker进程并合并，返回统计结果"""
+    workdir = tempfile.mkdtemp(prefix="scraper-queue-bench-")
+    write_registry(os.path.join(workdir, 'sources.json'), base_url, sites)
+    subprocess.run(scraper_command('--enqueue'), cwd=workdir, check=True, capture_output=True)
+
+    start = time.perf_counter()
+    processes = [subprocess.Popen(scraper_command('--worker'), cwd=workdir, stdout=subprocess.DEVNULL)
+                 for _ in range(workers)]
+    for process in processes:
+        if process.wait():
+            raise RuntimeError(f"worker进程退出码为 {process.returncode}")
+    work_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    subprocess.run(scraper_command('--merge'), cwd=workdir, check=True, capture_output=True)
+    merge_seconds = time.perf_counter() - start
+
+    # 时间无法解析的记录使用运行的参考时间，各次运行不同，比较时去掉时间戳一列
+    digests = {}
+    for name in OUTPUTS:
+        path = os.path.join(workdir, 'data', name)
+        if os.path.exists(path):
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for line in f:
+                    fields = line.split(b'\t')
+                    digest.update(b'\t'.join(fields[:3] + fields[4:]))
+            digests[name] = digest.hexdigest()
+    return {'work': work_seconds, 'merge': merge_seconds, 'outputs': digests, 'workdir': workdir}
+
+
+def serve(scale, latency, port_queue):
+    """替身站点进程入口"""
+    server = stand_in.create_server(scale, latency)
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务队列基准测试")
+    parser.add_argument('--sites', type=int, default=50, help="注册表中的9pk页面数")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="依次测试的worker进程数")
+    parser.add_argument('--latency', type=float, default=1.0, help="替身站点每个请求的模拟延迟（秒）")
+    parser.add_argument('--scale', type=int, default=1, help="合成页面相对当前记录数的倍数")
+    parser.add_argument('--json', help="将结果另存为JSON文件")
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(args.scale, args.latency, port_queue), daemon=True)
+    server.start()
+    results = {}
+    try:
+        base_url = f"http://127.0.0.1:{port_queue.get(timeout=30)}"
+        tasks = args.sites + 2
+        print(f"{args.sites} 个9pk页面，共 {tasks} 个数据源（API另有分页任务），CPU核数 {os.cpu_count()}")
+        print(f"{'worker数':>8} {'worker耗时':>10} {'任务/秒':>8} {'加速比':>8} {'合并耗时':>8} {'输出一致':>8}")
+        baseline = None
+        for workers in args.workers:
+            result = run_workers(base_url, args.sites, workers)
+            results[workers] = result
+            baseline = baseline or result
+            speedup = baseline['work'] / result['work'] if result['work'] else 0.0
+            print(f"{workers:>8} {result['work']:>10.2f} {tasks / result['work']:>8.1f} {speedup:>8.2f} "
+                  f"{result['merge']:>8.2f} {str(result['outputs'] == baseline['outputs']):>8}")
+    finally:
+        server.terminate()
+        server.join()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
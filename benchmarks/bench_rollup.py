@@ -0,0 +1,166 @@
+"""
+开区数汇总基准测试
+用 data/ 中的记录作为模板合成每天一次运行的历史（每次运行列出最近几天新开的服务器，其中一部分首次出现），
+逐次写入临时存储并增量累加汇总表，测量不同历史长度下每次运行累加的耗时、从全部记录重新汇总的耗时，
+以及导出最近7天日桶、最近7天按类型的小时桶、全部历史按一天中的小时合计的耗时；
+核对增量累加、重新汇总与逐条计数的结果一致
+
+用法: python benchmarks/bench_rollup.py [--weeks 1 4 16] [--new-per-run 1000] [--listed-runs 6]
+"""
+import argparse
+import io
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+from neardup import host_key
+from output import iter_lines
+from records import SOURCE_9PK, SOURCE_API, SOURCE_JJJ, ServerRecord
+from rollup import (BUCKET_FIELDS, DIMENSION_ALL, DIMENSION_HOST, DIMENSION_TYPE, GRAIN_DAY, GRAIN_DIMENSIONS,
+                    GRAIN_HOUR, Rollups, bucket_rows, bucket_start, export, type_tokens)
+from store import RecordStore
+
+DATA_FILES = {SOURCE_9PK: '9pk.txt', SOURCE_JJJ: 'jjj.txt', SOURCE_API: '30ok.txt'}
+
+# 合成历史的起始时间（2025-01-01 00:00 UTC）和每次运行列出的开区时间范围（天）
+START = 1735689600
+OPENING_DAYS = 5
+# 每多少条合成记录中有一条开区时间被运行时间代替
+SUBSTITUTED_EVERY = 50
+
+DAY = 86400
+
+
+def load_templates():
+    """data/ 中的记录作为模板，没有数据文件时合成少量记录"""
+    templates = []
+    for source, filename in DATA_FILES.items():
+        path = os.path.join(ROOT, 'data', filename)
+        if os.path.exists(path):
+            templates.extend(iter_lines(path, source))
+    if not templates:
+        templates = [ServerRecord(SOURCE_9PK, f"服务器{i}", f"http://s{i % 300}.example.com/", f"█类型{i % 40}█",
+                                  0, '', '', '') for i in range(1000)]
+    return templates
+
+
+def new_records(rng, templates, run_at, count, serial):
+    """
+    合成count条本次首次出现的记录，开区时间为run_at之后OPENING_DAYS天内的整10分钟；
+    每SUBSTITUTED_EVERY条中有一条开区时间被运行时间代替，汇总时应跳过
+    """
+    records = []
+    for offset in range(count):
+        template = rng.choice(templates)
+        substituted = (serial + offset) % SUBSTITUTED_EVERY == 0
+        timestamp = run_at if substituted else run_at + rng.randrange(OPENING_DAYS * 144) * 600
+        records.append(ServerRecord(template.source, template.server_name, f"{template.server_url}#{serial + offset}",
+                                    template.server_type, timestamp, template.low_consumption,
+                                    template.description, template.features, substituted))
+    return records
+
+
+def build_history(db_path, templates, weeks, new_per_run, listed_runs, seed=1):
+    """合成weeks周每天一次运行的历史并逐次累加汇总表，返回(每次运行累加的耗时列表, 最后一次运行的时间)"""
+    rng = random.Random(seed)
+    store = RecordStore(db_path)
+    rollups = Rollups(store)
+    listings = []
+    ingest_times = []
+    run_at = START
+    try:
+        for day in range(weeks * 7):
+            run_at = START + day * DAY
+            listings.append(new_records(rng, templates, run_at, new_per_run, day * new_per_run))
+            listings = listings[-listed_runs:]
+            store.upsert((record for listing in listings for record in listing), run_at)
+            started = time.perf_counter()
+            rollups.ingest(run_at)
+            ingest_times.append(time.perf_counter() - started)
+    finally:
+        store.close()
+    return ingest_times, run_at
+
+
+def rollup_table(store):
+    return sorted(store.conn.execute("SELECT grain, bucket, source, dimension, value, openings FROM rollups"))
+
+
+def naive_table(store):
+    """逐条记录计数（与汇总表相同地跳过开区时间被代替的记录），用于核对"""
+    counts = Counter()
+    for source, timestamp, server_type, server_url in store.conn.execute(
+            "SELECT source, timestamp, server_type, server_url FROM records WHERE NOT time_substituted"):
+        values = {DIMENSION_ALL: ('',), DIMENSION_TYPE: type_tokens(server_type),
+                  DIMENSION_HOST: (host_key(server_url),)}
+        for grain, dimensions in GRAIN_DIMENSIONS.items():
+            for dimension in dimensions:
+                for value in values[dimension]:
+                    counts[(grain, bucket_start(timestamp, grain), source, dimension, value)] += 1
+    return sorted(key + (count,) for key, count in counts.items())
+
+
+def timed(function, repeat):
+    """多次调用取中位数耗时（毫秒），返回(耗时, 最后一次的结果)"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def export_csv(rows):
+    return export(bucket_rows(rows), BUCKET_FIELDS, 'csv', io.StringIO())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--weeks', type=int, nargs='+', default=[1, 4, 16], help="合成历史的周数")
+    parser.add_argument('--new-per-run', type=int, default=1000, help="每次运行首次出现的记录数")
+    parser.add_argument('--listed-runs', type=int, default=6, help="每次运行列出最近几次运行中首次出现的记录")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    templates = load_templates()
+    work_dir = tempfile.mkdtemp(prefix='bench_rollup_')
+    try:
+        print(f"{'周数':>4} {'记录数':>8} {'汇总行数':>8} {'每次累加(ms)':>12} {'重新汇总(s)':>11} "
+              f"{'7天日桶(ms)':>11} {'7天类型小时桶(ms)':>17} {'按小时合计(ms)':>14} {'一致':>4}")
+        for weeks in args.weeks:
+            db_path = os.path.join(work_dir, f"weeks{weeks}.db")
+            ingest_times, last_run = build_history(db_path, templates, weeks, args.new_per_run, args.listed_runs)
+            store = RecordStore(db_path)
+            try:
+                rollups = Rollups(store)
+                incremental = rollup_table(store)
+                since = last_run - 7 * DAY
+                day_ms, _ = timed(lambda: export_csv(rollups.buckets(GRAIN_DAY, since=since)), args.repeat)
+                type_ms, _ = timed(lambda: export_csv(rollups.buckets(GRAIN_HOUR, since=since,
+                                                                      dimension=DIMENSION_TYPE)), args.repeat)
+                hour_ms, _ = timed(rollups.hour_of_day, args.repeat)
+                rebuild_started = time.perf_counter()
+                rollups.rebuild()
+                rebuild_time = time.perf_counter() - rebuild_started
+                same = incremental == rollup_table(store) == naive_table(store)
+                records = store.count()
+            finally:
+                store.close()
+            print(f"{weeks:>4} {records:>8} {len(incremental):>8} {statistics.median(ingest_times) * 1000:>12.1f} "
+                  f"{rebuild_time:>11.2f} {day_ms:>11.1f} {type_ms:>17.1f} {hour_ms:>14.1f} "
+                  f"{'是' if same else '否':>4}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
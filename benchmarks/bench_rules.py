@@ -0,0 +1,340 @@
+"""
+记录校验基准测试
+用data目录中的记录合成指定条数的9pk表格行、jjj.com的o4参数和getList接口记录，混入表头行、无效URL、
+无效时间、字段不足、字段为null或数字、字段为嵌套对象以及时间为数字时间戳的数据，对比原来各来源逐行校验的函数与rules.RowValidator按批校验的吞吐量，
+以及单独的表头判断（原逐字段逐关键词查找与合并后的正则表达式），并检查两者生成的记录和丢弃原因是否一致
+
+用法: python benchmarks/bench_rules.py [--rows 1000000] [--repeat 3]
+"""
+import argparse
+import html
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import metrics
+from records import SOURCE_9PK, SOURCE_API, SOURCE_JJJ, ServerRecord
+from rules import RULES, RowValidator, is_header_row
+from timeparse import TimeParser
+
+# 每批校验的行数，与scraper.ROWS_PER_BLOCK相同
+BATCH_ROWS = 200
+
+# 各来源的行数占比
+SOURCE_SHARES = ((SOURCE_9PK, 0.8), (SOURCE_JJJ, 0.1), (SOURCE_API, 0.1))
+
+# 接口记录中与原始字段顺序对应的键
+API_FIELDS = ('serverName', 'webUrl', 'serverType', 'startServerTime', 'serviceQq', 'gameIntro', 'serverIp')
+
+HEADER_ROW = ('服务器名称', '链接', '服务器类型', '开区时间', '最低消费', '描述', '特色')
+
+
+def legacy_is_header_data(server_name, server_type, server_url, low_consumption, description, features):
+    """原is_header_data：先比较典型表头，再对每个字段逐个查找9个关键词"""
+    if (server_name == '服务器名称' and
+        '链接' in server_url and
+        server_type == '服务器类型' and
+        low_consumption == '最低消费' and
+        description == '描述' and
+        features == '特色'):
+        return True
+    header_keywords = ['链接', '服务器', '名称', '时间', '消费', '描述', '特色', '最低', '类型']
+    fields_to_check = [server_name, server_type, server_url, low_consumption, description, features]
+    header_keyword_count = sum(1 for field in fields_to_check if any(keyword in field for keyword in header_keywords))
+    if header_keyword_count >= 3:
+        return True
+    if '服务器' in server_name and '链接' in server_url:
+        return True
+    return False
+
+
+def legacy_9pk(row, parser, rejected):
+    """原extract_server_info_lxml和build_server_info的校验逻辑"""
+    if len(row) < 7:
+        rejected[metrics.REJECT_SHORT_ROW] += 1
+        return None
+    server_name, server_url, server_type, time_text, low_consumption, description, features = row
+    if not server_url or 'http' not in server_url:
+        rejected[metrics.REJECT_BAD_URL] += 1
+        return None
+    server_url = server_url.split('?')[0].split('#')[0]
+    timestamp = parser.parse(time_text)
+    if not isinstance(timestamp, int) or timestamp <= 0:
+        rejected[metrics.REJECT_BAD_TIMESTAMP] += 1
+        return None
+    if legacy_is_header_data(server_name, server_type, server_url, low_consumption, description, features):
+        rejected[metrics.REJECT_HEADER_ROW] += 1
+        return None
+    return ServerRecord(SOURCE_9PK, server_name, server_url, server_type, timestamp,
+                        low_consumption, description, features)
+
+
+def legacy_jjj(params, parser, rejected, adjusted):
+    """原iter_jjj_records中对每个o4调用参数的校验逻辑"""
+    current_time = parser.now_ts
+    if len(params) < 7:
+        rejected[metrics.REJECT_SHORT_ROW] += 1
+        return None
+    server_name, server_url, server_type, time_text, low_consumption, description, features = params[:7]
+    if '&' in time_text:
+        time_text = html.unescape(time_text)
+    timestamp = parser.parse(time_text.strip())
+    if not server_url or len(server_url) < 5 or server_url == 'b' or 'http' not in server_url:
+        rejected[metrics.REJECT_BAD_URL] += 1
+        return None
+    substituted = False
+    if not isinstance(timestamp, int) or timestamp <= 0:
+        adjusted[metrics.ADJUST_BAD_TIMESTAMP] += 1
+        timestamp = current_time
+        substituted = True
+    if timestamp < current_time - 30*24*3600 or timestamp > current_time + 30*24*3600:
+        adjusted[metrics.ADJUST_OUT_OF_RANGE_TIME] += 1
+        timestamp = current_time
+        substituted = True
+    if '?' in server_url:
+        server_url = server_url.split('?')[0]
+    if '#' in server_url:
+        server_url = server_url.split('#')[0]
+    if legacy_is_header_data(server_name, server_type, server_url, low_consumption, description, features):
+        rejected[metrics.REJECT_HEADER_ROW] += 1
+        return None
+    return ServerRecord(SOURCE_JJJ, server_name, server_url, server_type, timestamp,
+                        low_consumption, description, features, substituted)
+
+
+def legacy_api_value(value):
+    """接口字段转换为字符串：null为空字符串，数字转换为字符串，其他类型抛出TypeError"""
+    if value is None:
+        return ''
+    if isinstance(value, (int, float)):
+        return str(value)
+    if not isinstance(value, str):
+        raise TypeError(type(value).__name__)
+    return value
+
+
+def legacy_api(record, parser, rejected):
+    """
+    原extract_api_server_info的校验逻辑，出错的记录原来只输出错误信息，这里计为字段类型不正确。
+    原逻辑不转换字段类型，null或嵌套对象会原样写入存储并使写入失败，这里先按规则引擎的方式转换文本字段；
+    时间字段与原逻辑相同原样解析，数字时间戳直接取整
+    """
+    try:
+        server_name, server_url, server_type, _, low_consumption, description, features = (
+            legacy_api_value(record.get(field, '')) for field in API_FIELDS)
+        timestamp = parser.parse_api(record.get('startServerTime', ''))
+        if not server_url:
+            rejected[metrics.REJECT_BAD_URL] += 1
+            return None
+        if 'http' not in server_url:
+            server_url = 'http://' + server_url
+        if '?' in server_url:
+            server_url = server_url.split('?')[0]
+        if '#' in server_url:
+            server_url = server_url.split('#')[0]
+        if not isinstance(timestamp, int) or timestamp <= 0:
+            rejected[metrics.REJECT_BAD_TIMESTAMP] += 1
+            return None
+        return ServerRecord(SOURCE_API, server_name, server_url, server_type, timestamp,
+                            low_consumption, description, features)
+    except Exception:
+        rejected[metrics.REJECT_MALFORMED] += 1
+        return None
+
+
+def api_row_fields(record):
+    """与scraper.api_row_fields相同，不导入scraper以免创建data目录"""
+    if not isinstance(record, dict):
+        return None
+    return (record.get('serverName', ''), record.get('webUrl', ''), record.get('serverType', ''),
+            record.get('startServerTime', ''), record.get('serviceQq', ''), record.get('gameIntro', ''),
+            record.get('serverIp', ''))
+
+
+def load_records():
+    """读取data目录中的9pk、jjj和API记录的字段"""
+    rows = []
+    for name in ('9pk.txt', 'jjj.txt', '30ok.txt'):
+        path = os.path.join(ROOT, "data", name)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) == 7 and fields[3].isdigit():
+                    rows.append(fields)
+    return rows
+
+
+def synthesize(base_rows, count, seed=0):
+    """合成count行：各来源的原始字段，每约50行混入一条需要丢弃或修正的数据"""
+    rng = random.Random(seed)
+    today = date.today()
+    rows = {source: [] for source, _ in SOURCE_SHARES}
+    for index in range(count):
+        name, url, server_type, timestamp, low, description, features = base_rows[index % len(base_rows)]
+        dt = datetime.fromtimestamp(int(timestamp))
+        page_time = f"{today.month}月{today.day}日/{dt.hour:02d}:{dt.minute:02d}"
+        url = f"{url.rstrip('/')}/s{index}?from=list"
+        point = rng.random()
+        source = SOURCE_SHARES[0][0] if point < SOURCE_SHARES[0][1] else (
+            SOURCE_SHARES[1][0] if point < SOURCE_SHARES[0][1] + SOURCE_SHARES[1][1] else SOURCE_SHARES[2][0])
+        kind = rng.randrange(300)
+        row = [name, url, server_type, page_time, low, description, features]
+        if kind == 0:
+            row = list(HEADER_ROW)
+        elif kind == 1:
+            row[0], row[4] = '服务器' + name, '最低' + low
+            row[5] = '描述' + description
+        elif kind == 2:
+            row[1] = rng.choice(['', 'b', 'www.example.com', '#'])
+        elif kind == 3:
+            row[3] = rng.choice(['★★精品全天推荐★★', '', '13月40日/25:00'])
+        elif kind == 4:
+            row = row[:rng.randrange(7)]
+        elif kind == 5:
+            row[3] = f"&nbsp;{page_time} "
+
+        if source == SOURCE_API:
+            if len(row) < 7:
+                rows[source].append(rng.choice([None, 'x', 42]))
+                continue
+            record = {'serverName': row[0], 'webUrl': row[1], 'serverType': row[2],
+                      'startServerTime': dt.strftime('%Y-%m-%d %H:%M:%S'), 'serviceQq': row[4],
+                      'gameIntro': row[5], 'serverIp': row[6]}
+            if kind == 3:
+                record['startServerTime'] = '-5'
+            elif kind == 6:
+                record['webUrl'] = 12345
+            elif kind == 7:
+                record['serviceQq'] = rng.choice([None, 10086, 1.5])
+                record['serverIp'] = None
+            elif kind == 8:
+                record[rng.choice(['gameIntro', 'serverType'])] = rng.choice([{'text': description}, [name], {}])
+            elif kind == 9:
+                record['startServerTime'] = rng.choice([float(timestamp), int(timestamp)])
+            rows[source].append(record)
+        else:
+            rows[source].append(tuple(row))
+    return rows
+
+
+def run_legacy(rows, now):
+    """原实现：各来源逐行校验"""
+    parser = TimeParser(now)
+    rejected = {source: Counter() for source in rows}
+    adjusted = Counter()
+    records = []
+    for row in rows[SOURCE_9PK]:
+        record = legacy_9pk(row, parser, rejected[SOURCE_9PK])
+        if record:
+            records.append(record)
+    for params in rows[SOURCE_JJJ]:
+        record = legacy_jjj(params, parser, rejected[SOURCE_JJJ], adjusted)
+        if record:
+            records.append(record)
+    for item in rows[SOURCE_API]:
+        record = legacy_api(item, parser, rejected[SOURCE_API])
+        if record:
+            records.append(record)
+    return records, rejected, adjusted
+
+
+def run_engine(rows, now):
+    """规则引擎：各来源共用RowValidator，每BATCH_ROWS行一批"""
+    parser = TimeParser(now)
+
+    def parse_jjj_time(time_text):
+        if '&' in time_text:
+            time_text = html.unescape(time_text)
+        return parser.parse(time_text.strip())
+
+    parse_times = {SOURCE_9PK: parser.parse, SOURCE_JJJ: parse_jjj_time, SOURCE_API: parser.parse_api}
+    rejected = {}
+    adjusted = Counter()
+    records = []
+    for source, source_rows in rows.items():
+        validator = RowValidator(RULES[source], parse_times[source], parser.now_ts)
+        for start in range(0, len(source_rows), BATCH_ROWS):
+            batch = source_rows[start:start + BATCH_ROWS]
+            if source == SOURCE_API:
+                batch = [api_row_fields(item) for item in batch]
+            records.extend(validator.validate(batch))
+        rejected[source] = validator.rejected
+        adjusted.update(validator.adjusted)
+    return records, rejected, adjusted
+
+
+def check_api_time_types(now):
+    """接口返回数字时间戳（整数或浮点数）时，规则引擎生成的记录时间为取整后的时间戳，返回不一致的说明列表"""
+    parser = TimeParser(now)
+    validator = RowValidator(RULES[SOURCE_API], parser.parse_api, parser.now_ts)
+    failures = []
+    for value in (1760000000, 1760000000.0, 1760000000.7, '1760000000'):
+        record = {'serverName': '测试', 'webUrl': 'a.example.com', 'serverType': '', 'startServerTime': value,
+                  'serviceQq': None, 'gameIntro': '', 'serverIp': 10086}
+        records = validator.validate([api_row_fields(record)])
+        if len(records) != 1 or records[0].timestamp != 1760000000:
+            failures.append(f"startServerTime={value!r} 得到 {[item.timestamp for item in records]}")
+    return failures
+
+
+def measure(func, repeat):
+    """多次运行取最短耗时，返回耗时和最后一次的结果"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="记录校验基准测试")
+    parser.add_argument('--rows', type=int, default=1000000, help="合成的行数")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    base_rows = load_records()
+    if not base_rows:
+        sys.exit("data目录中没有可用的记录")
+    rows = synthesize(base_rows, args.rows)
+    header_fields = [(row[0], row[2], row[1], row[4], row[5], row[6])
+                     for source in (SOURCE_9PK, SOURCE_JJJ) for row in rows[source] if len(row) == 7]
+    now = datetime.now()
+
+    legacy_header_time, legacy_headers = measure(
+        lambda: [legacy_is_header_data(*fields) for fields in header_fields], args.repeat)
+    header_time, headers = measure(lambda: [is_header_row(*fields) for fields in header_fields], args.repeat)
+    legacy_time, (legacy_records, legacy_rejected, legacy_adjusted) = measure(lambda: run_legacy(rows, now), args.repeat)
+    engine_time, (records, rejected, adjusted) = measure(lambda: run_engine(rows, now), args.repeat)
+
+    print(f"合成 {args.rows} 行（" + "，".join(f"{source} {len(items)}" for source, items in rows.items()) + "）")
+    print(f"{'阶段':<10} {'原实现(行/秒)':>14} {'规则引擎(行/秒)':>16} {'加速比':>7} {'一致':>6}")
+    print(f"{'表头判断':<10} {len(header_fields) / legacy_header_time:>14.0f} {len(header_fields) / header_time:>16.0f} "
+          f"{legacy_header_time / header_time:>6.1f}x {str(headers == legacy_headers):>6}")
+    same = ([record.to_tuple() for record in records] == [record.to_tuple() for record in legacy_records] and
+            rejected == legacy_rejected and adjusted == legacy_adjusted)
+    print(f"{'完整校验':<10} {args.rows / legacy_time:>14.0f} {args.rows / engine_time:>16.0f} "
+          f"{legacy_time / engine_time:>6.1f}x {str(same):>6}")
+    print(f"保留 {len(records)} 条")
+    for source, reasons in rejected.items():
+        print(f"{source}: 丢弃 {dict(reasons)}")
+    print(f"修正: {dict(adjusted)}")
+
+    failures = check_api_time_types(now)
+    print(f"接口数字时间戳: {'一致' if not failures else '不一致'}")
+    for failure in failures:
+        print(f"失败: {failure}")
+    return 0 if same and not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+启动耗时检查
+用 python -X importtime 测量导入scraper和cli.py各命令（--help、render、stats、scrape --help）的导入耗时，
+只统计空解释器（python -c pass）之外的模块，多次运行取最小值。
+以下情况视为回归，退出码为1（CI中作为检查步骤）：
+- 导入了该路径不应导入的模块（requests、bs4、lxml只在采集时导入，render和stats不导入存储）
+- 导入scraper时在当前目录创建了文件或目录
+- 导入耗时超过 --budget-ms
+
+用法: python benchmarks/bench_startup.py [--repeat 5] [--budget-ms 150]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+CLI = os.path.join(ROOT, 'cli.py')
+
+# 只在采集时导入的模块
+HEAVY_MODULES = ('requests', 'bs4', 'lxml')
+# render和stats只读取输出文件，也不应导入存储
+STORE_MODULES = ('store', 'sqlite3')
+
+# render和stats读取的示例输出文件（每行一条记录格式）
+SAMPLE_LINES = ("传奇一区\thttp://a.example.com:8080/\t单职业\t1760594400\t100\t描述\t特色\n"
+                "传奇二区\thttp://b.example.com/\t复古\t1760598000\t\t\t\n")
+
+
+def import_times(args, cwd):
+    """以 -X importtime 运行python，返回(顶层模块到累计导入耗时(微秒)的字典, 导入的全部模块名集合)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=cwd, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    top_level = {}
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2][1:]
+        modules.add(name.strip())
+        if not name.startswith(' '):
+            top_level[name] = int(parts[1])
+    return top_level, modules
+
+
+def measure(args, cwd, baseline, repeat):
+    """多次运行，返回(空解释器之外的顶层模块累计导入耗时之和的最小值(毫秒), 导入的全部模块名集合)"""
+    best = None
+    modules = set()
+    for _ in range(repeat):
+        top_level, modules = import_times(args, cwd)
+        total = sum(cumulative for name, cumulative in top_level.items() if name not in baseline) / 1000
+        best = total if best is None else min(best, total)
+    return best, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=150, help="每种情况允许的导入耗时（毫秒）")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_startup_')
+    try:
+        data_dir = os.path.join(work_dir, 'data')
+        os.makedirs(data_dir)
+        with open(os.path.join(data_dir, '9pk.txt'), 'w', encoding='utf-8') as f:
+            f.write(SAMPLE_LINES)
+        empty_dir = os.path.join(work_dir, 'empty')
+        os.makedirs(empty_dir)
+
+        baseline, _ = import_times(['-c', 'pass'], work_dir)
+        # (名称, 参数, 工作目录, 不应导入的模块)
+        cases = [
+            ("import scraper", ['-c', f"import sys; sys.path.insert(0, {ROOT!r}); import scraper"], empty_dir,
+             HEAVY_MODULES),
+            ("cli.py --help", [CLI, '--help'], work_dir, HEAVY_MODULES + STORE_MODULES),
+            ("cli.py render", [CLI, 'render', '--data-dir', data_dir], work_dir, HEAVY_MODULES + STORE_MODULES),
+            ("cli.py stats", [CLI, 'stats', '--data-dir', data_dir], work_dir, HEAVY_MODULES + STORE_MODULES),
+            ("cli.py scrape --help", [CLI, 'scrape', '--help'], work_dir, HEAVY_MODULES),
+        ]
+
+        failures = []
+        print(f"{'情况':<22} {'导入耗时(ms)':>12} {'模块数':>6}  不应导入的模块")
+        for name, case_args, cwd, forbidden in cases:
+            elapsed, modules = measure(case_args, cwd, baseline, args.repeat)
+            imported = sorted({module.split('.')[0] for module in modules} & set(forbidden))
+            print(f"{name:<22} {elapsed:>12.1f} {len(modules):>6}  {', '.join(imported) or '-'}")
+            if imported:
+                failures.append(f"{name} 导入了 {', '.join(imported)}")
+            if elapsed > args.budget_ms:
+                failures.append(f"{name} 导入耗时 {elapsed:.1f}ms 超过 {args.budget_ms:.0f}ms")
+        if os.listdir(empty_dir):
+            failures.append(f"import scraper 在当前目录创建了 {', '.join(sorted(os.listdir(empty_dir)))}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for failure in failures:
+        print(f"失败: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+9pk表格提取基准测试
+对比BeautifulSoup全文档解析与lxml增量解析两种提取方式，
+先在录制的页面上校验两者输出完全一致，再按不同倍数放大行数测量耗时
+
+用法: python benchmarks/bench_table_extract.py [--scales 1 10 100] [--repeat 3]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+import scraper
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "9pk.html")
+
+
+def extract_soup(html_text):
+    """原有的BeautifulSoup提取方式"""
+    soup = BeautifulSoup(html_text, 'lxml')
+    rows = soup.find_all('tr', attrs={'onmouseover': True})
+    return [info for info in (scraper.extract_server_info(row) for row in rows) if info]
+
+
+def extract_lxml(html_text):
+    """lxml增量提取方式"""
+    return list(scraper.iter_table_rows(html_text))
+
+
+def scale_page(html_text, factor):
+    """将页面中的开区行重复factor次，生成更大的页面"""
+    rows = re.findall(r'<tr onmouseover=.*?</tr>\n', html_text, re.S)
+    head, _, tail = html_text.partition(rows[0])
+    tail = tail[tail.rindex(rows[-1]) + len(rows[-1]):]
+    return head + "".join(rows) * factor + tail
+
+
+def best_time(func, html_text, repeat):
+    """多次运行取最短耗时"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(html_text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        html_text = f.read()
+
+    # 校验两种方式在录制页面上的输出完全一致
+    expected = extract_soup(html_text)
+    actual = extract_lxml(html_text)
+    if expected != actual:
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            if left != right:
+                print(f"第 {index} 条记录不一致:\n  soup: {left}\n  lxml: {right}")
+                break
+        print(f"输出不一致: soup {len(expected)} 条, lxml {len(actual)} 条")
+        sys.exit(1)
+    print(f"输出一致: {len(expected)} 条记录")
+
+    print(f"{'倍数':>6} {'页面大小':>10} {'记录数':>8} {'soup(s)':>10} {'lxml(s)':>10} {'加速比':>8}")
+    for factor in args.scales:
+        page = scale_page(html_text, factor)
+        soup_time, soup_result = best_time(extract_soup, page, args.repeat)
+        lxml_time, lxml_result = best_time(extract_lxml, page, args.repeat)
+        assert soup_result == lxml_result
+        print(f"{factor:>6} {len(page.encode('utf-8')) // 1024:>8}KB {len(lxml_result):>8} "
+              f"{soup_time:>10.3f} {lxml_time:>10.3f} {soup_time / lxml_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
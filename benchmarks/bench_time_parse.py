@@ -0,0 +1,217 @@
+"""
+时间解析基准测试
+用data目录中记录的开区时间还原出网页和API上的时间文本，
+对比原来的逐行解析函数与timeparse.TimeParser的吞吐量，并检查两者结果是否一致；
+另外检查中文数字小时等格式的解析顺序与原函数相同，以及2月29日在闰年和非闰年附近的年份推断
+
+用法: python benchmarks/bench_time_parse.py [--repeat 3]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from datetime import date, datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from timeparse import TimeParser, chinese_to_num
+
+
+def legacy_parse_time_text(time_text):
+    """原parse_time_to_timestamp的解析逻辑（每行重新匹配未编译的正则并调用datetime.now()）"""
+    if "精品全天推荐" in time_text:
+        return time_text
+
+    if "今日" in time_text:
+        today = date.today()
+        time_part = time_text.replace("今日", "")
+        time_obj = datetime.strptime(time_part, "%H:%M").time()
+        dt = datetime.combine(today, time_obj)
+        return int(dt.timestamp())
+
+    time_matches = re.findall(r'(\d+)', time_text)
+    if len(time_matches) >= 2:
+        try:
+            month = int(time_matches[0])
+            day = int(time_matches[1])
+            hour = int(time_matches[2]) if len(time_matches) > 2 else 0
+            minute = int(time_matches[3]) if len(time_matches) > 3 else 0
+            current_year = datetime.now().year
+            dt = datetime(current_year, month, day, hour, minute)
+            return int(dt.timestamp())
+        except (ValueError, IndexError):
+            pass
+
+    match = re.match(r"(\d+)月(\d+)日[/\s]*([\d零一二三四五六七八九十]+)[点时]([\d零一二三四五六七八九十]*)", time_text)
+    if match:
+        month, day, hour, minute = match.groups()
+        current_year = datetime.now().year
+        try:
+            dt = datetime(current_year, chinese_to_num(month), chinese_to_num(day),
+                          chinese_to_num(hour), chinese_to_num(minute) if minute else 0)
+            return int(dt.timestamp())
+        except ValueError:
+            return time_text
+    return time_text
+
+
+def legacy_parse_api_time(time_str):
+    """原parse_api_time的解析逻辑（依次尝试五种strptime格式）"""
+    if not time_str:
+        return int(datetime.now().timestamp())
+    try:
+        if isinstance(time_str, str):
+            if time_str.isdigit():
+                return int(time_str)
+            time_formats = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d', '%m月%d日/%H:%M', '%m-%d %H:%M']
+            for fmt in time_formats:
+                try:
+                    if '%Y' not in fmt:
+                        time_obj = datetime.strptime(time_str, fmt).replace(year=datetime.now().year)
+                    else:
+                        time_obj = datetime.strptime(time_str, fmt)
+                    return int(time_obj.timestamp())
+                except ValueError:
+                    continue
+        if isinstance(time_str, (int, float)):
+            return int(time_str)
+        return int(datetime.now().timestamp())
+    except Exception:
+        return int(datetime.now().timestamp())
+
+
+def load_timestamps():
+    """读取data目录下所有记录的时间戳"""
+    timestamps = []
+    for name in sorted(os.listdir(os.path.join(ROOT, "data"))):
+        if not name.endswith(".txt"):
+            continue
+        with open(os.path.join(ROOT, "data", name), 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) >= 4 and fields[3].isdigit():
+                    timestamps.append(int(fields[3]))
+    return timestamps
+
+
+def page_time_texts(timestamps):
+    """还原网页上常见的时间文本格式，日期换算到今年以避开跨年推断的差异"""
+    today = date.today()
+    texts = []
+    for index, timestamp in enumerate(timestamps):
+        dt = datetime.fromtimestamp(timestamp)
+        kind = index % 8
+        if kind == 0:
+            texts.append(f"今日{dt.hour:02d}:{dt.minute:02d}")
+        elif kind == 1:
+            texts.append("★★精品全天推荐★★")
+        elif kind == 2:
+            texts.append(f"{today.month}月{today.day}日/{dt.hour}点开放")
+        else:
+            texts.append(f"{today.month}月{today.day}日/{dt.hour:02d}:{dt.minute:02d}")
+    return texts
+
+
+def api_time_texts(timestamps):
+    """还原API返回的时间格式"""
+    texts = []
+    for index, timestamp in enumerate(timestamps):
+        dt = datetime.fromtimestamp(timestamp)
+        kind = index % 3
+        if kind == 0:
+            texts.append(dt.strftime('%Y-%m-%d %H:%M:%S'))
+        elif kind == 1:
+            texts.append(dt.strftime('%Y-%m-%d %H:%M'))
+        else:
+            texts.append(str(timestamp))
+    return texts
+
+
+def check_pattern_order():
+    """含中文数字小时等、可以被多种格式匹配的文本，结果应与原函数相同（先按数字解析），返回不一致的说明"""
+    today = date.today()
+    texts = [f"{today.month}月{today.day}日/{hour}" for hour in ("九点", "九点开放", "9点30分", "13:00", "十点三十")]
+    texts.append(f"{today.month}月{today.day}日 九点")
+    parser = TimeParser()
+    return [f"{text!r}: 原函数 {legacy_parse_time_text(text)!r}，TimeParser {parser.parse(text)!r}"
+            for text in texts if parser.parse(text) != legacy_parse_time_text(text)]
+
+
+def check_leap_day():
+    """2月29日只在闰年有效：参考时间附近有闰年时取该年，附近的年份都不是闰年时无法解析，返回不一致的说明"""
+    cases = [
+        # (参考时间, 文本, 期望结果)，期望为None表示原样返回（网页）或返回参考时间（API）
+        (datetime(2028, 3, 1), "2月29日/10:00", datetime(2028, 2, 29, 10)),
+        (datetime(2027, 12, 1), "2月29日/10:00", datetime(2028, 2, 29, 10)),
+        (datetime(2029, 1, 15), "2月29日/10:00", datetime(2028, 2, 29, 10)),
+        (datetime(2026, 10, 17), "2月29日/10:00", None),
+        (datetime(2028, 3, 1), "02-29 10:00", datetime(2028, 2, 29, 10)),
+        (datetime(2026, 10, 17), "02-29 10:00", None),
+        (datetime(2026, 10, 17), "2028-02-29 10:00", datetime(2028, 2, 29, 10)),
+        (datetime(2026, 10, 17), "2027-02-29 10:00", None),
+    ]
+    failures = []
+    for now, text, expected in cases:
+        parser = TimeParser(now=now)
+        api = '-' in text
+        actual = parser.parse_api(text) if api else parser.parse(text)
+        if expected is not None:
+            expected = int(expected.timestamp())
+        else:
+            expected = parser.now_ts if api else text
+        if actual != expected:
+            failures.append(f"参考时间 {now:%Y-%m-%d} 解析 {text!r}: 期望 {expected!r}，实际 {actual!r}")
+    return failures
+
+
+def run_parser(method, texts):
+    """用新建的TimeParser解析全部文本"""
+    parse = getattr(TimeParser(), method)
+    return [parse(text) for text in texts]
+
+
+def measure(func, texts, repeat):
+    """多次运行取最短耗时，返回耗时和结果"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = func(texts)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    timestamps = load_timestamps()
+    cases = [
+        ("网页时间", page_time_texts(timestamps), legacy_parse_time_text, 'parse'),
+        ("API时间", api_time_texts(timestamps), legacy_parse_api_time, 'parse_api'),
+    ]
+
+    print(f"{'类型':<8} {'文本数':>8} {'不同文本':>8} {'原实现(行/秒)':>14} {'TimeParser(行/秒)':>18} {'加速比':>7} {'一致':>6}")
+    for label, texts, legacy, method in cases:
+        legacy_time, expected = measure(lambda items: [legacy(text) for text in items], texts, args.repeat)
+        # 每轮使用新的解析器，缓存从空开始，与一次运行的情况相同
+        parser_time, actual = measure(lambda items: run_parser(method, items), texts, args.repeat)
+        same = sum(1 for left, right in zip(expected, actual) if left == right)
+        print(f"{label:<8} {len(texts):>8} {len(set(texts)):>8} {len(texts) / legacy_time:>14.0f} "
+              f"{len(texts) / parser_time:>18.0f} {legacy_time / parser_time:>6.1f}x {same / len(texts):>6.1%}")
+
+    failures = []
+    for label, check in (("格式顺序", check_pattern_order), ("2月29日", check_leap_day)):
+        check_failures = check()
+        print(f"{label}: {'一致' if not check_failures else '不一致'}")
+        failures.extend(check_failures)
+    for failure in failures:
+        print(f"失败: {failure}")
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
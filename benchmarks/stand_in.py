@@ -0,0 +1,200 @@
+"""
+本地HTTP替身站点
+用benchmarks/fixtures中录制的页面模拟两个9pk页面、gb2312编码的jjj.com页面和gameAd/getList接口，
+并可按倍数合成更大的页面。页面边生成边以分块传输发送，服务端不需要在内存中保存整个页面
+
+getList接口支持pageNum/pageSize分页参数，列表按新到旧排列；修改服务器的api_added属性
+可以在列表最前面加入新的记录，模拟两次运行之间新开的区
+
+单独运行: python benchmarks/stand_in.py [--scale 10] [--port 8000]
+"""
+import argparse
+import json
+import os
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# 1倍规模下各页面的记录数，与线上页面目前的数量相当
+BASE_ROWS = {
+    '/9pk/': 2810,
+    '/9pk/index2.html': 2810,
+    '/jjj.com/': 287,
+    '/api/gameAd/getList': 394,
+}
+
+# 共用同一模板的页面从不同的行号开始合成，避免两个页面的记录完全重复
+ROW_OFFSETS = {
+    '/9pk/index2.html': BASE_ROWS['/9pk/'],
+}
+
+# 每次发送的记录行数
+ROWS_PER_CHUNK = 500
+
+ROW_URL_PATTERNS = {
+    'table': re.compile(r'(href=")(http[^"?#]*)'),
+    'o4': re.compile(r'^(o4\("[^"]*",")([^"?#]*)'),
+}
+
+
+def _unique_url(url, cycle):
+    """模板行被重复使用时给URL加上后缀，保证合成的每条记录都不重复"""
+    return url if cycle == 0 else f"{url.rstrip('/')}/p{cycle}"
+
+
+class TemplatePage:
+    """由录制页面拆分出的页头、记录行模板和页尾"""
+
+    def __init__(self, filename, encoding, row_prefix, kind):
+        with open(os.path.join(FIXTURES_DIR, filename), 'r', encoding=encoding) as f:
+            lines = f.read().splitlines(keepends=True)
+        row_indexes = [i for i, line in enumerate(lines) if line.startswith(row_prefix)]
+        self.head = "".join(lines[:row_indexes[0]])
+        self.rows = [lines[i] for i in row_indexes]
+        self.tail = "".join(lines[row_indexes[-1] + 1:])
+        self.encoding = encoding
+        self.pattern = ROW_URL_PATTERNS[kind]
+
+    def row(self, index):
+        template = self.rows[index % len(self.rows)]
+        cycle = index // len(self.rows)
+        if cycle == 0:
+            return template
+        return self.pattern.sub(lambda m: m.group(1) + _unique_url(m.group(2), cycle), template, count=1)
+
+    def chunks(self, count, offset=0):
+        yield self.head.encode(self.encoding)
+        for start in range(offset, offset + count, ROWS_PER_CHUNK):
+            block = "".join(self.row(i) for i in range(start, min(start + ROWS_PER_CHUNK, offset + count)))
+            yield block.encode(self.encoding)
+        yield self.tail.encode(self.encoding)
+
+
+class TemplateApi:
+    """由录制的getList响应生成任意条数的JSON，编号越大的记录越新"""
+
+    def __init__(self, filename):
+        with open(os.path.join(FIXTURES_DIR, filename), 'r', encoding='utf-8') as f:
+            self.document = json.load(f)
+        self.items = self.document['data']['list']
+
+    def item(self, index):
+        item = dict(self.items[index % len(self.items)])
+        item['id'] = index
+        item['webUrl'] = _unique_url(item['webUrl'], index // len(self.items))
+        return item
+
+    def chunks(self, count, offset=0, total=None, page_num=1, page_size=None):
+        """按新到旧的顺序输出列表中从offset开始的count条记录，total为列表总条数"""
+        total = offset + count if total is None else total
+        document = dict(self.document, data=dict(self.document['data'], total=total, pageNum=page_num,
+                                                  pageSize=page_size or count, list=[]))
+        head, tail = json.dumps(document, ensure_ascii=False).split('"list": []')
+        yield (head + '"list": [').encode('utf-8')
+        for start in range(offset, offset + count, ROWS_PER_CHUNK):
+            block = ",".join(json.dumps(self.item(total - 1 - i), ensure_ascii=False)
+                             for i in range(start, min(start + ROWS_PER_CHUNK, offset + count)))
+            yield (("," if start > offset else "") + block).encode('utf-8')
+        yield ("]" + tail).encode('utf-8')
+
+
+def load_site():
+    """路径到(页面模板, Content-Type)的映射"""
+    table = TemplatePage("9pk.html", 'utf-8', '<tr onmouseover', 'table')
+    return {
+        '/9pk/': (table, 'text/html; charset=utf-8'),
+        '/9pk/index2.html': (table, 'text/html; charset=utf-8'),
+        '/jjj.com/': (TemplatePage("jjj.html", 'gb2312', 'o4(', 'o4'), 'text/html'),
+        '/api/gameAd/getList': (TemplateApi("getList.json"), 'application/json;charset=UTF-8'),
+    }
+
+
+def make_handler(site, scale, latency):
+    """生成请求处理类，scale为相对BASE_ROWS的倍数，latency为每个请求的模拟延迟（秒）"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            path = parts.path
+            if path not in site:
+                self.send_error(404)
+                return
+            if latency:
+                time.sleep(latency)
+            page, content_type = site[path]
+            if isinstance(page, TemplateApi):
+                chunks, etag = self.api_page(page, path, parse_qs(parts.query))
+            else:
+                count = BASE_ROWS[path] * scale
+                chunks, etag = page.chunks(count, ROW_OFFSETS.get(path, 0) * scale), f'"{path}-{count}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('ETag', etag)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in chunks:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+
+        def api_page(self, page, path, query):
+            """getList接口的一页，不带分页参数时返回整个列表"""
+            total = BASE_ROWS[path] * scale + self.server.api_added
+            page_size = int(query.get('pageSize', [total])[0]) or total
+            page_num = max(int(query.get('pageNum', ['1'])[0]), 1)
+            offset = (page_num - 1) * page_size
+            count = max(min(page_size, total - offset), 0)
+            etag = f'"{path}-{total}-{page_num}-{page_size}"'
+            return page.chunks(count, offset, total, page_num, page_size), etag
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def create_server(scale=1, latency=0.0, port=0):
+    """创建替身站点服务器，port为0时自动分配端口"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(load_site(), scale, latency))
+    server.daemon_threads = True
+    # getList列表最前面新加入的记录数
+    server.api_added = 0
+    return server
+
+
+def site_urls(base_url):
+    """替身站点上与scraper.URLS和scraper.API_URL对应的地址"""
+    urls = [f"{base_url}/9pk/", f"{base_url}/9pk/index2.html", f"{base_url}/jjj.com/"]
+    return urls, f"{base_url}/api/gameAd/getList"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地HTTP替身站点")
+    parser.add_argument('--scale', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.0, help="每个请求的模拟延迟（秒）")
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    server = create_server(args.scale, args.latency, args.port)
+    urls, api_url = site_urls(f"http://127.0.0.1:{server.server_port}")
+    print("替身站点已启动:")
+    for url in urls + [api_url]:
+        print(f"  {url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+开区信息变更记录
+保存上一次运行所有记录的unique_id和内容哈希，每次运行与之比较，
+把新增、删除和内容变化的记录追加到JSON Lines格式的变更文件中，每次运行有递增的序号，
+使用方只需读取上次读到的序号之后的行，不必比较完整的输出文件
+"""
+import hashlib
+import json
+import os
+
+FEED_PATH = os.path.join("data", "changes.jsonl")
+INDEX_PATH = os.path.join("data", "changes_index.json")
+
+# 变化类型
+CHANGE_ADDED = 'added'
+CHANGE_REMOVED = 'removed'
+CHANGE_MODIFIED = 'modified'
+
+
+def content_hash(record):
+    """记录内容的哈希（16位十六进制）"""
+    payload = json.dumps(record.to_tuple(), ensure_ascii=False).encode('utf-8')
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+class ChangeFeed:
+    """追加写入的变更文件，以及上一次运行的记录索引（unique_id -> [来源, 内容哈希]）"""
+
+    def __init__(self, path=FEED_PATH, index_path=INDEX_PATH):
+        self.path = path
+        self.index_path = index_path
+        self.seq, self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0, {}
+        return data.get('seq', 0), data.get('records', {})
+
+    def diff(self, records, keep_sources=()):
+        """
+        比较本次运行的记录与上一次运行的索引，返回(变更行列表, 新索引)
+        keep_sources中的来源本次没有采集到数据，其原有记录保留在索引中，不视为删除
+        """
+        current = {}
+        changes = list(self._iter_changes(records, keep_sources, current))
+        return changes, current
+
+    def _iter_changes(self, records, keep_sources, current):
+        """逐条产生变更行，同时把本次运行的索引填入current；records只遍历一次，可以是生成器"""
+        for record in records:
+            unique_id = record.unique_id
+            if unique_id in current:
+                continue
+            digest = content_hash(record)
+            current[unique_id] = [record.source, digest]
+            previous = self.index.get(unique_id)
+            if previous is None:
+                yield dict(record.to_dict(), change=CHANGE_ADDED)
+            elif previous[1] != digest:
+                yield dict(record.to_dict(), change=CHANGE_MODIFIED)
+
+        for unique_id, (source, digest) in self.index.items():
+            if unique_id in current:
+                continue
+            if source in keep_sources:
+                current[unique_id] = [source, digest]
+            else:
+                yield {'unique_id': unique_id, 'source': source, 'change': CHANGE_REMOVED}
+
+    def append(self, records, run_at, keep_sources=()):
+        """
+        追加本次运行的变更并更新索引，返回各变化类型的条数
+        先写变更再写索引，中途失败时下次运行会以新的序号重新输出这些变更；
+        变更边比较边写入文件，records可以是生成器，内存中只保存索引
+        """
+        current = {}
+        counts = dict.fromkeys((CHANGE_ADDED, CHANGE_REMOVED, CHANGE_MODIFIED), 0)
+        self.seq += 1
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for change in self._iter_changes(records, keep_sources, current):
+                f.write(json.dumps(dict({'seq': self.seq, 'run_at': run_at}, **change), ensure_ascii=False) + "\n")
+                counts[change['change']] += 1
+
+        # 每条索引占一行并按键排序，索引提交到仓库时每次运行的差异只有变化的行
+        lines = [f"{json.dumps(unique_id, ensure_ascii=False)}: {json.dumps(entry)}"
+                 for unique_id, entry in sorted(current.items())]
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(f'{{"seq": {self.seq}, "records": {{\n' + ",\n".join(lines) + "\n}}\n")
+        os.replace(tmp_path, self.index_path)
+        self.index = current
+        return counts
@@ -0,0 +1,71 @@
+"""
+响应体编码识别
+只查看响应体开头的SNIFF_BYTES个字节：依次按BOM、Content-Type响应头中的charset、页面开头<meta>中声明的编码识别，
+都没有时使用数据源的默认编码。gb2312和gbk按gb18030解码：gb18030是两者的超集，
+声明为gb2312的页面中出现的GBK扩展字符和四字节字符可以正确解码，不会被替换为U+FFFD
+"""
+import codecs
+import re
+
+# 查找BOM和<meta>编码声明的字节数
+SNIFF_BYTES = 4096
+
+# BOM和对应的编码，UTF-32LE的BOM以UTF-16LE的BOM开头，需要先比较
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# 按超集解码的编码（codecs中的规范名称）
+SUPERSET_CHARSETS = {'gb2312': 'gb18030', 'gbk': 'gb18030'}
+
+# Content-Type中的charset参数，以及<meta charset="...">和<meta http-equiv="Content-Type" content="...; charset=...">
+CONTENT_TYPE_CHARSET_PATTERN = re.compile(r'charset\s*=\s*["\']?([\w.:+-]+)', re.I)
+META_CHARSET_PATTERN = re.compile(rb'<meta\b[^>]*?\bcharset\s*=\s*["\']?([\w.:+-]+)', re.I)
+
+
+def normalize_charset(name):
+    """编码名称对应的codecs规范名称，gb2312和gbk改为gb18030；无法识别的名称返回None"""
+    if not name:
+        return None
+    try:
+        name = codecs.lookup(name).name
+    except LookupError:
+        return None
+    return SUPERSET_CHARSETS.get(name, name)
+
+
+def header_value(headers, name):
+    """不区分大小写地读取响应头，headers可以是requests的响应头或存档中保存的普通字典"""
+    if not headers:
+        return None
+    value = headers.get(name)
+    if value is not None:
+        return value
+    name = name.lower()
+    return next((value for key, value in headers.items() if key.lower() == name), None)
+
+
+def sniff_charset(head, content_type=None, default='utf-8', meta=True):
+    """
+    识别响应体的编码，head为响应体开头的字节（SNIFF_BYTES个即可），content_type为Content-Type响应头，
+    default为都没有声明时使用的编码，meta为是否查找<meta>声明（JSON等非HTML响应为False）。返回codecs规范名称
+    """
+    for bom, charset in BOMS:
+        if head.startswith(bom):
+            return charset
+    if content_type:
+        match = CONTENT_TYPE_CHARSET_PATTERN.search(content_type)
+        charset = normalize_charset(match.group(1)) if match else None
+        if charset:
+            return charset
+    if meta:
+        match = META_CHARSET_PATTERN.search(head[:SNIFF_BYTES])
+        charset = normalize_charset(match.group(1).decode('ascii')) if match else None
+        if charset:
+            # 能按ASCII读出<meta>的页面不可能是UTF-16/32编码，与浏览器相同按utf-8处理
+            return 'utf-8' if charset.startswith(('utf-16', 'utf-32')) else charset
+    return normalize_charset(default) or 'utf-8'
@@ -0,0 +1,277 @@
+"""
+命令行入口
+
+    python cli.py scrape [选项]    采集（默认命令，python cli.py 和 python scraper.py 的选项与之相同）
+    python cli.py render           从data目录中每行一条记录的输出文件重新生成Markdown，不访问网络
+    python cli.py stats            输出各输出文件的记录统计和最近一次运行报告的摘要
+    python cli.py query ...        查询存储中的记录，参数与 python query.py 相同
+    python cli.py rollup [选项]    导出按开区时间分桶的开区数汇总（CSV或JSON）
+    python cli.py cluster [选项]   对存储中最近一次运行的记录做近似重复聚类，生成clusters.txt
+
+只为选中的命令定义参数，命令用到的模块在执行时才导入：render和stats不导入requests、lxml和存储，
+采集相关的模块只在scrape中导入
+"""
+import argparse
+import os
+import sys
+
+# render默认生成Markdown的输出文件，与采集时相同只有9pk
+RENDER_SINKS = ('9pk',)
+
+
+def add_scrape_arguments(parser):
+    from archive import ARCHIVE_DIR
+    from records import SOURCES
+    from registry import REGISTRY_PATH
+    import watch as watch_config
+    from workqueue import QUEUE_PATH
+
+    parser.add_argument('--watch', action='store_true', help="常驻运行，按各数据源的变化频率轮询")
+    parser.add_argument('--min-interval', type=float, default=watch_config.WATCH_MIN_INTERVAL,
+                        help="watch模式下的最短轮询间隔（秒）")
+    parser.add_argument('--max-interval', type=float, default=watch_config.WATCH_MAX_INTERVAL,
+                        help="watch模式下的最长轮询间隔（秒）")
+    parser.add_argument('--rate', type=int, default=watch_config.WATCH_REQUESTS_PER_MINUTE,
+                        help="watch模式下每分钟最多发出的请求数")
+    parser.add_argument('--reparse', action='store_true', help="不访问网络，用当前的解析逻辑重新解析存档中的响应")
+    parser.add_argument('--archive', default=ARCHIVE_DIR, help="reparse模式下读取的响应存档目录")
+    parser.add_argument('--source', choices=SOURCES, help="reparse模式下只重新解析该来源的响应")
+    parser.add_argument('--since', help="reparse模式下只重新解析该时间（时间戳或 2025-10-16 14:00）之后运行抓取的响应")
+    parser.add_argument('--db', help="reparse模式下把重新解析的记录写入该SQLite存储（用于回填历史）")
+    parser.add_argument('--sources', default=REGISTRY_PATH, help="数据源注册表文件，不存在时使用内置的URLS和API_URL")
+    parser.add_argument('--queue', default=QUEUE_PATH, help="队列模式下使用的SQLite任务队列文件")
+    parser.add_argument('--enqueue', action='store_true', help="在队列中创建一次运行，由worker执行")
+    parser.add_argument('--worker', action='store_true', help="作为worker从队列中租用并执行任务，直到没有任务")
+    parser.add_argument('--merge', action='store_true', help="合并队列中已完成的运行，生成输出文件")
+    parser.add_argument('--workers', type=int, help="创建一次运行，在本机启动该数量的worker进程，完成后合并")
+    parser.add_argument('--run-id', type=int, help="worker和合并只处理该运行（默认：worker处理所有未合并的运行，合并最近一次运行）")
+
+
+def run_scrape(parser, args):
+    from registry import load_registry
+
+    try:
+        specs = load_registry(args.sources)
+    except ValueError as e:
+        parser.error(str(e))
+    import scraper
+    scraper.set_registry(specs)
+    scraper.scrape_main(args)
+
+
+def add_render_arguments(parser):
+    from output import DATA_DIR
+    from records import SINKS
+
+    parser.add_argument('--data-dir', default=DATA_DIR, help="输出文件所在的目录")
+    parser.add_argument('--sink', choices=SINKS, nargs='+', default=list(RENDER_SINKS),
+                        help="重新生成Markdown的输出文件（默认只有9pk，与采集时相同）")
+
+
+def run_render(parser, args):
+    from output import data_path, render_markdown
+    from registry import SINK_SOURCES
+
+    failed = False
+    for sink in args.sink:
+        lines_path = data_path(f"{sink}.txt", args.data_dir)
+        markdown_path = data_path(f"{sink}.md", args.data_dir)
+        if not os.path.exists(lines_path):
+            print(f"{lines_path} 不存在，跳过")
+            failed = True
+            continue
+        count, invalid = render_markdown(lines_path, markdown_path, SINK_SOURCES[sink])
+        print(f"已从 {lines_path} 生成 {markdown_path}，共 {count} 条数据")
+        if invalid:
+            print(f"跳过 {len(invalid)} 行格式不正确的数据（第 {', '.join(map(str, invalid[:10]))} 行"
+                  + ("等" if len(invalid) > 10 else "") + "）")
+    return 1 if failed else 0
+
+
+def add_stats_arguments(parser):
+    from output import DATA_DIR
+
+    parser.add_argument('--data-dir', default=DATA_DIR, help="输出文件所在的目录")
+    parser.add_argument('--json', action='store_true', help="以JSON格式输出")
+
+
+def run_stats(parser, args):
+    import json
+    import time
+    from datetime import datetime
+
+    from output import data_path, line_file_stats
+    from records import SINKS
+    from registry import SINK_SOURCES
+
+    now = int(time.time())
+    files = {}
+    for sink in SINKS:
+        path = data_path(f"{sink}.txt", args.data_dir)
+        if os.path.exists(path):
+            files[sink] = line_file_stats(path, SINK_SOURCES[sink], now)
+    report = None
+    report_path = data_path("run_report.json", args.data_dir)
+    if os.path.exists(report_path):
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+
+    if args.json:
+        print(json.dumps({'files': files, 'report': report}, ensure_ascii=False, indent=2))
+        return 0
+    if not files:
+        print(f"{args.data_dir} 中没有输出文件")
+    for sink, stats in files.items():
+        span = ""
+        if stats['records']:
+            first, last = (datetime.fromtimestamp(stats[key]).strftime('%Y-%m-%d %H:%M') for key in ('first', 'last'))
+            span = f"，开区时间 {first} ~ {last}，尚未开区 {stats['upcoming']} 条"
+        print(f"{sink}.txt: {stats['records']} 条记录，{stats['hosts']} 个主机{span}"
+              + (f"，{stats['invalid']} 行格式不正确" if stats['invalid'] else ""))
+    if report:
+        print(f"最近一次运行: {report['started_at']} 开始，耗时 {report['duration']:.1f}s")
+        for source, rows in report['rows'].items():
+            print(f"  {source}: 处理 {rows['seen']} 行，保留 {rows['accepted']} 条，丢弃 {rows['rejected']}，"
+                  f"修正 {rows['adjusted']}")
+        errors = {url: info['error'] for url, info in report['sources'].items() if info.get('error')}
+        for url, error in errors.items():
+            print(f"  采集失败 {url}: {error}")
+    return 0
+
+
+def add_rollup_arguments(parser):
+    from rollup import DIMENSIONS, GRAIN_DAY, GRAINS
+    from store import DB_PATH
+
+    parser.add_argument('--db', default=DB_PATH, help="SQLite存储路径")
+    parser.add_argument('--grain', choices=list(GRAINS), default=GRAIN_DAY, help="桶的粒度（默认按日）")
+    parser.add_argument('--dimension', choices=DIMENSIONS, default=DIMENSIONS[0],
+                        help="细分维度：不细分、服务器类型中的词、主机名（主机名只有日桶）")
+    parser.add_argument('--value', help="只导出该维度值（类型中的词或主机名）")
+    parser.add_argument('--source', choices=['9pk', 'jjj', 'api'])
+    parser.add_argument('--since', help="桶起始时间下限（时间戳或 2025-10-16 14:00）")
+    parser.add_argument('--until', help="桶起始时间上限")
+    parser.add_argument('--hour-of-day', action='store_true', help="按一天中的小时合计小时桶")
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    parser.add_argument('--output', help="输出文件（默认输出到标准输出）")
+    parser.add_argument('--rebuild', action='store_true', help="导出前从存储中的全部记录重新汇总（汇总表为空时自动汇总）")
+
+
+def run_rollup(parser, args):
+    import time
+
+    from query import parse_time_arg
+    from rollup import (BUCKET_FIELDS, GRAIN_DIMENSIONS, GRAIN_HOUR, HOUR_OF_DAY_FIELDS, Rollups,
+                        bucket_rows, export)
+    from store import RecordStore
+
+    grain = GRAIN_HOUR if args.hour_of_day else args.grain
+    if args.dimension not in GRAIN_DIMENSIONS[grain]:
+        parser.error(f"{grain}粒度没有{args.dimension}维度的汇总")
+    try:
+        since = parse_time_arg(args.since) if args.since else None
+        until = parse_time_arg(args.until) if args.until else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    store = RecordStore(args.db)
+    try:
+        rollups = Rollups(store)
+        # 存储先于汇总表存在时先从全部记录汇总
+        if args.rebuild or rollups.empty():
+            started = time.perf_counter()
+            count = rollups.rebuild()
+            print(f"已从 {count} 条记录重新汇总，耗时 {time.perf_counter() - started:.2f}s", file=sys.stderr)
+        started = time.perf_counter()
+        filters = {'since': since, 'until': until, 'source': args.source, 'dimension': args.dimension,
+                   'value': args.value}
+        if args.hour_of_day:
+            rows, fields = rollups.hour_of_day(**filters), HOUR_OF_DAY_FIELDS
+        else:
+            rows, fields = bucket_rows(rollups.buckets(grain, **filters)), BUCKET_FIELDS
+        if args.output:
+            os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+            with open(args.output, 'w', encoding='utf-8', newline='') as f:
+                count = export(rows, fields, args.format, f)
+            print(f"已导出 {count} 行到 {args.output}，耗时 {(time.perf_counter() - started) * 1000:.1f}ms")
+        else:
+            export(rows, fields, args.format, sys.stdout)
+    finally:
+        store.close()
+    return 0
+
+
+def add_cluster_arguments(parser):
+    from output import DATA_DIR
+    from store import DB_PATH
+
+    parser.add_argument('--db', default=DB_PATH, help="SQLite存储路径")
+    parser.add_argument('--output', default=os.path.join(DATA_DIR, "clusters.txt"), help="输出文件")
+
+
+def run_cluster(parser, args):
+    import time
+    from collections import Counter
+
+    from neardup import cluster_records
+    from output import write_clusters
+    from records import SOURCES
+    from store import RecordStore
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} 不存在")
+    store = RecordStore(args.db)
+    try:
+        records = store.latest_run(SOURCES)
+    finally:
+        store.close()
+    started = time.perf_counter()
+    cluster_ids = cluster_records(records)
+    elapsed = time.perf_counter() - started
+    sizes = Counter(cluster_ids)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    count = write_clusters(records, cluster_ids, args.output)
+    print(f"近似重复: {count} 条记录归为 {len(sizes)} 个簇，其中 {sum(1 for size in sizes.values() if size > 1)} 个簇"
+          f"有多条记录，聚类耗时 {elapsed:.2f}s")
+    print(f"数据已保存到 {args.output} (带近似重复簇编号)")
+    return 0
+
+
+# 命令名到(说明, 定义参数的函数, 执行命令的函数)，query的参数由query.py解析
+COMMANDS = {
+    'scrape': ("采集各数据源并生成输出文件（默认命令）", add_scrape_arguments, run_scrape),
+    'render': ("从每行一条记录的输出文件重新生成Markdown，不访问网络", add_render_arguments, run_render),
+    'stats': ("输出各输出文件的记录统计和最近一次运行报告的摘要", add_stats_arguments, run_stats),
+    'query': ("查询存储中的记录，参数与 python query.py 相同", None, None),
+    'rollup': ("导出按开区时间分桶的开区数汇总（CSV或JSON）", add_rollup_arguments, run_rollup),
+    'cluster': ("对存储中最近一次运行的记录做近似重复聚类，生成clusters.txt", add_cluster_arguments, run_cluster),
+}
+
+
+def build_parser(command):
+    """命令行解析器，只为command定义参数，其他命令只列出名称和说明"""
+    parser = argparse.ArgumentParser(description="开区信息采集", prog=os.path.basename(sys.argv[0]))
+    subparsers = parser.add_subparsers(dest='command', metavar='命令')
+    for name, (help_text, add_arguments, _) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text, description=help_text)
+        if name == command and add_arguments:
+            add_arguments(subparser)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # 不以命令名开头的参数（包括没有参数）按scrape处理，与原来的 python scraper.py [选项] 相同
+    if not argv or argv[0] not in COMMANDS and argv[0] not in ('-h', '--help'):
+        argv = ['scrape'] + argv
+    command = argv[0]
+    if command == 'query':
+        from query import main as query_main
+        return query_main(argv[1:], prog=f"{os.path.basename(sys.argv[0])} query")
+    parser = build_parser(command)
+    args = parser.parse_args(argv)
+    return COMMANDS[command][2](parser, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+列式二进制输出
+每行一条记录的文本文件不转义字段，字段中的制表符或换行会破坏整行，读取时还要重新拆分每一行并转换时间戳。
+这里把同样的记录另存为两个二进制文件（小端字节序）：
+
+<名称>.col    列式数据：文件头、段表，之后每段按8字节对齐
+    timestamps       每条记录的开区时间戳（int64）
+    sources          每条记录的来源编号（uint8），对应source_names中的来源
+    source_names     来源名称在字符串表中的编号（uint32）
+    server_name等6列 每条记录该字段在字符串表中的编号（uint32），列的顺序与COLUMNS相同
+    string_offsets   字符串表中每个字符串在string_data中的起始位置（uint32，最后多一个结束位置）
+    string_data      去重后的字符串，UTF-8编码依次相连
+<名称>.tsidx  时间戳索引：文件头之后是按开区时间排序的时间戳（int64）和对应的记录序号（uint32）
+
+ColumnarFile用mmap打开这两个文件，列和索引直接在映射的内存上读取，不需要载入整个文件；
+按开区时间范围查询时在索引上二分查找，只解码范围内的记录
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import starmap
+
+from records import ServerRecord
+
+COLUMNAR_MAGIC = b'CQFCOL\x00\x01'
+INDEX_MAGIC = b'CQFTSX\x00\x01'
+
+# 文件头：魔数、记录数、字符串数、段数；之后为每段的(起始位置, 字节数)
+HEADER = struct.Struct('<8sIII')
+SECTION = struct.Struct('<QQ')
+# 索引文件头：魔数、记录数
+INDEX_HEADER = struct.Struct('<8sQ')
+
+# 以字符串表编号保存的字段，顺序与ServerRecord的构造参数一致
+COLUMNS = ('server_name', 'server_url', 'server_type', 'low_consumption', 'description', 'features')
+
+# 各段的名称和数组类型，顺序即文件中的顺序
+SECTIONS = (('timestamps', 'q'), ('sources', 'B'), ('source_names', 'I')) + tuple(
+    (column, 'I') for column in COLUMNS) + (('string_offsets', 'I'), ('string_data', 'B'))
+
+ALIGNMENT = 8
+
+# 字符串表的总字节数和记录数以uint32保存
+MAX_UINT32 = 2 ** 32 - 1
+
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+def index_path_of(path):
+    """列式文件对应的时间戳索引文件：9pk.col -> 9pk.tsidx"""
+    return os.path.splitext(path)[0] + '.tsidx'
+
+
+def _little_endian(values):
+    """数组的小端字节"""
+    if not LITTLE_ENDIAN:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _padding(size):
+    return b'\0' * (-size % ALIGNMENT)
+
+
+def _write_atomic(path, chunks):
+    """写入临时文件后替换原文件，读取方不会打开写了一半的文件"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+
+
+class ColumnarWriter:
+    """逐条收集记录的各列，字符串按内容去重，最后由write写出列式文件和时间戳索引"""
+
+    def __init__(self):
+        self.timestamps = array('q')
+        self.sources = array('B')
+        self.columns = {column: array('I') for column in COLUMNS}
+        self.source_ids = {}     # 来源名称 -> 来源编号
+        self.string_ids = {}     # 字符串 -> 字符串表编号
+        self.string_data = []    # 按编号排列的UTF-8字节
+        self.string_bytes = 0
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def _string_id(self, text):
+        string_id = self.string_ids.get(text)
+        if string_id is None:
+            data = text.encode('utf-8')
+            self.string_bytes += len(data)
+            if self.string_bytes > MAX_UINT32:
+                raise ValueError("字符串表超过4GB")
+            string_id = self.string_ids[text] = len(self.string_data)
+            self.string_data.append(data)
+        return string_id
+
+    def add(self, record):
+        if len(self.timestamps) >= MAX_UINT32:
+            raise ValueError("记录数超过uint32的范围")
+        source_id = self.source_ids.setdefault(record.source, len(self.source_ids))
+        if source_id > 255:
+            raise ValueError("来源超过256个")
+        self.timestamps.append(record.timestamp)
+        self.sources.append(source_id)
+        for column, ids in self.columns.items():
+            ids.append(self._string_id(getattr(record, column)))
+
+    def tee(self, records):
+        """逐条返回记录，同时收集各列，用于在写文本文件的同时生成列式文件"""
+        for record in records:
+            self.add(record)
+            yield record
+
+    def write(self, path, index_path=None):
+        """写出列式文件和时间戳索引（默认为index_path_of(path)），返回记录数"""
+        source_names = array('I', (self._string_id(source) for source in self.source_ids))
+        offsets = array('I', [0])
+        position = 0
+        for data in self.string_data:
+            position += len(data)
+            offsets.append(position)
+        values = {'timestamps': self.timestamps, 'sources': self.sources, 'source_names': source_names,
+                  'string_offsets': offsets, **self.columns}
+
+        sections = []
+        for name, _ in SECTIONS:
+            if name == 'string_data':
+                sections.append(b''.join(self.string_data))
+            else:
+                sections.append(_little_endian(values[name]))
+        position = HEADER.size + SECTION.size * len(SECTIONS)
+        head = [HEADER.pack(COLUMNAR_MAGIC, len(self), len(self.string_data), len(SECTIONS))]
+        body = [_padding(position)]
+        position += len(body[0])
+        for data in sections:
+            head.append(SECTION.pack(position, len(data)))
+            body.extend((data, _padding(len(data))))
+            position += len(data) + len(body[-1])
+        _write_atomic(path, head + body)
+
+        order = sorted(range(len(self)), key=self.timestamps.__getitem__)
+        _write_atomic(index_path or index_path_of(path), (
+            INDEX_HEADER.pack(INDEX_MAGIC, len(self)),
+            _little_endian(array('q', (self.timestamps[row] for row in order))),
+            _little_endian(array('I', order)),
+        ))
+        return len(self)
+
+
+def write_columnar(records, path, index_path=None):
+    """将记录保存为列式文件和时间戳索引，records可以是生成器，返回写入的条数"""
+    writer = ColumnarWriter()
+    for record in records:
+        writer.add(record)
+    return writer.write(path, index_path)
+
+
+class ColumnarFile:
+    """
+    用mmap读取列式文件和时间戳索引，可以按序号、按文件中的顺序或按开区时间范围读取记录
+    timestamps为文件顺序的开区时间戳，index_timestamps和index_rows为排序后的时间戳和记录序号，都可以直接按下标读取
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or index_path_of(path)
+        self._maps = []
+        self._views = []
+        self._strings = []
+        try:
+            data = self._map(path)
+            magic, self.count, self.string_count, section_count = HEADER.unpack_from(data)
+            if magic != COLUMNAR_MAGIC or section_count != len(SECTIONS):
+                raise ValueError(f"{path} 不是列式文件")
+            self._strings = [None] * self.string_count
+            sections = {}
+            for position, (name, typecode) in enumerate(SECTIONS):
+                offset, size = SECTION.unpack_from(data, HEADER.size + SECTION.size * position)
+                if offset + size > len(data):
+                    raise ValueError(f"{path} 不完整")
+                sections[name] = self._array(data, offset, size, typecode)
+            self.timestamps = sections['timestamps']
+            self.sources = sections['sources']
+            self.columns = [sections[column] for column in COLUMNS]
+            self.string_offsets = sections['string_offsets']
+            self.string_data = sections['string_data']
+            self.source_names = [self.string(string_id) for string_id in sections['source_names']]
+
+            index = self._map(self.index_path)
+            magic, count = INDEX_HEADER.unpack_from(index)
+            if magic != INDEX_MAGIC or count != self.count:
+                raise ValueError(f"{self.index_path} 与 {path} 不对应")
+            self.index_timestamps = self._array(index, INDEX_HEADER.size, count * 8, 'q')
+            self.index_rows = self._array(index, INDEX_HEADER.size + count * 8, count * 4, 'I')
+        except Exception:
+            self.close()
+            raise
+
+    def _map(self, path):
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return mapped
+
+    def _array(self, mapped, offset, size, typecode):
+        """映射内存中的一段，按typecode读取；大端字节序的机器上复制为数组并转换字节序"""
+        if not LITTLE_ENDIAN and typecode != 'B':
+            values = array(typecode, mapped[offset:offset + size])
+            values.byteswap()
+            return values
+        view = memoryview(mapped)[offset:offset + size]
+        self._views.append(view)
+        if typecode != 'B':
+            view = view.cast(typecode)
+            self._views.append(view)
+        return view
+
+    def __len__(self):
+        return self.count
+
+    def string(self, string_id):
+        """字符串表中的字符串，解码后缓存"""
+        text = self._strings[string_id]
+        if text is None:
+            start, end = self.string_offsets[string_id], self.string_offsets[string_id + 1]
+            text = self._strings[string_id] = str(self.string_data[start:end], 'utf-8')
+        return text
+
+    def strings(self):
+        """字符串表中的全部字符串，读取全部记录时一次解码"""
+        return [self.string(string_id) for string_id in range(self.string_count)]
+
+    def record(self, row):
+        """第row条记录（从0开始，与写入的顺序相同）"""
+        name, url, server_type, low_consumption, description, features = (
+            self.string(column[row]) for column in self.columns)
+        return ServerRecord(self.source_names[self.sources[row]], name, url, server_type, self.timestamps[row],
+                            low_consumption, description, features)
+
+    def __iter__(self):
+        """按写入的顺序返回全部记录"""
+        strings = self.strings()
+        columns = [map(strings.__getitem__, column) for column in self.columns]
+        sources = map(self.source_names.__getitem__, self.sources)
+        return starmap(ServerRecord, zip(sources, *columns[:3], self.timestamps, *columns[3:]))
+
+    def time_range(self, start=None, end=None):
+        """在时间戳索引上二分查找，按开区时间顺序返回开区时间在[start, end]内的记录"""
+        low = bisect_left(self.index_timestamps, start) if start is not None else 0
+        high = bisect_right(self.index_timestamps, end) if end is not None else self.count
+        return (self.record(self.index_rows[position]) for position in range(low, high))
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._views = []
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,173 @@
+"""
+HTTP条件请求缓存
+按URL在磁盘上保存ETag/Last-Modified和响应体哈希，以及上次解析出的记录
+服务器返回304或响应体未变化时直接复用上次的记录，无需重新解析页面。
+记录保存在条目旁边的JSON Lines文件中，写入和读取时都逐条处理，不把整页记录载入内存
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date
+
+CACHE_DIR = os.path.join(".cache", "http")
+
+# 缓存条目的有效期（秒）和缓存目录的总大小上限（字节）
+CACHE_TTL = 24 * 3600
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# 缓存条目的格式版本，记录的序列化方式改变时递增，旧格式的条目视为不存在
+CACHE_FORMAT = 3
+
+
+class ResponseCache:
+    """基于磁盘的响应缓存，每个URL对应一个JSON文件"""
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {'not_modified': 0, 'unchanged': 0, 'miss': 0}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + ".json")
+
+    def _records_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + ".records.jsonl")
+
+    def _load(self, url):
+        """读取有效的缓存条目，过期或损坏的条目视为不存在"""
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('format') != CACHE_FORMAT or entry.get('url') != url:
+            return None
+        if time.time() - entry.get('stored_at', 0) > self.ttl:
+            return None
+        # "今日14:00"等相对时间依赖解析当天的日期，跨天的记录不能复用
+        if entry.get('parsed_on') != date.today().isoformat():
+            return None
+        if not os.path.exists(self._records_path(url)):
+            return None
+        return entry
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def conditional_headers(self, url):
+        """根据缓存的校验信息生成If-None-Match/If-Modified-Since请求头"""
+        entry = self._load(url)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def lookup(self, url, response, body_hash=None):
+        """
+        检查响应是否可以复用缓存的记录
+        返回缓存条目（记录数count和保存时附带的meta），记录用records()逐条读取；无法复用时返回None
+        以流式读取响应体时传入body_hash，否则由response.content计算
+        """
+        entry = self._load(url)
+        if entry is None:
+            self._count('miss')
+            return None
+        if response.status_code == 304:
+            self._count('not_modified')
+            return entry
+        body_hash = body_hash or hashlib.sha256(response.content).hexdigest()
+        if body_hash == entry.get('body_hash'):
+            self._count('unchanged')
+            # 内容未变但服务器给出了新的校验信息时更新缓存，下次即可得到304
+            if (response.headers.get('ETag') != entry.get('etag') or
+                    response.headers.get('Last-Modified') != entry.get('last_modified')):
+                entry.update(etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'),
+                             stored_at=time.time())
+                self._write_entry(url, entry)
+                os.utime(self._records_path(url))
+            return entry
+        self._count('miss')
+        return None
+
+    def records(self, url):
+        """逐条读取缓存的记录（可序列化为JSON的列表）"""
+        with open(self._records_path(url), 'r', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def store(self, url, response, records, body_hash=None, meta=None):
+        """
+        保存响应的校验信息、响应体哈希和解析出的记录，返回记录数
+        records为可序列化为JSON的列表的可迭代对象，可以是生成器，逐条写入文件；没有记录时不保存。
+        以流式读取响应体时传入body_hash，否则由response.content计算；meta为随条目保存的其他信息
+        """
+        records_path = self._records_path(url)
+        tmp_path = f"{records_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        count = 0
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for values in records:
+                    f.write(json.dumps(values, ensure_ascii=False) + "\n")
+                    count += 1
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        if not count:
+            os.remove(tmp_path)
+            return 0
+        os.replace(tmp_path, records_path)
+        self._write_entry(url, {
+            'format': CACHE_FORMAT,
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'body_hash': body_hash or hashlib.sha256(response.content).hexdigest(),
+            'stored_at': time.time(),
+            'parsed_on': date.today().isoformat(),
+            'count': count,
+            'meta': meta or {},
+        })
+        return count
+
+    def _write_entry(self, url, entry):
+        path = self._path(url)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """删除过期条目，并在总大小超限时按存储时间从旧到新删除"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if time.time() - stat.st_mtime > self.ttl:
+                os.remove(path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def summary(self):
+        """缓存命中统计"""
+        hits = self.stats['not_modified'] + self.stats['unchanged']
+        return (f"HTTP缓存: 命中 {hits} 次 (304未修改: {self.stats['not_modified']}, "
+                f"内容未变: {self.stats['unchanged']})，未命中 {self.stats['miss']} 次")
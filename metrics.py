@@ -0,0 +1,132 @@
+"""
+采集运行指标
+统计每个数据源的抓取耗时和字节数、各来源记录的处理和丢弃原因、各阶段耗时，
+运行结束后写入JSON格式的运行报告
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+REPORT_PATH = os.path.join("data", "run_report.json")
+
+# 记录被丢弃的原因
+REJECT_SHORT_ROW = 'short_row'            # 单元格或参数数量不足
+REJECT_BAD_URL = 'bad_url'                # 缺少URL或URL无效
+REJECT_BAD_TIMESTAMP = 'bad_timestamp'    # 时间无法解析
+REJECT_HEADER_ROW = 'header_row'          # 表头数据
+REJECT_MALFORMED = 'malformed'            # 字段类型不正确（如API返回的嵌套对象或数组）
+
+# 记录被保留但字段被修正的原因
+ADJUST_BAD_TIMESTAMP = 'bad_timestamp'          # 时间无法解析，使用当前时间
+ADJUST_OUT_OF_RANGE_TIME = 'out_of_range_time'  # 时间超出合理范围，使用当前时间
+
+
+class RunMetrics:
+    """一次采集运行的指标，可在多个线程中同时更新"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.sources = {}
+        self.rows = defaultdict(lambda: {'seen': 0, 'accepted': 0, 'rejected': defaultdict(int),
+                                         'adjusted': defaultdict(int)})
+        self.stages = defaultdict(float)
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """累计某个阶段的耗时，多个线程中的同名阶段耗时相加"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] += elapsed
+
+    def record_fetch(self, url, status, latency, size):
+        """记录一次抓取的状态码、耗时（秒）和响应字节数"""
+        self.update_source(url, status=status, latency=round(latency, 4), bytes=size)
+
+    def update_source(self, url, **fields):
+        """更新某个数据源的信息，如来源类型、缓存结果、记录数和错误信息"""
+        with self._lock:
+            self.sources.setdefault(url, {}).update(fields)
+
+    def count_rows(self, source, seen=0, accepted=0):
+        """累计某个来源处理的行数和保留的记录数"""
+        with self._lock:
+            rows = self.rows[source]
+            rows['seen'] += seen
+            rows['accepted'] += accepted
+
+    def reject(self, source, reason, count=1):
+        """记录被丢弃的行及原因"""
+        with self._lock:
+            self.rows[source]['rejected'][reason] += count
+
+    def adjust(self, source, reason, count=1):
+        """记录被修正后保留的行及原因"""
+        with self._lock:
+            self.rows[source]['adjusted'][reason] += count
+
+    def merge_rows(self, rows):
+        """累计其他进程中统计的各来源行数，rows为row_counts()的结果"""
+        with self._lock:
+            for source, counts in rows.items():
+                target = self.rows[source]
+                target['seen'] += counts['seen']
+                target['accepted'] += counts['accepted']
+                for key in ('rejected', 'adjusted'):
+                    for reason, count in counts[key].items():
+                        target[key][reason] += count
+
+    def merge_stages(self, stages):
+        """累计其他进程中统计的各阶段耗时，stages为阶段名到秒数的字典"""
+        with self._lock:
+            for name, seconds in stages.items():
+                self.stages[name] += seconds
+
+    def row_counts(self):
+        """各来源的行数统计，可序列化为JSON或在进程间传递"""
+        with self._lock:
+            return {
+                source: {
+                    'seen': rows['seen'],
+                    'accepted': rows['accepted'],
+                    'rejected': dict(rows['rejected']),
+                    'adjusted': dict(rows['adjusted']),
+                }
+                for source, rows in self.rows.items()
+            }
+
+    def count(self, name, value=1):
+        """累计其他计数，如去重前后的记录数和各输出文件的记录数"""
+        with self._lock:
+            self.counters[name] += value
+
+    def report(self):
+        """生成可序列化为JSON的运行报告"""
+        finished_at = time.time()
+        rows = self.row_counts()
+        with self._lock:
+            return {
+                'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+                'finished_at': datetime.fromtimestamp(finished_at).isoformat(timespec='seconds'),
+                'duration': round(finished_at - self.started_at, 4),
+                'sources': dict(self.sources),
+                'rows': rows,
+                'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                'counters': dict(self.counters),
+            }
+
+    def write_report(self, path=REPORT_PATH):
+        """将运行报告写入JSON文件"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        return path
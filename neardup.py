@@ -0,0 +1,230 @@
+"""
+跨数据源的近似重复检测
+deduplicate_data只合并URL和时间完全相同的记录，同一个服务器在不同来源中还会以
+末尾斜杠不同、端口或路径不同、时间略有出入、名称加了█/﹌/全角字符等形式重复出现。
+这里把记录归并为簇并给出簇编号：
+- 主机名相同、开区时间相差不超过NEAR_TIME_WINDOW，且规范化URL相同或内容相似的记录属于同一簇
+  （同一主机上常有多个不同的服务器，不能只看主机名）
+- 名称和描述经Unicode规范化后的MinHash签名通过LSH分桶，同一桶内时间相近且内容相似的记录属于同一簇
+内容相似指名称的二字片段Jaccard相似度不低于NEAR_NAME_SIMILARITY，且名称加描述的估计相似度不低于阈值
+（同主机为NEAR_HOST_SIMILARITY，不同主机为NEAR_SIMILARITY）；不同服务器常共用相同的宣传描述，只比较描述会误合并
+两种规则都只比较分组或分桶内按时间相邻的记录，整体耗时与记录数大致成线性关系；
+聚类时每条记录只保留比较所需的紧凑数据，LSH逐段分桶，内存占用与记录数成线性关系且每条记录只占几百字节
+"""
+import hashlib
+import operator
+import unicodedata
+from array import array
+from functools import lru_cache
+from itertools import groupby
+from urllib.parse import urlsplit
+
+# 开区时间相差不超过该秒数的记录才可能是同一服务器
+NEAR_TIME_WINDOW = 3600
+
+# MinHash签名长度（分桶数），以及LSH的分段数和每段行数（NUM_PERM = BANDS * ROWS）
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = 4
+
+# 名称和描述的估计Jaccard相似度阈值：不同主机之间，以及同一主机的不同URL之间
+NEAR_SIMILARITY = 0.6
+NEAR_HOST_SIMILARITY = 0.3
+NEAR_NAME_SIMILARITY = 0.6
+
+# 每条记录在同一分组或分桶内最多与之后的多少条记录比较，避免大量同时开区的模板记录退化为平方复杂度
+MAX_NEIGHBOURS = 32
+
+# 填补空桶时按距离加上的偏移，大于任何桶中的哈希值，使借用的值不会与原有的值相同
+_DENSIFY_OFFSET = 1 << 58
+
+# 聚类时签名的每个值折叠为32位（高低32位异或）保存，两个不同的值折叠后相同的概率约为2的-32次方
+_SIGNATURE_TYPECODE = 'I'
+_NO_SIGNATURE = array(_SIGNATURE_TYPECODE, [0] * NUM_PERM)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_text(text):
+    """NFKC规范化并转为小写，只保留文字和数字，去掉█、﹌、★等装饰符号和空白"""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    return ''.join(char for char in text if unicodedata.category(char)[0] in 'LN')
+
+
+def host_key(url):
+    """URL的主机名，去掉www.前缀"""
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def canonical_url(url):
+    """规范化的URL：不含协议、默认端口、参数和末尾斜杠，主机名小写"""
+    parts = urlsplit(url if '//' in url else '//' + url)
+    port = parts.port if parts.port and parts.port != DEFAULT_PORTS.get(parts.scheme) else None
+    netloc = host_key(url) + (f":{port}" if port else '')
+    return netloc + parts.path.rstrip('/')
+
+
+@lru_cache(maxsize=65536)
+def _shingle_hash(shingle):
+    """二字片段的64位哈希，拆分为(桶号, 桶内的值)"""
+    value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value % NUM_PERM, value // NUM_PERM
+
+
+def shingles_of(text):
+    """文本的二字片段集合，单个字符的文本取其本身"""
+    return {text[i:i + 2] for i in range(len(text) - 1)} or ({text} if text else set())
+
+
+def minhash(text):
+    """
+    规范化文本的二字片段集合的MinHash签名，文本过短时返回None
+    使用单次哈希分桶（one permutation hashing）：每个片段只哈希一次，按哈希值分到NUM_PERM个桶中取各桶的最小值，
+    耗时与片段数成正比；空桶借用右侧（循环）最近的非空桶并按距离加上偏移（rotation densification）
+    """
+    shingles = {text[i:i + 2] for i in range(len(text) - 1)}
+    if not shingles:
+        return None
+    bins = [None] * NUM_PERM
+    for shingle in shingles:
+        index, value = _shingle_hash(shingle)
+        current = bins[index]
+        if current is None or value < current:
+            bins[index] = value
+
+    filled = [index for index, value in enumerate(bins) if value is not None]
+    if len(filled) == NUM_PERM:
+        return tuple(bins)
+    # 相邻两个非空桶之间的空桶借用右侧的非空桶，第一个非空桶之前的空桶绕回借用最后一段
+    previous = filled[-1] - NUM_PERM
+    for index in filled:
+        value = bins[index]
+        for position in range(previous + 1, index):
+            bins[position] = value + (index - position) * _DENSIFY_OFFSET
+        previous = index
+    return tuple(bins)
+
+
+@lru_cache(maxsize=65536)
+def _name_shingles(name):
+    """聚类时比较用的名称片段集合，只缓存最近用到的名称，不为每条记录保存集合"""
+    return frozenset(shingles_of(name))
+
+
+def jaccard(left, right):
+    """两个集合的Jaccard相似度"""
+    if not left and not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def similarity(left, right):
+    """由两个MinHash签名估计Jaccard相似度"""
+    return sum(map(operator.eq, left, right)) / NUM_PERM
+
+
+class _DisjointSet:
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, left, right):
+        left, right = self.find(left), self.find(right)
+        if left != right:
+            self.parent[max(left, right)] = min(left, right)
+            return True
+        return False
+
+
+def _link_neighbours(groups, timestamps, sets, accept):
+    """在每个分组内按开区时间排序，把时间相近且满足accept条件的记录合并到同一簇"""
+    for members in groups:
+        if len(members) < 2:
+            continue
+        members = sorted(members, key=timestamps.__getitem__)
+        for offset, index in enumerate(members):
+            timestamp = timestamps[index]
+            for other in members[offset + 1:offset + 1 + MAX_NEIGHBOURS]:
+                if timestamps[other] - timestamp > NEAR_TIME_WINDOW:
+                    break
+                if sets.find(index) == sets.find(other):
+                    continue
+                if accept(index, other):
+                    sets.union(index, other)
+
+
+def cluster_records(records):
+    """
+    对记录做近似重复聚类，返回与records一一对应的簇编号
+    records只遍历一次，可以是生成器；不保存记录本身，只保留unique_id、规范化的名称和URL、开区时间和折叠后的签名
+    簇编号由簇中最小的unique_id生成，同一批记录在不同运行中得到相同的编号
+    """
+    unique_ids, names, urls = [], [], []
+    timestamps = array('q')
+    signatures = array(_SIGNATURE_TYPECODE)
+    signed = bytearray()
+    by_host = {}
+    for index, record in enumerate(records):
+        name = normalize_text(record.server_name)
+        signature = minhash(name + normalize_text(record.description))
+        unique_ids.append(record.unique_id)
+        names.append(name)
+        urls.append(canonical_url(record.server_url))
+        timestamps.append(record.timestamp)
+        signed.append(signature is not None)
+        if signature is None:
+            signatures.extend(_NO_SIGNATURE)
+        else:
+            signatures.extend([(value ^ (value >> 32)) & 0xFFFFFFFF for value in signature])
+        by_host.setdefault(host_key(record.server_url), array('i')).append(index)
+    sets = _DisjointSet(len(unique_ids))
+
+    # 同一分组内相邻的记录会反复比较，最近用到的签名缓存为元组，比较时不必每次从数组中取出
+    @lru_cache(maxsize=4096)
+    def signature_of(index):
+        return tuple(signatures[index * NUM_PERM:(index + 1) * NUM_PERM])
+
+    def similar(left, right, threshold):
+        # 名称集合很小，先比较名称再比较签名
+        return (signed[left] and signed[right] and
+                jaccard(_name_shingles(names[left]), _name_shingles(names[right])) >= NEAR_NAME_SIMILARITY and
+                similarity(signature_of(left), signature_of(right)) >= threshold)
+
+    # 规则一：主机名相同、时间相近，且URL相同或内容相似
+    _link_neighbours(by_host.values(), timestamps, sets,
+                     lambda left, right: urls[left] == urls[right] or similar(left, right, NEAR_HOST_SIMILARITY))
+    del by_host
+
+    # 规则二：名称和描述相似、时间相近，用LSH分桶代替两两比较
+    # 每次只为一段建立分桶：按该段的值排序后相同的值相邻，各段的分桶依次处理完即释放
+    view = memoryview(signatures).cast('B')
+    signature_bytes = NUM_PERM * signatures.itemsize
+    row_bytes = LSH_ROWS * signatures.itemsize
+    signed_indexes = array('i', (index for index, has_signature in enumerate(signed) if has_signature))
+    for band in range(LSH_BANDS):
+        offsets = (index * signature_bytes + band * row_bytes for index in signed_indexes)
+        keys = [view[offset:offset + row_bytes].tobytes() for offset in offsets]
+        # 排序是稳定的，同一分桶内的记录保持原有顺序
+        positions = sorted(range(len(keys)), key=keys.__getitem__)
+        buckets = ([signed_indexes[position] for position in members]
+                   for _, members in groupby(positions, key=keys.__getitem__))
+        _link_neighbours(buckets, timestamps, sets, lambda left, right: similar(left, right, NEAR_SIMILARITY))
+        del keys, positions
+    view.release()
+
+    roots = {}
+    for index, unique_id in enumerate(unique_ids):
+        root = sets.find(index)
+        if root not in roots or unique_id < roots[root]:
+            roots[root] = unique_id
+    labels = {root: "c" + hashlib.blake2b(unique_id.encode('utf-8'), digest_size=5).hexdigest()
+              for root, unique_id in roots.items()}
+    return [labels[sets.find(index)] for index in range(len(unique_ids))]
@@ -0,0 +1,124 @@
+"""
+输出文件
+记录的每行一条记录格式（9pk.txt、30ok.txt、jjj.txt，制表符分隔）、带簇编号的clusters.txt和Markdown表格的读写。
+写入时先在内存中拼接一批行再整块写出；render_markdown不访问网络，也不需要存储，从已保存的文本文件重新生成Markdown
+"""
+import os
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from records import ServerRecord
+
+DATA_DIR = "data"
+
+# 写文件的缓冲区大小，以及每次拼接后写出的行数
+WRITE_BUFFER_BYTES = 1024 * 1024
+WRITE_BATCH_LINES = 1000
+
+# 每行一条记录格式的字段数：名称、URL、类型、时间戳、最低消费、描述、特色
+LINE_FIELDS = 7
+
+MARKDOWN_TITLE = "# 开区信息采集结果\n\n"
+MARKDOWN_HEADER = ("| 服务器名称 | 服务器链接 | 服务器类型 | 开区时间 | 最低消费 | 描述 | 特色 |\n"
+                   "| --- | --- | --- | --- | --- | --- | --- |\n")
+
+
+def data_path(filename, data_dir=DATA_DIR):
+    return os.path.join(data_dir, filename)
+
+
+def format_line(item):
+    return (f"{item.server_name}\t{item.server_url}\t{item.server_type}\t{item.timestamp}\t{item.low_consumption}\t"
+            f"{item.description}\t{item.features}\n")
+
+
+def format_markdown_row(item):
+    time_display = datetime.fromtimestamp(item.timestamp).strftime('%Y-%m-%d %H:%M')
+    return (f"| {item.server_name} | {item.server_url} | {item.server_type} | {time_display} | {item.low_consumption} "
+            f"| {item.description} | {item.features} |\n")
+
+
+def write_formatted(path, lines, head=""):
+    """把head和逐条生成的行写入文件（覆盖原有内容），每WRITE_BATCH_LINES行拼接后写出一次，返回行数"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    with open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_BYTES) as f:
+        f.write(head)
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= WRITE_BATCH_LINES:
+                f.write("".join(batch))
+                count += len(batch)
+                batch = []
+        f.write("".join(batch))
+        count += len(batch)
+    return count
+
+
+def write_lines(data, path):
+    """将记录保存为每行一条记录的格式，data可以是生成器，返回写入的条数"""
+    return write_formatted(path, map(format_line, data))
+
+
+def write_markdown(data, path, generated_at=None):
+    """将记录保存为Markdown表格，generated_at为表头中的采集时间（默认为当前时间），返回写入的条数"""
+    generated_at = generated_at or datetime.now()
+    head = f"{MARKDOWN_TITLE}采集时间: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}\n\n{MARKDOWN_HEADER}"
+    return write_formatted(path, map(format_markdown_row, data), head)
+
+
+def write_clusters(data, cluster_ids, path):
+    """将记录连同簇编号保存为每行一条记录的格式：簇编号、来源和write_lines中的各字段，返回写入的条数"""
+    return write_formatted(path, (f"{cluster_id}\t{item.source}\t{format_line(item)}"
+                                  for cluster_id, item in zip(cluster_ids, data)))
+
+
+def iter_lines(path, source, invalid=None):
+    """
+    逐条读取每行一条记录格式的文件，记录的来源为source
+    字段数不对或时间戳不是整数的行跳过，invalid为列表时把这些行的行号追加到其中
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) != LINE_FIELDS or not fields[3].lstrip('-').isdigit():
+                if invalid is not None:
+                    invalid.append(line_number)
+                continue
+            name, url, server_type, timestamp, low_consumption, description, features = fields
+            yield ServerRecord(source, name, url, server_type, int(timestamp), low_consumption, description, features)
+
+
+def render_markdown(lines_path, markdown_path, source):
+    """
+    从每行一条记录格式的文件重新生成Markdown，采集时间取该文件的修改时间
+    返回(写入的条数, 跳过的行号列表)
+    """
+    invalid = []
+    generated_at = datetime.fromtimestamp(os.path.getmtime(lines_path))
+    count = write_markdown(iter_lines(lines_path, source, invalid), markdown_path, generated_at)
+    return count, invalid
+
+
+def line_file_stats(path, source, now):
+    """
+    统计每行一条记录格式的文件：记录数、跳过的行数、不同主机数、最早和最晚的开区时间戳，
+    以及开区时间不早于now的记录数
+    """
+    invalid = []
+    count = upcoming = 0
+    hosts = set()
+    first = last = None
+    for record in iter_lines(path, source, invalid):
+        count += 1
+        try:
+            hosts.add(urlsplit(record.server_url).hostname)
+        except ValueError:
+            hosts.add(record.server_url)
+        first = record.timestamp if first is None else min(first, record.timestamp)
+        last = record.timestamp if last is None else max(last, record.timestamp)
+        if record.timestamp >= now:
+            upcoming += 1
+    return {'records': count, 'invalid': len(invalid), 'hosts': len(hosts), 'first': first, 'last': last,
+            'upcoming': upcoming}
@@ -0,0 +1,219 @@
+"""
+服务器地址存活探测
+从采集到的server_url中取出不重复的主机:端口，用asyncio并发建立TCP连接（可选再发送HEAD请求），
+记录是否可达和建立连接的耗时。同时进行的探测数有上限，每个地址单独计算超时，慢的地址不影响其他地址；
+探测结果保存在存储的probes表中，有效期内的结果直接复用，多条记录共用的地址只探测一次
+
+命令行: python probe.py [--head] [--concurrency 512] [--timeout 3] [--ttl 1800]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import ssl
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from records import SOURCES, ProbeResult
+from store import DB_PATH, RecordStore
+
+# 同时进行的探测数上限，需小于进程可打开的文件数
+PROBE_CONCURRENCY = 512
+
+# 每个地址建立连接（以及HEAD请求）的超时时间（秒）
+PROBE_TIMEOUT = 3.0
+
+# 探测结果的有效期（秒），有效期内不重复探测
+PROBE_TTL = 1800
+
+PROBE_OUTPUT = os.path.join("data", "probes.txt")
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# 探测失败的原因
+ERROR_TIMEOUT = 'timeout'            # 超时
+ERROR_REFUSED = 'refused'            # 连接被拒绝（端口未监听）
+ERROR_DNS = 'dns'                    # 域名无法解析
+ERROR_UNREACHABLE = 'unreachable'    # 其他网络错误
+ERROR_HEAD = 'head_failed'           # 连接成功但HEAD请求失败
+
+
+def target_of(url):
+    """URL对应的探测目标(地址, 主机, 端口, 协议)，地址形如host:port，无法解析时返回None"""
+    try:
+        parts = urlsplit(url)
+        port = parts.port or DEFAULT_PORTS.get(parts.scheme)
+    except ValueError:
+        return None
+    host = (parts.hostname or '').lower()
+    if not host or port is None:
+        return None
+    endpoint = f"[{host}]:{port}" if ':' in host else f"{host}:{port}"
+    return endpoint, host, port, parts.scheme
+
+
+def collect_targets(urls):
+    """按首次出现的顺序返回不重复的探测目标"""
+    targets = {}
+    for url in urls:
+        target = target_of(url)
+        if target is not None and target[0] not in targets:
+            targets[target[0]] = target
+    return list(targets.values())
+
+
+def _error_reason(error):
+    if isinstance(error, asyncio.TimeoutError):
+        return ERROR_TIMEOUT
+    if isinstance(error, ConnectionRefusedError):
+        return ERROR_REFUSED
+    if isinstance(error, socket.gaierror):
+        return ERROR_DNS
+    return ERROR_UNREACHABLE
+
+
+async def _close(writer):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+
+
+async def _head_status(reader, writer, host):
+    """在已建立的连接上发送HEAD /请求，返回状态码"""
+    writer.write((f"HEAD / HTTP/1.0\r\nHost: {host}\r\nUser-Agent: {USER_AGENT}\r\n"
+                  f"Connection: close\r\n\r\n").encode('latin-1'))
+    await writer.drain()
+    parts = (await reader.readline()).split()
+    if len(parts) < 2 or not parts[1].isdigit():
+        raise ValueError("无效的HTTP响应")
+    return int(parts[1])
+
+
+async def probe_target(target, timeout=PROBE_TIMEOUT, head=False):
+    """
+    探测单个目标：建立TCP连接并记录耗时，head为True时再发送HEAD请求取得状态码
+    https地址的HEAD请求使用新的TLS连接（不校验证书），连接耗时只计TCP连接
+    """
+    endpoint, host, port, scheme = target
+    checked_at = int(time.time())
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        return ProbeResult(endpoint, False, None, None, _error_reason(e), checked_at)
+    latency_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    status = error = None
+    try:
+        if head:
+            if scheme == 'https':
+                await _close(writer)
+                context = ssl.create_default_context()
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(host, port, ssl=context, server_hostname=host), timeout)
+            status = await asyncio.wait_for(_head_status(reader, writer, host), timeout)
+    except (OSError, ValueError, asyncio.TimeoutError, ssl.SSLError):
+        error = ERROR_HEAD
+    finally:
+        await _close(writer)
+    return ProbeResult(endpoint, True, latency_ms, status, error, checked_at)
+
+
+async def probe_targets(targets, timeout=PROBE_TIMEOUT, concurrency=PROBE_CONCURRENCY, head=False,
+                        host_timeouts=None):
+    """
+    并发探测多个目标，同时进行的探测不超过concurrency个，结果与targets一一对应
+    host_timeouts可以为个别主机指定超时时间，其余主机使用timeout
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    host_timeouts = host_timeouts or {}
+
+    async def bounded(target):
+        async with semaphore:
+            return await probe_target(target, host_timeouts.get(target[1], timeout), head)
+
+    return await asyncio.gather(*(bounded(target) for target in targets))
+
+
+def probe_urls(urls, store=None, ttl=PROBE_TTL, **options):
+    """
+    探测URL所在的地址，返回({地址: ProbeResult}, 本次实际探测的地址数)
+    传入store时复用有效期内的探测结果，并把新的结果写回store；options传给probe_targets
+    """
+    targets = collect_targets(urls)
+    cached = store.probes(int(time.time()) - ttl) if store is not None else {}
+    pending = [target for target in targets if target[0] not in cached]
+    fresh = asyncio.run(probe_targets(pending, **options)) if pending else []
+    if store is not None and fresh:
+        store.save_probes(fresh)
+
+    results = {target[0]: cached[target[0]] for target in targets if target[0] in cached}
+    results.update((result.endpoint, result) for result in fresh)
+    return results, len(pending)
+
+
+def result_for(record, results):
+    """记录对应的探测结果，URL无法解析或未探测时返回None"""
+    target = target_of(record.server_url)
+    return results.get(target[0]) if target else None
+
+
+def save_probe_report(records, results, path=PROBE_OUTPUT):
+    """
+    将记录连同探测结果保存为每行一条记录的格式：是否可达（1/0）、连接耗时（毫秒）、HEAD状态码、
+    失败原因，之后为save_as_lines中的各字段；未探测的记录前四列为空
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            result = result_for(record, results)
+            if result is None:
+                probe_fields = ['', '', '', '']
+            else:
+                probe_fields = [str(int(result.alive)),
+                                '' if result.latency_ms is None else str(result.latency_ms),
+                                '' if result.status is None else str(result.status),
+                                result.error or '']
+            f.write("\t".join(probe_fields + [record.server_name, record.server_url, record.server_type,
+                                              str(record.timestamp), record.low_consumption,
+                                              record.description, record.features]) + "\n")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="服务器地址存活探测")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite存储路径")
+    parser.add_argument('--head', action='store_true', help="连接成功后再发送HEAD请求")
+    parser.add_argument('--concurrency', type=int, default=PROBE_CONCURRENCY, help="同时进行的探测数上限")
+    parser.add_argument('--timeout', type=float, default=PROBE_TIMEOUT, help="每个地址的超时时间（秒）")
+    parser.add_argument('--ttl', type=int, default=PROBE_TTL, help="探测结果的有效期（秒），0表示全部重新探测")
+    parser.add_argument('--output', default=PROBE_OUTPUT)
+    args = parser.parse_args()
+
+    store = RecordStore(args.db)
+    try:
+        records = store.latest_run(SOURCES)
+        start = time.perf_counter()
+        results, probed = probe_urls([record.server_url for record in records], store, args.ttl,
+                                     timeout=args.timeout, concurrency=args.concurrency, head=args.head)
+        elapsed = time.perf_counter() - start
+    finally:
+        store.close()
+
+    alive = [result for result in results.values() if result.alive]
+    latencies = [result.latency_ms for result in alive]
+    print(f"{len(records)} 条记录共 {len(results)} 个地址，本次探测 {probed} 个，耗时 {elapsed:.2f}s")
+    print(f"可达 {len(alive)} 个，不可达 {len(results) - len(alive)} 个"
+          + (f"，连接耗时中位数 {statistics.median(latencies):.1f}ms" if latencies else ""))
+    print(f"探测结果已保存到 {save_probe_report(records, results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
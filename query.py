@@ -0,0 +1,346 @@
+"""
+开区信息查询
+把存储中的记录载入内存索引：按开区时间排序的数组用于时间范围查询，
+server_type的二字倒排索引和主机名倒排索引用于按类型、主机过滤，
+之后可以从存储或新的采集结果增量刷新
+
+命令行:     python query.py search --hours 3 --type 单职业
+本地HTTP:   python query.py serve --port 8765，然后访问 /query?hours=3&type=单职业
+"""
+import argparse
+import heapq
+import json
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from store import DB_PATH, RecordStore
+
+QUERY_HOST = '127.0.0.1'
+QUERY_PORT = 8765
+
+# 默认返回的最多记录数
+QUERY_LIMIT = 100
+
+# HTTP服务从存储增量刷新索引的间隔（秒）
+REFRESH_INTERVAL = 60
+
+# 一次新增的记录超过已有记录的该比例时重新排序整个时间数组，否则逐条插入
+REBUILD_RATIO = 0.125
+
+TIME_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d']
+
+EMPTY = frozenset()
+
+
+def type_grams(text):
+    """server_type的索引词：相邻两个字符的组合（不区分大小写）"""
+    text = text.lower()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def host_of(url):
+    """URL的主机名（不含端口，小写）"""
+    return (urlsplit(url).hostname or '').lower()
+
+
+def parse_time_arg(value):
+    """解析命令行或查询参数中的时间：时间戳或 2025-10-16 14:00 形式的本地时间"""
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    for fmt in TIME_FORMATS:
+        try:
+            return int(datetime.strptime(value, fmt).timestamp())
+        except ValueError:
+            continue
+    raise ValueError(f"无法识别的时间: {value}")
+
+
+class RecordIndex:
+    """开区信息的内存索引，可在多个线程中同时查询和刷新"""
+
+    def __init__(self):
+        self.records = []                     # 位置 -> 记录，删除后为None
+        self.positions = {}                   # unique_id -> 位置
+        self.times = array('q')               # 按开区时间排序的时间戳
+        self.order = array('q')               # 与times对应的记录位置
+        self.type_index = defaultdict(set)    # server_type的二字组合 -> 位置集合
+        self.host_index = defaultdict(set)    # 主机名 -> 位置集合
+        self.watermark = 0                    # 已载入的存储记录中最大的最近出现时间
+        self.removed = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _index_terms(self, position, record):
+        for gram in type_grams(record.server_type):
+            self.type_index[gram].add(position)
+        self.host_index[host_of(record.server_url)].add(position)
+
+    def _unindex_terms(self, position, record):
+        for gram in type_grams(record.server_type):
+            self.type_index[gram].discard(position)
+        self.host_index[host_of(record.server_url)].discard(position)
+
+    def _rebuild_times(self):
+        pairs = sorted((record.timestamp, position) for position, record in enumerate(self.records)
+                       if record is not None)
+        self.times = array('q', (timestamp for timestamp, _ in pairs))
+        self.order = array('q', (position for _, position in pairs))
+
+    def update(self, records):
+        """加入新记录，unique_id已存在的记录替换为新内容，返回新增的条数"""
+        with self._lock:
+            added = []
+            for record in records:
+                position = self.positions.get(record.unique_id)
+                if position is not None:
+                    # unique_id包含开区时间，替换内容不影响时间数组
+                    self._unindex_terms(position, self.records[position])
+                    self.records[position] = record
+                else:
+                    position = len(self.records)
+                    self.records.append(record)
+                    self.positions[record.unique_id] = position
+                    added.append((record.timestamp, position))
+                self._index_terms(position, record)
+
+            if len(added) > len(self.times) * REBUILD_RATIO:
+                self._rebuild_times()
+            else:
+                for timestamp, position in added:
+                    index = bisect_right(self.times, timestamp)
+                    self.times.insert(index, timestamp)
+                    self.order.insert(index, position)
+            return len(added)
+
+    def remove(self, unique_ids):
+        """删除记录，返回删除的条数"""
+        with self._lock:
+            count = 0
+            for unique_id in unique_ids:
+                position = self.positions.pop(unique_id, None)
+                if position is None:
+                    continue
+                record = self.records[position]
+                self._unindex_terms(position, record)
+                self.records[position] = None
+                index = bisect_left(self.times, record.timestamp)
+                while self.order[index] != position:
+                    index += 1
+                del self.times[index]
+                del self.order[index]
+                count += 1
+            self.removed += count
+            # 删除的记录过多时整理位置，释放空位
+            if self.removed > len(self.records) // 2:
+                self._compact()
+            return count
+
+    def _compact(self):
+        records = [record for record in self.records if record is not None]
+        self.records = []
+        self.positions = {}
+        self.type_index = defaultdict(set)
+        self.host_index = defaultdict(set)
+        self.times = array('q')
+        self.order = array('q')
+        self.removed = 0
+        self.update(records)
+
+    def refresh(self, store):
+        """从存储载入上次刷新之后写入或再次出现的记录，返回新增的条数"""
+        records, latest = store.seen_since(self.watermark)
+        added = self.update(records)
+        self.watermark = latest
+        return added
+
+    def query(self, start=None, end=None, server_type=None, host=None, source=None, limit=QUERY_LIMIT):
+        """
+        按开区时间范围、类型（子串）、主机名和来源查询，结果按开区时间排序
+        有类型或主机条件时先求倒排索引集合的交集，交集比时间范围小时直接在交集上过滤
+        """
+        server_type = server_type.lower() if server_type else None
+        host = host.lower() if host else None
+        with self._lock:
+            low = bisect_left(self.times, start) if start is not None else 0
+            high = bisect_right(self.times, end) if end is not None else len(self.times)
+
+            postings = []
+            if server_type:
+                postings.extend(self.type_index.get(gram, EMPTY) for gram in type_grams(server_type))
+            if host:
+                postings.append(self.host_index.get(host, EMPTY))
+            candidates = None
+            if postings:
+                postings.sort(key=len)
+                candidates = postings[0].intersection(*postings[1:]) if len(postings) > 1 else postings[0]
+
+            def matches(record):
+                return ((not server_type or server_type in record.server_type.lower()) and
+                        (source is None or record.source == source))
+
+            if candidates is not None and len(candidates) < high - low:
+                results = []
+                for position in candidates:
+                    record = self.records[position]
+                    if ((start is None or record.timestamp >= start) and
+                            (end is None or record.timestamp <= end) and matches(record)):
+                        results.append(record)
+                return heapq.nsmallest(limit, results, key=lambda record: record.timestamp)
+
+            results = []
+            for index in range(low, high):
+                position = self.order[index]
+                if candidates is None or position in candidates:
+                    record = self.records[position]
+                    if matches(record):
+                        results.append(record)
+                        if len(results) >= limit:
+                            break
+            return results
+
+
+def load_index(db_path=DB_PATH):
+    """从存储载入全部记录"""
+    index = RecordIndex()
+    store = RecordStore(db_path)
+    try:
+        index.refresh(store)
+    finally:
+        store.close()
+    return index
+
+
+def query_args(params):
+    """把命令行参数或HTTP查询参数转换为RecordIndex.query的参数"""
+    start = parse_time_arg(params['start']) if params.get('start') else None
+    end = parse_time_arg(params['end']) if params.get('end') else None
+    if params.get('hours'):
+        start = start if start is not None else int(time.time())
+        end = start + int(float(params['hours']) * 3600)
+    return {
+        'start': start,
+        'end': end,
+        'server_type': params.get('type') or None,
+        'host': params.get('host') or None,
+        'source': params.get('source') or None,
+        'limit': int(params.get('limit') or QUERY_LIMIT),
+    }
+
+
+def format_record(record):
+    opens_at = datetime.fromtimestamp(record.timestamp).strftime('%Y-%m-%d %H:%M')
+    return f"{opens_at}\t{record.source}\t{record.server_name}\t{record.server_url}\t{record.server_type}"
+
+
+def make_handler(index):
+    """生成HTTP请求处理类：/query返回JSON格式的查询结果，/stats返回索引规模"""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path == '/query':
+                params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+                try:
+                    kwargs = query_args(params)
+                except ValueError as e:
+                    self.send_json(400, {'error': str(e)})
+                    return
+                started = time.perf_counter()
+                records = index.query(**kwargs)
+                took = (time.perf_counter() - started) * 1000
+                self.send_json(200, {'count': len(records), 'took_ms': round(took, 3),
+                                     'records': [record.to_dict() for record in records]})
+            elif parts.path == '/stats':
+                self.send_json(200, {'records': len(index), 'watermark': index.watermark})
+            else:
+                self.send_json(404, {'error': 'not found'})
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(db_path=DB_PATH, host=QUERY_HOST, port=QUERY_PORT, refresh_interval=REFRESH_INTERVAL):
+    """启动本地HTTP查询服务，后台定时从存储增量刷新索引"""
+    index = load_index(db_path)
+    stop_event = threading.Event()
+
+    def refresh_loop():
+        while not stop_event.wait(refresh_interval):
+            store = RecordStore(db_path)
+            try:
+                added = index.refresh(store)
+            finally:
+                store.close()
+            if added:
+                print(f"索引已刷新，新增 {added} 条，共 {len(index)} 条")
+
+    threading.Thread(target=refresh_loop, daemon=True).start()
+    server = ThreadingHTTPServer((host, port), make_handler(index))
+    print(f"已载入 {len(index)} 条记录，查询服务: http://{host}:{server.server_port}/query")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        server.server_close()
+
+
+def add_query_arguments(parser):
+    parser.add_argument('--start', help="开区时间下限（时间戳或 2025-10-16 14:00）")
+    parser.add_argument('--end', help="开区时间上限")
+    parser.add_argument('--hours', type=float, help="从--start（默认当前时间）起的小时数")
+    parser.add_argument('--type', help="服务器类型包含的文本")
+    parser.add_argument('--host', help="服务器主机名")
+    parser.add_argument('--source', choices=['9pk', 'jjj', 'api'])
+    parser.add_argument('--limit', type=int, default=QUERY_LIMIT)
+    parser.add_argument('--json', action='store_true', help="以JSON Lines格式输出")
+
+
+def search_main(args):
+    index = load_index(args.db)
+    params = {key: getattr(args, key) for key in ('start', 'end', 'hours', 'type', 'host', 'source', 'limit')}
+    records = index.query(**query_args(params))
+    for record in records:
+        print(json.dumps(record.to_dict(), ensure_ascii=False) if args.json else format_record(record))
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="开区信息查询")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite存储路径")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    add_query_arguments(subparsers.add_parser('search', help="查询并输出记录"))
+    serve_parser = subparsers.add_parser('serve', help="启动本地HTTP查询服务")
+    serve_parser.add_argument('--host', default=QUERY_HOST)
+    serve_parser.add_argument('--port', type=int, default=QUERY_PORT)
+    serve_parser.add_argument('--refresh', type=float, default=REFRESH_INTERVAL, help="增量刷新间隔（秒）")
+    args = parser.parse_args(argv)
+
+    if args.command == 'search':
+        search_main(args)
+    else:
+        serve(args.db, args.host, args.port, args.refresh)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+开区信息记录
+所有数据源采集到的记录统一使用ServerRecord表示，来源通过source字段显式记录
+"""
+
+# 数据来源
+SOURCE_9PK = '9pk'    # 9pk表格页面
+SOURCE_JJJ = 'jjj'    # jjj.com页面中的o4调用
+SOURCE_API = 'api'    # gameAd/getList接口（输出到30ok）
+
+SOURCES = (SOURCE_9PK, SOURCE_JJJ, SOURCE_API)
+
+
+class ServerRecord:
+    """
+    一条开区信息
+    source为数据来源，timestamp为整数时间戳，其余字段均为字符串；
+    time_substituted表示开区时间无法解析或超出合理范围，校验时改用了运行时间（见rules.RowValidator）
+    """
+
+    __slots__ = ('source', 'server_name', 'server_url', 'server_type', 'timestamp',
+                 'low_consumption', 'description', 'features', 'time_substituted')
+
+    def __init__(self, source, server_name, server_url, server_type, timestamp,
+                 low_consumption, description, features, time_substituted=False):
+        self.source = source
+        self.server_name = server_name
+        self.server_url = server_url
+        self.server_type = server_type
+        self.timestamp = timestamp
+        self.low_consumption = low_consumption
+        self.description = description
+        self.features = features
+        self.time_substituted = bool(time_substituted)
+
+    @property
+    def unique_id(self):
+        """存储中使用的唯一标识，jjj.com的记录带有_jjj_后缀，与历史数据保持一致"""
+        suffix = "_jjj_" if self.source == SOURCE_JJJ else ""
+        return f"{self.server_url}_{self.timestamp}{suffix}"
+
+    @property
+    def dedup_key(self):
+        """去重键：同一时间的相同URL视为重复"""
+        return (self.server_url, self.timestamp)
+
+    def to_tuple(self):
+        """
+        按__slots__的顺序转换为元组，用于缓存等紧凑的序列化
+        time_substituted只在为True时附加在末尾，其他记录的元组（及缓存、内容哈希）与原来相同
+        """
+        values = (self.source, self.server_name, self.server_url, self.server_type, self.timestamp,
+                  self.low_consumption, self.description, self.features)
+        return values + (True,) if self.time_substituted else values
+
+    @classmethod
+    def from_tuple(cls, values):
+        return cls(*values)
+
+    def to_dict(self):
+        """转换为字典，用于JSON输出"""
+        return dict(zip(self.__slots__, self.to_tuple()), unique_id=self.unique_id)
+
+    def __eq__(self, other):
+        if not isinstance(other, ServerRecord):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    def __hash__(self):
+        return hash(self.to_tuple())
+
+    def __repr__(self):
+        return (f"ServerRecord(source={self.source!r}, server_name={self.server_name!r}, "
+                f"server_url={self.server_url!r}, timestamp={self.timestamp!r})")
+
+
+class ProbeResult:
+    """
+    一个服务器地址（主机:端口）的存活探测结果
+    alive表示TCP连接是否成功，latency_ms为建立连接的耗时（毫秒），status为HEAD请求的HTTP状态码（未请求时为None），
+    error为失败原因，checked_at为探测时间戳
+    """
+
+    __slots__ = ('endpoint', 'alive', 'latency_ms', 'status', 'error', 'checked_at')
+
+    def __init__(self, endpoint, alive, latency_ms, status, error, checked_at):
+        self.endpoint = endpoint
+        self.alive = bool(alive)
+        self.latency_ms = latency_ms
+        self.status = status
+        self.error = error
+        self.checked_at = checked_at
+
+    def to_tuple(self):
+        return (self.endpoint, self.alive, self.latency_ms, self.status, self.error, self.checked_at)
+
+    def to_dict(self):
+        return dict(zip(self.__slots__, self.to_tuple()))
+
+    def __repr__(self):
+        return (f"ProbeResult(endpoint={self.endpoint!r}, alive={self.alive!r}, "
+                f"latency_ms={self.latency_ms!r}, status={self.status!r}, error={self.error!r})")
+
+
+# 输出文件
+SINK_9PK = '9pk'
+SINK_30OK = '30ok'
+SINK_JJJ = 'jjj'
+SINKS = (SINK_9PK, SINK_30OK, SINK_JJJ)
+
+
+def sinks_of(record):
+    """
+    记录所属的输出文件
+    9pk.txt沿用原有规则，包含除API数据以外、URL中不含jjj.com的所有记录（jjj.com的记录同时出现在9pk和jjj中）
+    """
+    if record.source == SOURCE_API:
+        return (SINK_30OK,)
+    in_9pk = "jjj.com" not in record.server_url
+    if record.source == SOURCE_JJJ:
+        return (SINK_JJJ, SINK_9PK) if in_9pk else (SINK_JJJ,)
+    return (SINK_9PK,) if in_9pk else ()
+
+
+def iter_sink(records, sink):
+    """逐条筛选属于某个输出文件的记录，不保存整个列表"""
+    return (record for record in records if sink in sinks_of(record))
+
+
+def tally_sinks(records, counts):
+    """逐条返回记录，同时在counts（Counter）中累计各输出文件的记录数"""
+    for record in records:
+        counts.update(sinks_of(record))
+        yield record
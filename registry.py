@@ -0,0 +1,121 @@
+"""
+数据源注册表
+每个数据源对应一个页面或接口地址，以及解析方式、页面编码和输出文件。注册表保存在sources.json中：
+
+    {"sources": [
+        {"name": "9pk-index", "url": "https://.../", "parser": "table_rows", "encoding": "utf-8", "sink": "9pk"},
+        {"name": "jjj", "url": "https://jjj.com", "parser": "o4_calls", "encoding": "gb2312", "sink": "jjj"},
+        {"name": "api", "url": "https://.../getList", "parser": "json_api", "sink": "30ok"}
+    ]}
+
+解析方式为9pk表格行（table_rows）、jjj.com页面中的o4调用（o4_calls）或getList分页接口（json_api）；
+输出文件决定记录的来源字段，记录按sinks_of的规则写入9pk.txt、30ok.txt和jjj.txt
+"""
+import json
+import os
+
+from records import SINK_9PK, SINK_30OK, SINK_JJJ, SINKS, SOURCE_9PK, SOURCE_API, SOURCE_JJJ
+
+REGISTRY_PATH = "sources.json"
+
+# 解析方式
+PARSER_TABLE_ROWS = 'table_rows'    # 带onmouseover属性的表格行
+PARSER_O4_CALLS = 'o4_calls'        # JavaScript的o4(...)调用
+PARSER_JSON_API = 'json_api'        # getList分页接口
+PARSERS = (PARSER_TABLE_ROWS, PARSER_O4_CALLS, PARSER_JSON_API)
+
+# 各解析方式默认的页面编码
+DEFAULT_ENCODINGS = {PARSER_TABLE_ROWS: 'utf-8', PARSER_O4_CALLS: 'gb2312', PARSER_JSON_API: 'utf-8'}
+
+# 输出文件对应的记录来源，以及各解析方式生成的记录的来源
+SINK_SOURCES = {SINK_9PK: SOURCE_9PK, SINK_JJJ: SOURCE_JJJ, SINK_30OK: SOURCE_API}
+PARSER_SOURCES = {PARSER_TABLE_ROWS: SOURCE_9PK, PARSER_O4_CALLS: SOURCE_JJJ, PARSER_JSON_API: SOURCE_API}
+
+
+class SourceSpec:
+    """注册表中的一个数据源"""
+
+    __slots__ = ('name', 'url', 'parser', 'encoding', 'sink')
+
+    def __init__(self, name, url, parser, encoding=None, sink=None):
+        self.name = name
+        self.url = url
+        self.parser = parser
+        self.encoding = encoding or DEFAULT_ENCODINGS[parser]
+        self.sink = sink
+
+    @property
+    def source(self):
+        """该数据源的记录的来源字段"""
+        return SINK_SOURCES[self.sink]
+
+    @property
+    def parser_source(self):
+        """解析方式生成的记录的来源字段，与source不同时采集后改为source"""
+        return PARSER_SOURCES[self.parser]
+
+    def matches(self, url):
+        """URL是否属于该数据源，API的分页地址也属于API"""
+        if url == self.url:
+            return True
+        return self.parser == PARSER_JSON_API and url.startswith(self.url + ('&' if '?' in self.url else '?'))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"SourceSpec(name={self.name!r}, url={self.url!r}, parser={self.parser!r}, sink={self.sink!r})"
+
+
+def parse_registry(data):
+    """校验注册表的内容并返回SourceSpec列表，格式不正确时抛出ValueError"""
+    entries = data.get('sources') if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("注册表中没有sources列表")
+    specs, names, urls = [], set(), set()
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not entry.get('url'):
+            raise ValueError(f"第 {index + 1} 个数据源缺少url")
+        parser = entry.get('parser')
+        if parser not in PARSERS:
+            raise ValueError(f"数据源 {entry['url']} 的解析方式 {parser!r} 无效，应为 {', '.join(PARSERS)}")
+        sink = entry.get('sink')
+        if sink not in SINKS:
+            raise ValueError(f"数据源 {entry['url']} 的输出文件 {sink!r} 无效，应为 {', '.join(SINKS)}")
+        encoding = entry.get('encoding')
+        if encoding is not None:
+            try:
+                ''.encode(encoding)
+            except LookupError:
+                raise ValueError(f"数据源 {entry['url']} 的编码 {encoding!r} 无效") from None
+        name = entry.get('name') or entry['url']
+        if name in names or entry['url'] in urls:
+            raise ValueError(f"数据源 {name} 重复")
+        names.add(name)
+        urls.add(entry['url'])
+        specs.append(SourceSpec(name, entry['url'], parser, encoding, sink))
+    return specs
+
+
+def load_registry(path=REGISTRY_PATH):
+    """读取注册表文件，文件不存在时返回None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise ValueError(f"注册表 {path} 不是有效的JSON: {e}") from None
+    return parse_registry(data)
+
+
+def default_spec(url):
+    """按原有规则推断网页的数据源：URL中含jjj.com的为o4调用页面，其他为9pk表格页面"""
+    if 'jjj.com' in url:
+        return SourceSpec(url, url, PARSER_O4_CALLS, sink=SINK_JJJ)
+    return SourceSpec(url, url, PARSER_TABLE_ROWS, sink=SINK_9PK)
+
+
+def default_registry(urls, api_url):
+    """没有注册表文件时，由网页地址列表和API地址生成注册表，API排在最后"""
+    return [default_spec(url) for url in urls] + [SourceSpec(api_url, api_url, PARSER_JSON_API, sink=SINK_30OK)]
@@ -0,0 +1,222 @@
+"""
+开区数的分桶汇总
+按开区时间的小时桶和日桶分来源统计开区数（每条记录即每个unique_id只计一次），并按服务器类型中的词和主机名细分。
+汇总表保存在存储的rollups表中：每次运行写入存储后，只把本次首次出现（first_seen为本次运行时间）的记录累加进去，
+不重新读取历史记录；已累加的运行记录在rollup_runs表中，同一次运行不会重复累加。
+开区时间无效、改用运行时间的记录（records表的time_substituted列）每次重新解析都是新的unique_id，不计入汇总。
+汇总时按列计算：开区时间和汇总键各为一个整数数组，按(桶号, 汇总键)用Counter计数。
+导出只读取汇总表中所选粒度、时间范围和维度的行，耗时与历史记录数无关
+"""
+import csv
+import json
+import time
+import unicodedata
+from array import array
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+
+from neardup import host_key
+
+# 粒度名称 -> 桶的秒数
+GRAIN_HOUR = 'hour'
+GRAIN_DAY = 'day'
+GRAINS = {GRAIN_HOUR: 3600, GRAIN_DAY: 86400}
+
+# 日桶和一天中的小时按本机的标准时区划分，与输出文件中显示的开区时间一致（不考虑夏令时）
+BUCKET_UTC_OFFSET = -time.timezone
+
+# 细分维度：不细分（值为空字符串）、服务器类型中的词、主机名
+DIMENSION_ALL = 'all'
+DIMENSION_TYPE = 'type'
+DIMENSION_HOST = 'host'
+DIMENSIONS = (DIMENSION_ALL, DIMENSION_TYPE, DIMENSION_HOST)
+
+# 各粒度汇总的维度：主机名按小时细分时几乎每条记录一行，只按日汇总
+GRAIN_DIMENSIONS = {
+    GRAIN_HOUR: (DIMENSION_ALL, DIMENSION_TYPE),
+    GRAIN_DAY: (DIMENSION_ALL, DIMENSION_TYPE, DIMENSION_HOST),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    grain TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    openings INTEGER NOT NULL,
+    PRIMARY KEY (grain, dimension, bucket, source, value)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_rollups_value ON rollups (grain, dimension, value, bucket);
+CREATE TABLE IF NOT EXISTS rollup_runs (
+    run_at INTEGER PRIMARY KEY,
+    records INTEGER NOT NULL
+);
+"""
+
+ADD_SQL = """
+INSERT INTO rollups (grain, bucket, source, dimension, value, openings) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (grain, dimension, bucket, source, value) DO UPDATE SET openings = openings + excluded.openings
+"""
+
+# 导出的字段
+BUCKET_FIELDS = ['grain', 'bucket', 'bucket_time', 'source', 'dimension', 'value', 'openings']
+HOUR_OF_DAY_FIELDS = ['hour', 'source', 'dimension', 'value', 'openings']
+
+
+@lru_cache(maxsize=65536)
+def type_tokens(server_type):
+    """服务器类型中的词：NFKC规范化并转为小写后，被█、﹌、空白等装饰符号隔开的连续文字和数字，去重并保持顺序"""
+    text = unicodedata.normalize('NFKC', server_type).casefold()
+    text = ''.join(char if unicodedata.category(char)[0] in 'LN' else ' ' for char in text)
+    return tuple(dict.fromkeys(text.split()))
+
+
+def bucket_start(timestamp, grain):
+    """时间戳所在桶的起始时间戳"""
+    width = GRAINS[grain]
+    return (timestamp + BUCKET_UTC_OFFSET) // width * width - BUCKET_UTC_OFFSET
+
+
+def count_buckets(times, keys, width):
+    """按桶和汇总键计数，times和keys为等长的整数数组（array('q')），逐个返回(桶起始时间戳, 汇总键, 条数)"""
+    counts = Counter(zip([(timestamp + BUCKET_UTC_OFFSET) // width for timestamp in times], keys))
+    for (bucket, key), count in counts.items():
+        yield bucket * width - BUCKET_UTC_OFFSET, key, count
+
+
+def aggregate(rows):
+    """
+    汇总记录，rows为(来源, 开区时间戳, 服务器类型, 服务器URL)，只遍历一次
+    返回汇总行列表[(粒度, 桶起始时间戳, 来源, 维度, 值, 开区数)]和记录数
+    """
+    key_ids = {}    # (来源, 维度, 值) -> 汇总键
+    columns = {dimension: (array('q'), array('q')) for dimension in DIMENSIONS}
+
+    def append(dimension, key, timestamp):
+        times, keys = columns[dimension]
+        times.append(timestamp)
+        keys.append(key_ids.setdefault(key, len(key_ids)))
+
+    count = 0
+    for source, timestamp, server_type, server_url in rows:
+        count += 1
+        append(DIMENSION_ALL, (source, DIMENSION_ALL, ''), timestamp)
+        for token in type_tokens(server_type):
+            append(DIMENSION_TYPE, (source, DIMENSION_TYPE, token), timestamp)
+        append(DIMENSION_HOST, (source, DIMENSION_HOST, host_key(server_url)), timestamp)
+
+    keys = list(key_ids)
+    results = []
+    for grain, width in GRAINS.items():
+        for dimension in GRAIN_DIMENSIONS[grain]:
+            times, ids = columns[dimension]
+            for bucket, key, openings in count_buckets(times, ids, width):
+                results.append((grain, bucket, *keys[key], openings))
+    return results, count
+
+
+class Rollups:
+    """存储中的分桶汇总表，与RecordStore共用连接"""
+
+    def __init__(self, store):
+        self.conn = store.conn
+        self.conn.executescript(SCHEMA)
+
+    def empty(self):
+        """汇总表中还没有累加任何运行"""
+        return self.conn.execute("SELECT 1 FROM rollup_runs LIMIT 1").fetchone() is None
+
+    def ingested(self, run_at):
+        """该次运行是否已累加到汇总表"""
+        return self.conn.execute("SELECT 1 FROM rollup_runs WHERE run_at = ?", (run_at,)).fetchone() is not None
+
+    def ingest(self, run_at):
+        """
+        把某次运行中首次出现的记录累加到汇总表，在该次运行的记录写入存储之后调用，返回累加的记录数
+        该次运行已累加过时返回0；汇总表中还没有任何运行时（存储先于汇总表存在），改为从全部记录重新汇总
+        """
+        if self.empty():
+            return self.rebuild()
+        if self.ingested(run_at):
+            return 0
+        cursor = self.conn.execute(
+            "SELECT source, timestamp, server_type, server_url FROM records "
+            "WHERE first_seen = ? AND NOT time_substituted", (run_at,))
+        results, count = aggregate(cursor)
+        with self.conn:
+            self.conn.executemany(ADD_SQL, results)
+            self.conn.execute("INSERT INTO rollup_runs (run_at, records) VALUES (?, ?)", (run_at, count))
+        return count
+
+    def rebuild(self):
+        """清空汇总表，从存储中的全部记录重新汇总（记录内容取当前内容，跳过开区时间被代替的记录），返回汇总的记录数"""
+        cursor = self.conn.execute(
+            "SELECT source, timestamp, server_type, server_url FROM records WHERE NOT time_substituted")
+        results, count = aggregate(cursor)
+        with self.conn:
+            self.conn.execute("DELETE FROM rollups")
+            self.conn.execute("DELETE FROM rollup_runs")
+            self.conn.executemany(ADD_SQL, results)
+            self.conn.execute("INSERT INTO rollup_runs (run_at, records) "
+                              "SELECT first_seen, SUM(NOT time_substituted) FROM records GROUP BY first_seen")
+        return count
+
+    def _where(self, grain, since, until, source, dimension, value):
+        conditions = ["grain = ?", "dimension = ?"]
+        params = [grain, dimension]
+        for condition, param in (("bucket >= ?", since), ("bucket <= ?", until), ("source = ?", source),
+                                 ("value = ?", value)):
+            if param is not None:
+                conditions.append(condition)
+                params.append(param)
+        return " AND ".join(conditions), params
+
+    def buckets(self, grain=GRAIN_DAY, since=None, until=None, source=None, dimension=DIMENSION_ALL, value=None):
+        """
+        桶起始时间在[since, until]内的汇总行，按桶、来源和值排序
+        返回[(粒度, 桶起始时间戳, 来源, 维度, 值, 开区数)]
+        """
+        where, params = self._where(grain, since, until, source, dimension, value)
+        return self.conn.execute(
+            f"SELECT grain, bucket, source, dimension, value, openings FROM rollups WHERE {where} "
+            f"ORDER BY bucket, source, value", params).fetchall()
+
+    def hour_of_day(self, since=None, until=None, source=None, dimension=DIMENSION_ALL, value=None):
+        """按一天中的小时（本机时区）合计小时桶，返回[(小时, 来源, 维度, 值, 开区数)]"""
+        where, params = self._where(GRAIN_HOUR, since, until, source, dimension, value)
+        return self.conn.execute(
+            f"SELECT (bucket + ?) / 3600 % 24 AS hour, source, dimension, value, SUM(openings) FROM rollups "
+            f"WHERE {where} GROUP BY hour, source, dimension, value ORDER BY hour, source, value",
+            [BUCKET_UTC_OFFSET] + params).fetchall()
+
+
+@lru_cache(maxsize=4096)
+def bucket_time(bucket):
+    """桶起始的本地时间，同一个桶通常有多行汇总"""
+    return datetime.fromtimestamp(bucket).strftime('%Y-%m-%d %H:%M')
+
+
+def bucket_rows(rows):
+    """在buckets返回的汇总行中加入桶起始的本地时间，字段与BUCKET_FIELDS对应"""
+    for grain, bucket, source, dimension, value, openings in rows:
+        yield grain, bucket, bucket_time(bucket), source, dimension, value, openings
+
+
+def export(rows, fields, fmt, f):
+    """把与fields对应的行逐条写入文件对象f，fmt为csv（带表头）或json（对象数组），返回行数"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+    f.write("[")
+    for row in rows:
+        f.write((",\n" if count else "\n") + json.dumps(dict(zip(fields, row)), ensure_ascii=False))
+        count += 1
+    f.write("\n]\n" if count else "]\n")
+    return count
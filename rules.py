@@ -0,0 +1,197 @@
+"""
+记录校验规则
+各来源的字段校验按来源声明为规则（URL要求、时间无效时的处理、时间的合理范围、是否检查表头行），
+由同一个校验器按批执行：每条被丢弃的记录给出原因代码（metrics.REJECT_*），被修正的记录给出修正原因（metrics.ADJUST_*）。
+表头关键词编译为一个正则表达式，每行只在拼接后的字段上匹配一遍
+"""
+import re
+from collections import Counter
+
+import metrics
+from records import SOURCE_9PK, SOURCE_API, SOURCE_JJJ, ServerRecord
+
+# 原始字段的个数：名称、URL、类型、时间、最低消费、描述、特色
+ROW_FIELDS = 7
+# 时间字段的位置
+TIME_FIELD = 3
+
+# 表头关键词，至少HEADER_MIN_FIELDS个字段包含关键词的行视为表头
+HEADER_KEYWORDS = ('链接', '服务器', '名称', '时间', '消费', '描述', '特色', '最低', '类型')
+HEADER_MIN_FIELDS = 3
+
+# 检查表头时把各字段用单元分隔符拼接后匹配一遍：每次匹配从关键词一直吃到字段末尾，
+# 同一字段中的其他关键词不会再次匹配，匹配次数即为包含关键词的字段数
+_FIELD_SEPARATOR = '\x1f'
+_HEADER_PATTERN = re.compile(
+    '(?:' + '|'.join(map(re.escape, HEADER_KEYWORDS)) + ')[^' + _FIELD_SEPARATOR + ']*')
+
+# URL不含http时的处理
+URL_REQUIRE_HTTP = 'require_http'    # 丢弃
+URL_ADD_SCHEME = 'add_scheme'        # 加上http://前缀
+
+# 时间无法解析或不是正数时的处理
+TIME_REJECT = 'reject'      # 丢弃
+TIME_USE_NOW = 'use_now'    # 使用参考时间
+
+
+class RowRules:
+    """
+    一个来源的校验规则
+    url为URL不含http时的处理，url_min_length为URL的最短长度；invalid_time为时间无效时的处理，
+    time_window不为None时与参考时间相差超过该秒数的时间改为参考时间；check_header为是否丢弃表头行；
+    coerce为是否先转换字段的类型（见coerce_fields），用于JSON接口返回的字段
+    """
+
+    __slots__ = ('source', 'url', 'url_min_length', 'invalid_time', 'time_window', 'check_header', 'coerce')
+
+    def __init__(self, source, url=URL_REQUIRE_HTTP, url_min_length=1, invalid_time=TIME_REJECT, time_window=None,
+                 check_header=True, coerce=False):
+        self.source = source
+        self.url = url
+        self.url_min_length = url_min_length
+        self.invalid_time = invalid_time
+        self.time_window = time_window
+        self.check_header = check_header
+        self.coerce = coerce
+
+
+RULES = {
+    SOURCE_9PK: RowRules(SOURCE_9PK),
+    # jjj.com的时间经常缺失或写错，改用参考时间而不是丢弃；合理范围为前后30天
+    SOURCE_JJJ: RowRules(SOURCE_JJJ, url_min_length=5, invalid_time=TIME_USE_NOW, time_window=30 * 24 * 3600),
+    # 接口返回的字段可能为null或数字
+    SOURCE_API: RowRules(SOURCE_API, url=URL_ADD_SCHEME, check_header=False, coerce=True),
+}
+
+
+def is_header_row(server_name, server_type, server_url, low_consumption, description, features):
+    """
+    判断是否为表头数据：至少HEADER_MIN_FIELDS个字段包含表头关键词，或名称含"服务器"且URL含"链接"。
+    典型的表头（服务器名称/服务器类型/最低消费…）总是满足前一条
+    """
+    fields = (server_name, server_type, server_url, low_consumption, description, features)
+    text = _FIELD_SEPARATOR.join(fields)
+    if text.count(_FIELD_SEPARATOR) == len(fields) - 1:
+        matched = len(_HEADER_PATTERN.findall(text))
+    else:
+        # 字段本身含有分隔符时逐个字段匹配
+        matched = sum(1 for field in fields if _HEADER_PATTERN.search(field))
+    if matched >= HEADER_MIN_FIELDS:
+        return True
+    return '服务器' in server_name and '链接' in server_url
+
+
+def coerce_fields(fields):
+    """
+    JSON字段中的文本字段转换为字符串：null改为空字符串，数字转换为字符串；文本字段含有对象、数组等其他类型的值时返回None。
+    时间字段（TIME_FIELD）原样保留，由解析时间的函数处理数字时间戳
+    """
+    values = []
+    for index, value in enumerate(fields):
+        if index == TIME_FIELD or isinstance(value, str):
+            values.append(value)
+        elif value is None:
+            values.append('')
+        elif isinstance(value, (int, float)):
+            values.append(str(value))
+        else:
+            return None
+    return values
+
+
+def clean_url(url):
+    """去掉URL中的参数和锚点"""
+    if '?' in url:
+        url = url.split('?')[0]
+    if '#' in url:
+        url = url.split('#')[0]
+    return url
+
+
+class RowValidator:
+    """
+    按一个来源的规则校验原始字段并生成记录，累计丢弃和修正的原因
+    parse_time把时间字段转换为时间戳，无法解析时返回非整数；now_ts为参考时间；
+    on_reject(row, reason)在每条记录被丢弃时调用，用于调试输出
+    """
+
+    def __init__(self, rules, parse_time, now_ts, on_reject=None):
+        self.rules = rules
+        self.parse_time = parse_time
+        self.now_ts = now_ts
+        self.on_reject = on_reject
+        self.rejected = Counter()
+        self.adjusted = Counter()
+
+    def validate(self, rows):
+        """
+        校验一批原始字段序列（名称、URL、类型、时间、最低消费、描述、特色，多余的字段忽略），返回记录列表
+        依次检查字段个数、字段类型、URL、时间和表头，第一条不满足的规则即为丢弃原因；无法取出字段的行为None
+        """
+        rules = self.rules
+        source = rules.source
+        add_scheme = rules.url == URL_ADD_SCHEME
+        url_min_length = rules.url_min_length
+        reject_invalid_time = rules.invalid_time == TIME_REJECT
+        window = rules.time_window
+        check_header = rules.check_header
+        coerce = rules.coerce
+        parse_time = self.parse_time
+        now_ts = self.now_ts
+        reject = self._reject
+        records = []
+        for row in rows:
+            if row is None:
+                reject(row, metrics.REJECT_MALFORMED)
+                continue
+            if len(row) < ROW_FIELDS:
+                reject(row, metrics.REJECT_SHORT_ROW)
+                continue
+            fields = row[:ROW_FIELDS]
+            if coerce:
+                fields = coerce_fields(fields)
+                if fields is None:
+                    reject(row, metrics.REJECT_MALFORMED)
+                    continue
+            server_name, server_url, server_type, time_value, low_consumption, description, features = fields
+            try:
+                if not server_url or len(server_url) < url_min_length:
+                    reject(row, metrics.REJECT_BAD_URL)
+                    continue
+                if 'http' not in server_url:
+                    if not add_scheme:
+                        reject(row, metrics.REJECT_BAD_URL)
+                        continue
+                    server_url = 'http://' + server_url
+                server_url = clean_url(server_url)
+
+                timestamp = parse_time(time_value)
+                substituted = False
+                if not isinstance(timestamp, int) or timestamp <= 0:
+                    if reject_invalid_time:
+                        reject(row, metrics.REJECT_BAD_TIMESTAMP)
+                        continue
+                    self.adjusted[metrics.ADJUST_BAD_TIMESTAMP] += 1
+                    timestamp = now_ts
+                    substituted = True
+                if window is not None and not now_ts - window <= timestamp <= now_ts + window:
+                    self.adjusted[metrics.ADJUST_OUT_OF_RANGE_TIME] += 1
+                    timestamp = now_ts
+                    substituted = True
+
+                if check_header and is_header_row(server_name, server_type, server_url, low_consumption,
+                                                  description, features):
+                    reject(row, metrics.REJECT_HEADER_ROW)
+                    continue
+            except (TypeError, AttributeError):
+                # 字段不是字符串（未转换类型的来源）
+                reject(row, metrics.REJECT_MALFORMED)
+                continue
+            records.append(ServerRecord(source, server_name, server_url, server_type, timestamp,
+                                        low_consumption, description, features, substituted))
+        return records
+
+    def _reject(self, row, reason):
+        self.rejected[reason] += 1
+        if self.on_reject is not None:
+            self.on_reject(row, reason)
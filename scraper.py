@@ -1,611 +1,1533 @@
-import requests
-from bs4 import BeautifulSoup
+import codecs
+import hashlib
+import html
+import multiprocessing
 import os
 import re
-from datetime import datetime, date
+import signal
+import socket
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+from functools import partial
+from itertools import chain, islice
+from urllib.parse import urlsplit
 import json
 
-# 目标网址
+from archive import ARCHIVE_DIR, ResponseArchive, read_blob
+from changefeed import CHANGE_ADDED, CHANGE_MODIFIED, CHANGE_REMOVED, ChangeFeed
+from charset import SNIFF_BYTES, header_value, normalize_charset, sniff_charset
+from columnar import ColumnarWriter, index_path_of
+from http_cache import ResponseCache
+from metrics import RunMetrics
+from output import DATA_DIR, data_path, write_lines, write_markdown
+from records import (SINK_9PK, SINK_30OK, SINK_JJJ, SOURCE_9PK, SOURCE_API, SOURCE_JJJ, SOURCES, ServerRecord,
+                     iter_sink, tally_sinks)
+from rules import RULES, RowValidator
+from registry import PARSER_JSON_API, SourceSpec, default_registry, default_spec
+from spool import RecordSpool
+from rollup import Rollups
+from store import RecordStore
+from timeparse import TimeParser
+from watch import RateBudget, SourceSchedule, WatchState
+import watch as watch_config
+from workqueue import QUEUE_PATH, TASK_FAILED, LeaseHeartbeat, WorkQueue
+
+# 目标网址和API地址，没有注册表文件（sources.json）时按原有规则由这两项生成注册表
 URLS = [
     "https://zhaosf.aitingshuchang.com/",
     "https://zhaosf.aitingshuchang.com/index2.html",
     "https://jjj.com"
 ]
 
-# 创建data目录
-DATA_DIR = "data"
-os.makedirs(DATA_DIR, exist_ok=True)
-
-def chinese_to_num(chinese_str):
-    """将中文数字转换为阿拉伯数字"""
-    if isinstance(chinese_str, int):
-        return chinese_str
-    if isinstance(chinese_str, str) and chinese_str.isdigit():
-        return int(chinese_str)
-    if not chinese_str:
-        return 0
-    
-    # 中文数字映射
-    chinese_map = {
-        '零': 0, '一': 1, '二': 2, '三': 3, '四': 4,
-        '五': 5, '六': 6, '七': 7, '八': 8, '九': 9, '十': 10,
-        '十一': 11, '十二': 12, '十三': 13, '十四': 14, '十五': 15,
-        '十六': 16, '十七': 17, '十八': 18, '十九': 19, '二十': 20
-    }
-    
-    if chinese_str in chinese_map:
-        return chinese_map[chinese_str]
-    
-    # 尝试提取字符串中的数字
-    numbers = re.findall(r'\d+', chinese_str)
-    return int(numbers[0]) if numbers else 0
+API_URL = "https://k-4-5.fhjkwerv.com:9001/api/gameAd/getList"
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# 并发抓取配置：线程池大小与每个主机的最大并发连接数
+MAX_WORKERS = 8
+PER_HOST_LIMIT = 2
+
+# getList接口分页采集：每页条数、同时请求的页数（同时受PER_HOST_LIMIT限制）和最多请求的页数
+API_PAGE_SIZE = 100
+API_PAGE_WORKERS = 2
+API_MAX_PAGES = 500
+# 提前结束分页时沿用上次结果的期限（秒）：距上次完整采集超过该时间时请求全部页，
+# 上游已删除、位于提前结束位置之后的记录最多保留这么久
+API_FULL_CRAWL_INTERVAL = 24 * 3600
+
+# 9pk页面中开区信息所在的tr行：行的开始位置，以及行文本的结束位置（下一行或表格结束）
+ROW_START_PATTERN = re.compile(r'<tr\b[^>]*?\bonmouseover\b', re.I)
+ROW_END_PATTERN = re.compile(r'<tr\b|</table\b', re.I)
+# UTF-8编码的9pk页面直接在响应体的字节上定位行，多字节字符的各字节都不小于0x80，不会被误认为标签
+ROW_START_BYTES_PATTERN = re.compile(rb'<tr\b[^>]*?\bonmouseover\b', re.I)
+ROW_END_BYTES_PATTERN = re.compile(rb'<tr\b|</table\b', re.I)
+# lxml直接解析字节时表示输入含有无效UTF-8字节的错误类型，出现时该批行改为解码后解析
+UTF8_ERROR_TYPES = {'ERR_INVALID_ENCODING', 'ERR_INVALID_CHAR'}
+# 每批交给lxml解析（jjj页面为每批校验）的行数
+ROWS_PER_BLOCK = 200
+
+# 流式读取响应体：每次读取的字节数，以及响应体在内存中缓冲的上限，超过后转存到临时文件
+BODY_CHUNK_BYTES = 65536
+BODY_MEMORY_BYTES = 1024 * 1024
+
+# 解析进程池：进程数（环境变量SCRAPER_PARSE_WORKERS，不大于1时只在当前进程中解析），
+# 交给进程池解析的页面最少字符数（流式解析时按响应体字节数计），以及大页面按行切分的片段字符数。
+# 启动进程池约需0.6秒，与在当前进程中解析约400万个字符相当，更小的页面在当前进程中解析更快
+PARSE_WORKERS = int(os.environ.get('SCRAPER_PARSE_WORKERS', str(os.cpu_count() or 1)))
+PARSE_POOL_MIN_CHARS = 4000000
+PARSE_CHUNK_CHARS = 262144
+
+# jjj.com页面中的o4(...)调用及其参数
+O4_CALL_PATTERN = re.compile(r'\bo4\s*\(')
+O4_ARG_PATTERN = re.compile(
+    r'\s*(?:"((?:[^"\\]|\\.)*)"|\'((?:[^\'\\]|\\.)*)\'|([^,()"\']*))\s*([,)])', re.S)
+JS_ESCAPE_PATTERN = re.compile(r'\\(.)', re.S)
+# 流式扫描jjj页面时，o4调用之后至少已读入的字符数，参数超过该长度的调用可能被截断为格式不完整的调用
+O4_STREAM_MARGIN = 65536
+
+# get_text不计入文本的标签
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+
+# 当前运行使用的时间解析器和运行指标
+_time_parser = TimeParser()
+_metrics = RunMetrics()
+
+# 日志详细程度：0只输出汇总信息，1及以上输出逐行调试信息
+VERBOSE = int(os.environ.get('SCRAPER_VERBOSE', '0'))
+
+# 每个主机一个复用连接的Session，以及对应的并发限制
+_sessions = {}
+_host_limits = {}
+_sessions_lock = threading.Lock()
+
+# 所有请求共用的速率预算，watch模式下设置
+_rate_budget = None
+
+# 原始响应存档，设置后保存每次抓取到的响应体
+_archive = None
+
+# 解析进程池，首次解析大页面时创建
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+# 数据源注册表，None表示由URLS和API_URL生成
+_registry = None
+
+# 队列模式下worker没有可租用的任务、但其他worker仍持有租约时，再次尝试租用前的等待时间（秒）
+QUEUE_POLL_INTERVAL = 1.0
+
+
+def reset_time_parser(now=None):
+    """为新一轮采集创建时间解析器：固定参考时间并清空解析缓存"""
+    global _time_parser
+    _time_parser = TimeParser(now)
+    return _time_parser
+
+def set_rate_budget(budget):
+    """设置所有请求共用的速率预算，None表示不限制"""
+    global _rate_budget
+    _rate_budget = budget
+
+def set_archive(archive):
+    """设置保存原始响应的存档，None表示不保存"""
+    global _archive
+    _archive = archive
+
+def reset_metrics():
+    """为新一轮采集创建运行指标"""
+    global _metrics
+    _metrics = RunMetrics()
+    return _metrics
+
+def set_registry(specs):
+    """设置数据源注册表（SourceSpec列表），None表示由URLS和API_URL生成"""
+    global _registry
+    _registry = specs
+
+def registry():
+    """当前的数据源注册表"""
+    return _registry if _registry is not None else default_registry(URLS, API_URL)
+
+def spec_of(url):
+    """URL所属的注册表数据源，不在注册表中的网页按原有规则推断"""
+    for spec in registry():
+        if spec.matches(url):
+            return spec
+    return default_spec(url)
 
 def parse_time_to_timestamp(time_element):
     """解析时间元素并转换为时间戳"""
-    time_text = time_element.get_text(strip=True)
-    
-    # 格式1: 精品全天推荐，不更改
-    if "精品全天推荐" in time_text:
-        return time_text
-    
-    # 格式2: 今日时间
-    if "今日" in time_text:
-        today = date.today()
-        time_part = time_text.replace("今日", "")
-        time_obj = datetime.strptime(time_part, "%H:%M").time()
-        dt = datetime.combine(today, time_obj)
-        return int(dt.timestamp())
-    
-    # 格式3: 月日/时分 (支持中文格式)
-    # 首先尝试提取数字
-    time_matches = re.findall(r'(\d+)', time_text)
-    if len(time_matches) >= 2:
-        try:
-            # 假设前两个数字是月和日
-            month = int(time_matches[0])
-            day = int(time_matches[1])
-            
-            # 尝试提取小时和分钟
-            hour = int(time_matches[2]) if len(time_matches) > 2 else 0
-            minute = int(time_matches[3]) if len(time_matches) > 3 else 0
-            
-            # 假设是当前年份
-            current_year = datetime.now().year
-            dt = datetime(current_year, month, day, hour, minute)
-            return int(dt.timestamp())
-        except (ValueError, IndexError):
-            pass
-    
-    # 如果数字提取失败，尝试原始的正则表达式方法
-    match = re.match(r"(\d+)月(\d+)日[/\s]*([\d零一二三四五六七八九十]+)[点时]([\d零一二三四五六七八九十]*)", time_text)
-    if not match:
-        # 尝试匹配 "10月9日/9点开放" 格式
-        match = re.match(r"(\d+)月(\d+)日[/\s]*([\d零一二三四五六七八九十]+)[点时](?:开放|开服)", time_text)
-        if match:
-            # 为没有分钟数的情况添加默认分钟数0
-            groups = list(match.groups())
-            if len(groups) == 3:
-                groups.append("0")
-            match = type('Match', (), {'groups': lambda: groups})()
-    
-    if match:
-        month, day, hour, minute = match.groups()
-        # 转换中文数字为阿拉伯数字
-        month = chinese_to_num(month)
-        day = chinese_to_num(day)
-        hour = chinese_to_num(hour)
-        minute = chinese_to_num(minute) if minute else 0
-        
-        # 假设是当前年份
-        current_year = datetime.now().year
-        try:
-            dt = datetime(current_year, month, day, hour, minute)
-            return int(dt.timestamp())
-        except ValueError:
-            # 如果日期无效，返回原始文本
-            return time_text
-    
-    return time_text
+    return parse_time_text(time_element.get_text(strip=True))
+
+def parse_time_text(time_text):
+    """解析时间文本并转换为时间戳，无法解析时返回原始文本"""
+    return _time_parser.parse(time_text)
 
 def extract_server_info(row):
-    """从表格行中提取服务器信息"""
+    """从BeautifulSoup解析出的表格行中提取服务器信息，无效数据返回None"""
+    records = validate_rows(SOURCE_9PK, [server_row_fields(row)])
+    return records[0] if records else None
+
+def server_row_fields(row):
+    """从BeautifulSoup解析出的表格行中取出原始字段，单元格不足7个时返回空元组"""
     cells = row.find_all('td')
     if len(cells) < 7:
-        return None
+        return ()
     
     # 提取各字段信息
     server_name_link = cells[0].find('a')
     server_name = server_name_link.get_text(strip=True) if server_name_link else ''
     server_url = server_name_link.get('href', '') if server_name_link else ''
-    
-    # 验证数据
-    if not server_url or 'http' not in server_url:
-        return None
-    
-    # 清理URL
-    server_url = server_url.split('?')[0].split('#')[0]
-    
     server_type_link = cells[1].find('a')
     server_type = server_type_link.get_text(strip=True) if server_type_link else ''
+    return (server_name, server_url, server_type, cells[2].get_text(strip=True), cells[3].get_text(strip=True),
+            cells[4].get_text(strip=True), cells[5].get_text(strip=True))
+
+def server_row_fields_lxml(row):
+    """从lxml解析出的表格行中取出原始字段，结果与server_row_fields一致"""
+    cells = list(row.iter('td'))
+    if len(cells) < 7:
+        return ()
     
-    time_element = cells[2]
-    low_consumption = cells[3].get_text(strip=True)
-    description = cells[4].get_text(strip=True)
-    features = cells[5].get_text(strip=True)
-    
-    # 解析时间戳
-    timestamp = parse_time_to_timestamp(time_element)
-    
-    # 验证时间戳
-    if not isinstance(timestamp, int) or timestamp <= 0:
+    server_name_link = next(cells[0].iter('a'), None)
+    server_name = element_text(server_name_link) if server_name_link is not None else ''
+    server_url = server_name_link.get('href', '') if server_name_link is not None else ''
+    server_type_link = next(cells[1].iter('a'), None)
+    server_type = element_text(server_type_link) if server_type_link is not None else ''
+    return (server_name, server_url, server_type, element_text(cells[2]), element_text(cells[3]),
+            element_text(cells[4]), element_text(cells[5]))
+
+def validate_rows(source, rows):
+    """
+    按来源的校验规则（rules.RULES）批量校验原始字段，返回记录列表；
+    丢弃和修正的原因按批计入运行指标，VERBOSE时逐条输出被丢弃的数据
+    """
+    parse_time = {SOURCE_9PK: parse_time_text, SOURCE_JJJ: parse_jjj_time, SOURCE_API: parse_api_time}[source]
+    on_reject = None
+    if VERBOSE:
+        on_reject = lambda row, reason: print(f"调试: 跳过{source}数据（{reason}）: {list(row[:4])}")
+    validator = RowValidator(RULES[source], parse_time, _time_parser.now_ts, on_reject)
+    records = validator.validate(rows)
+    for reason, count in validator.rejected.items():
+        _metrics.reject(source, reason, count)
+    for reason, count in validator.adjusted.items():
+        _metrics.adjust(source, reason, count)
+    return records
+
+def element_text(element):
+    """
+    提取lxml元素的文本，等价于BeautifulSoup的get_text(strip=True)
+    每段文本去除首尾空白后直接拼接，跳过注释和script/style/template中的内容
+    """
+    if len(element) == 0:
+        return (element.text or '').strip()
+    parts = [(element.text or '').strip()]
+    for child in element:
+        if isinstance(child.tag, str) and child.tag not in NON_TEXT_TAGS:
+            parts.append(element_text(child))
+        if child.tail:
+            parts.append(child.tail.strip())
+    return ''.join(parts)
+
+def iter_table_rows(html_text):
+    """
+    从页面中逐个取出带onmouseover属性的tr行并提取服务器信息
+    先用正则定位每一行的文本范围（到下一个<tr或</table为止），再按批交给lxml解析，
+    不构建整个页面的文档树，内存占用只与批大小有关
+    """
+    return extract_rows(iter_row_texts([html_text]))
+
+def iter_row_texts(text_chunks):
+    """
+    从逐段读入的页面文本中逐个取出带onmouseover属性的tr行的文本（到下一个<tr或</table为止），
+    结果与在整页文本上查找相同；缓冲区中只保留尚未结束的一行，或可能是下一行开始的不完整标签。
+    页面也可以是UTF-8编码的字节，此时返回各行的字节
+    """
+    buffer = None
+    for chunk in chain(text_chunks, [None]):
+        final = chunk is None
+        if buffer is None:
+            if final:
+                return
+            buffer = chunk[:0]
+            if isinstance(chunk, bytes):
+                start_pattern, end_pattern = ROW_START_BYTES_PATTERN, ROW_END_BYTES_PATTERN
+                tag_open, tag_close = b'<', b'>'
+            else:
+                start_pattern, end_pattern = ROW_START_PATTERN, ROW_END_PATTERN
+                tag_open, tag_close = '<', '>'
+        if not final:
+            buffer += chunk
+        position = 0
+        keep = None
+        while True:
+            start = start_pattern.search(buffer, position)
+            if not start:
+                break
+            end = end_pattern.search(buffer, start.end())
+            if not final and (end is None or end.end() == len(buffer)):
+                # 行还没有结束，或结束处的标签可能不完整，读入更多文本后再取出
+                keep = start.start()
+                break
+            stop = end.start() if end else len(buffer)
+            yield buffer[start.start():stop]
+            position = stop
+        if final:
+            return
+        if keep is None:
+            # 行开始的标签中没有'>'，之后的行只可能从最后一个'>'之后的'<'开始
+            keep = buffer.find(tag_open, max(position, buffer.rfind(tag_close) + 1))
+        buffer = buffer[keep:] if keep >= 0 else buffer[:0]
+
+def extract_rows(row_texts):
+    """把tr行的文本按批交给lxml解析并逐条提取服务器信息"""
+    block = []
+    for row_text in row_texts:
+        block.append(row_text)
+        if len(block) >= ROWS_PER_BLOCK:
+            yield from _extract_row_block(block)
+            block = []
+    if block:
+        yield from _extract_row_block(block)
+
+def _extract_row_block(block):
+    """解析一批tr行的文本（或UTF-8编码的字节）并提取服务器信息"""
+    from lxml import etree
+    rows = _utf8_row_block_fields(block) if isinstance(block[0], bytes) else None
+    if rows is None:
+        if isinstance(block[0], bytes):
+            # 含有不是UTF-8的字节时改为解码后解析，无法解码的字节与文本解析时相同替换为U+FFFD
+            block = [row_text.decode('utf-8', errors='replace') for row_text in block]
+        rows = _row_block_fields("<table>" + "".join(block) + "</table>", etree.HTMLParser())
+    _metrics.count_rows('9pk', seen=len(rows))
+    return validate_rows(SOURCE_9PK, rows)
+
+def _utf8_row_block_fields(block):
+    """
+    把一批tr行的UTF-8字节直接交给lxml解码，只有取出的字段会成为Python字符串；
+    含有不是UTF-8的字节时返回None（libxml2会把无效字节按latin-1读出或丢弃，与解码后解析的结果不同）
+    """
+    from lxml import etree
+    parser = etree.HTMLParser(encoding='utf-8')
+    try:
+        rows = _row_block_fields(b"<table>" + b"".join(block) + b"</table>", parser)
+    except UnicodeDecodeError:
         return None
-    
-    # 检查是否为表头数据
-    if is_header_data(server_name, server_type, server_url, low_consumption, description, features):
+    if any(error.type_name in UTF8_ERROR_TYPES for error in parser.error_log):
         return None
-    
-    # 创建唯一标识用于去重
-    unique_id = f"{server_url}_{timestamp}"
-    
-    return {
-        'unique_id': unique_id,
-        'server_name': server_name,
-        'server_url': server_url,
-        'server_type': server_type,
-        'timestamp': timestamp,
-        'low_consumption': low_consumption,
-        'description': description,
-        'features': features
-    }
+    return rows
 
-def is_header_data(server_name, server_type, server_url, low_consumption, description, features):
-    """判断是否为表头数据"""
-    # 检查是否为典型的表头格式
-    if (server_name == '服务器名称' and 
-        '链接' in server_url and 
-        server_type == '服务器类型' and 
-        low_consumption == '最低消费' and 
-        description == '描述' and 
-        features == '特色'):
-        return True
-    
-    # 定义表头关键词
-    header_keywords = ['链接', '服务器', '名称', '时间', '消费', '描述', '特色', '最低', '类型']
-    
-    # 检查各个字段是否包含表头关键词
-    fields_to_check = [server_name, server_type, server_url, low_consumption, description, features]
-    
-    # 如果超过3个字段包含表头关键词，则认为是表头数据
-    header_keyword_count = sum(1 for field in fields_to_check if any(keyword in field for keyword in header_keywords))
-    
-    if header_keyword_count >= 3:
-        return True
-    
-    # 特殊检查：如果服务器名称和URL看起来像表头
-    if '服务器' in server_name and '链接' in server_url:
-        return True
-    
-    return False
+def _row_block_fields(table, parser):
+    from lxml import etree
+    root = etree.fromstring(table, parser)
+    return [server_row_fields_lxml(row) for row in root.iter('tr') if row.get('onmouseover') is not None]
+
+def join_rows(row_texts, chunk_chars=None):
+    """
+    把连续的tr行文本拼接为约chunk_chars个字符（行为字节时为字节数）的片段，
+    各片段逐个交给iter_table_rows得到的行与整页解析时相同
+    """
+    chunk_chars = chunk_chars or PARSE_CHUNK_CHARS
+    chunk, size = [], 0
+    for row_text in row_texts:
+        chunk.append(row_text)
+        size += len(row_text)
+        if size >= chunk_chars:
+            yield chunk[0][:0].join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield chunk[0][:0].join(chunk)
+
+def get_parse_pool():
+    """
+    获取解析进程池，首次调用时创建，PARSE_WORKERS不大于1时返回None
+    子进程用spawn方式启动，不继承抓取线程持有的锁和连接
+    """
+    global _parse_pool
+    if PARSE_WORKERS <= 1:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS,
+                                              mp_context=multiprocessing.get_context('spawn'))
+        return _parse_pool
+
+def close_parse_pool():
+    """关闭解析进程池"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown()
+            _parse_pool = None
+
+def parse_stream(source, text_chunks, size=0):
+    """
+    逐条解析逐段读入的9pk或jjj页面，size为响应体的字节数；9pk页面可以逐段读入UTF-8编码的字节
+    9pk页面逐行取出：不足PARSE_POOL_MIN_CHARS的页面在当前进程中按批解析，更大的页面每约PARSE_CHUNK_CHARS个字符
+    作为一个片段交给解析进程池，结果按片段顺序返回；jjj页面在当前进程中边读入边扫描。
+    结果与整页解析时相同（jjj页面中参数超过O4_STREAM_MARGIN个字符的调用除外）
+    """
+    if source == SOURCE_JJJ:
+        return iter_jjj_records(text_chunks)
+    row_texts = iter_row_texts(text_chunks)
+    pool = get_parse_pool() if size >= PARSE_POOL_MIN_CHARS else None
+    if pool is None:
+        return extract_rows(row_texts)
+    return _parse_in_pool(pool, source, join_rows(row_texts))
+
+def parse_page(source, page_text):
+    """
+    解析整页的9pk或jjj页面并提取服务器信息
+    9pk页面与parse_stream相同；jjj页面不足PARSE_POOL_MIN_CHARS个字符时在当前进程中解析，更大的页面整页交给解析进程池
+    """
+    if source == SOURCE_9PK:
+        return list(parse_stream(source, [page_text], len(page_text)))
+    pool = get_parse_pool() if len(page_text) >= PARSE_POOL_MIN_CHARS else None
+    if pool is None:
+        return _parse_in_process(source, page_text)
+    return list(_parse_in_pool(pool, source, [page_text]))
 
-def scrape_url(url):
-    """采集单个URL的数据"""
+def _parse_in_pool(pool, source, chunks):
+    """
+    把片段依次交给解析进程池，同时在进程池中的片段不超过进程数的2倍，按片段顺序逐条返回记录；
+    进程池异常时尚未完成的片段改为在当前进程中解析
+    """
+    pending = deque()
+    for chunk in chunks:
+        try:
+            future = pool.submit(_parse_chunk, source, chunk, _time_parser.now)
+        except BrokenProcessPool as e:
+            future = Future()
+            future.set_exception(e)
+        pending.append((chunk, future))
+        if len(pending) >= 2 * PARSE_WORKERS:
+            yield from _pool_result(source, *pending.popleft())
+    while pending:
+        yield from _pool_result(source, *pending.popleft())
+
+def _pool_result(source, chunk, future):
+    """取出一个片段的解析结果并合并行统计"""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        # 为jjj.com网站设置正确的编码
-        if 'jjj.com' in url:
-            response.encoding = 'gb2312'
-        else:
-            response.encoding = 'utf-8'
-        
-        soup = BeautifulSoup(response.text, 'lxml')
-        
-        # 为jjj.com网站使用专门的处理函数
-        if 'jjj.com' in url:
-            return scrape_jjj_data(soup)
+        values, rows = future.result()
+    except BrokenProcessPool as e:
+        print(f"解析进程池异常，改为在当前进程中解析: {e}")
+        return _parse_in_process(source, chunk)
+    _metrics.merge_rows(rows)
+    _metrics.count('parse_pool_chunks')
+    return [ServerRecord.from_tuple(record) for record in values]
+
+def _parse_in_process(source, page_text):
+    if source == SOURCE_API:
+        return parse_api_data(json.loads(page_text))[0]
+    if source == SOURCE_JJJ:
+        return scrape_jjj_data(page_text)
+    # 使用lxml直接提取所有开区信息的tr元素
+    return list(iter_table_rows(page_text))
+
+def _parse_chunk(source, page_text, now):
+    """
+    在解析进程中执行：用与主进程相同的参考时间解析一个片段，
+    返回记录的元组列表和本片段的行统计（丢弃和修正原因），由主进程合并
+    """
+    if _time_parser.now != now:
+        reset_time_parser(now)
+    chunk_metrics = reset_metrics()
+    server_data = _parse_in_process(source, page_text)
+    return [record.to_tuple() for record in server_data], chunk_metrics.row_counts()
+
+def get_session(url):
+    """
+    获取URL所在主机的Session和并发限制
+    同一主机的请求共用一个连接池，避免每次请求都重新进行TCP/TLS握手
+    """
+    host = urlsplit(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=PER_HOST_LIMIT)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+            _sessions[host] = session
+            _host_limits[host] = threading.BoundedSemaphore(PER_HOST_LIMIT)
+        return session, _host_limits[host]
+
+def close_sessions():
+    """关闭所有Session并释放连接"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _host_limits.clear()
+
+def fetch(url, headers=None, timeout=10):
+    """通过主机共享的Session发起GET请求，受每主机并发数限制，并记录耗时和字节数"""
+    session, limit = get_session(url)
+    if _rate_budget is not None:
+        _rate_budget.acquire()
+    with limit, _metrics.stage('fetch'):
+        start = time.perf_counter()
+        response = session.get(url, headers=headers, timeout=timeout)
+        _metrics.record_fetch(url, response.status_code, time.perf_counter() - start, len(response.content))
+    if _archive is not None and response.status_code == 200 and response.content:
+        try:
+            with _metrics.stage('archive'):
+                _archive.add(url, source_of(url), response.content, response.status_code, response.headers,
+                             _time_parser.now_ts)
+        except OSError as e:
+            print(f"保存 {url} 的响应到存档时出错: {e}")
+    return response
+
+def fetch_stream(url, headers=None, timeout=10):
+    """
+    与fetch相同，但分块读取响应体，同时计算SHA-256，不在内存中保存整个响应体
+    响应体写入临时文件（不超过BODY_MEMORY_BYTES时保存在内存中），返回(响应, 响应体文件, 哈希, 字节数)，
+    响应体文件的读取位置在开头，由调用方关闭
+    """
+    session, limit = get_session(url)
+    if _rate_budget is not None:
+        _rate_budget.acquire()
+    body = tempfile.SpooledTemporaryFile(max_size=BODY_MEMORY_BYTES)
+    digest = hashlib.sha256()
+    try:
+        with limit, _metrics.stage('fetch'):
+            start = time.perf_counter()
+            with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+                for chunk in response.iter_content(BODY_CHUNK_BYTES):
+                    digest.update(chunk)
+                    body.write(chunk)
+            size = body.tell()
+            _metrics.record_fetch(url, response.status_code, time.perf_counter() - start, size)
+        digest = digest.hexdigest()
+        if _archive is not None and response.status_code == 200 and size:
+            try:
+                with _metrics.stage('archive'):
+                    body.seek(0)
+                    _archive.add_file(url, source_of(url), body, digest, size, response.status_code,
+                                      response.headers, _time_parser.now_ts)
+            except OSError as e:
+                print(f"保存 {url} 的响应到存档时出错: {e}")
+        body.seek(0)
+        return response, body, digest, size
+    except BaseException:
+        body.close()
+        raise
+
+def cache_status(response, cached):
+    """运行报告中记录的缓存结果"""
+    if cached is None:
+        return 'miss'
+    return 'not_modified' if response.status_code == 304 else 'unchanged'
+
+def source_of(url):
+    """URL对应的数据来源，由注册表中该数据源的输出文件决定，API的分页地址也属于API"""
+    return spec_of(url).source
+
+def scrape_url(url, cache=None, sink=None):
+    """
+    采集单个URL的数据，逐条追加到sink（默认为新的列表）并返回sink；传入cache时使用条件请求并在页面未变化时跳过解析
+    响应体分块读取后边解码边解析（UTF-8编码的9pk页面不解码，字节直接交给lxml），记录逐条写入sink和HTTP缓存，不在内存中保存整个页面或整页的记录；
+    采集出错时清空sink。解析方式和记录的来源由注册表中的数据源决定，页面编码按响应头、BOM和<meta>识别，
+    都没有声明时使用注册表中数据源的编码
+    """
+    spec = spec_of(url)
+    source = spec.source
+    sink = [] if sink is None else sink
+    body = None
+    try:
+        headers = cache.conditional_headers(url) if cache else None
+        response, body, digest, size = fetch_stream(url, headers=headers, timeout=10)
         
-        # 查找所有开区信息的tr元素
-        rows = soup.find_all('tr', attrs={'onmouseover': True})
+        if cache:
+            cached = cache.lookup(url, response, digest)
+            _metrics.update_source(url, source=source, cache=cache_status(response, cached))
+            if cached is not None:
+                sink.extend(ServerRecord.from_tuple(values) for values in cache.records(url))
+                _metrics.count_rows(spec.parser_source, accepted=cached['count'])
+                _metrics.update_source(url, rows=cached['count'])
+                return sink
         
-        return [info for info in (extract_server_info(row) for row in rows) if info]
+        before = len(sink)
+        with _metrics.stage('parse'):
+            head = body.read(SNIFF_BYTES)
+            body.seek(0)
+            charset = sniff_charset(head, header_value(response.headers, 'Content-Type'), spec.encoding)
+            # 为jjj.com网站使用专门的处理函数，大页面交给解析进程池
+            records = parse_stream(spec.parser_source, iter_body(spec.parser_source, body, charset), size)
+            records = relabel_records(records, spec)
+            if cache:
+                cache.store(url, response, _tee_records(records, sink), body_hash=digest)
+            else:
+                sink.extend(records)
+        _metrics.count_rows(spec.parser_source, accepted=len(sink) - before)
+        _metrics.update_source(url, source=source, rows=len(sink) - before)
+        return sink
     except Exception as e:
         print(f"采集 {url} 时出错: {e}")
-        return []
+        _metrics.update_source(url, source=source, error=str(e))
+        sink.clear()
+        return sink
+    finally:
+        if body is not None:
+            body.close()
+
+def relabel_records(records, spec):
+    """注册表中数据源的输出文件与解析方式的默认来源不同时，逐条把记录的来源改为输出文件对应的来源"""
+    if spec.source == spec.parser_source:
+        return records
+    return _with_source(records, spec.source)
+
+def _with_source(records, source):
+    for record in records:
+        record.source = source
+        yield record
+
+def _tee_records(records, sink):
+    """逐条把记录追加到sink，同时返回记录的元组用于写入缓存"""
+    for record in records:
+        sink.append(record)
+        yield record.to_tuple()
+
+def body_encoding(source):
+    """来源的默认页面编码：jjj.com页面为gb2312编码（按gb18030解码），其他页面为utf-8；注册表中可为每个数据源指定编码"""
+    return normalize_charset('gb2312' if source == SOURCE_JJJ else 'utf-8')
+
+def decode_body(source, body, encoding=None):
+    """按来源（或指定的编码）解码响应体，无法解码的字节替换为U+FFFD"""
+    return body.decode(normalize_charset(encoding) or body_encoding(source), errors='replace')
+
+def page_content(source, body, charset):
+    """整个响应体的解析输入：UTF-8编码的9pk页面直接使用字节，其他页面按charset解码"""
+    if source == SOURCE_9PK and charset == 'utf-8':
+        return body
+    return decode_body(source, body, charset)
+
+def iter_body(source, body, charset):
+    """从响应体文件中逐块读取解析输入：UTF-8编码的9pk页面逐块返回原始字节，其他页面按charset逐块解码"""
+    if source == SOURCE_9PK and charset == 'utf-8':
+        return iter_body_bytes(body)
+    return iter_body_text(source, body, charset)
+
+def iter_body_bytes(body):
+    """从响应体文件中逐块读取原始字节"""
+    while True:
+        chunk = body.read(BODY_CHUNK_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+def iter_body_text(source, body, encoding=None):
+    """从响应体文件中逐块读取并解码，多字节字符跨块时也与decode_body的结果相同"""
+    decoder = codecs.getincrementaldecoder(normalize_charset(encoding) or body_encoding(source))(errors='replace')
+    while True:
+        chunk = body.read(BODY_CHUNK_BYTES)
+        text = decoder.decode(chunk, final=not chunk)
+        if text:
+            yield text
+        if not chunk:
+            return
+
+def api_page_url(api_url, page_num, page_size):
+    """getList接口某一页的地址"""
+    separator = '&' if '?' in api_url else '?'
+    return f"{api_url}{separator}pageNum={page_num}&pageSize={page_size}"
+
+def fetch_api_page(api_url, page_num, page_size, cache=None):
+    """
+    采集API的一页数据，返回(记录列表, 本页原始条数, 总条数)，响应中没有总条数时为None
+    传入cache时使用条件请求，响应未变化时直接复用上次提取的记录
+    """
+    spec = spec_of(api_url)
+    page_url = api_page_url(api_url, page_num, page_size)
+    headers = {
+        'Accept': 'application/json, text/plain, */*',
+        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Connection': 'keep-alive',
+    }
+    if cache:
+        headers.update(cache.conditional_headers(page_url))
+    
+    response = fetch(page_url, headers=headers, timeout=15)  # 增加超时时间
+    response.raise_for_status()  # 检查HTTP错误
+    
+    if cache:
+        cached = cache.lookup(page_url, response)
+        _metrics.update_source(page_url, source='api', cache=cache_status(response, cached))
+        if cached is not None:
+            server_data = [ServerRecord.from_tuple(values) for values in cache.records(page_url)]
+            _metrics.count_rows('api', accepted=len(server_data))
+            _metrics.update_source(page_url, rows=len(server_data))
+            return server_data, cached['meta']['count'], cached['meta']['total']
+    
+    with _metrics.stage('parse'):
+        # 解析JSON数据，编码按响应头和BOM识别，都没有时使用注册表中数据源的编码
+        charset = sniff_charset(response.content[:SNIFF_BYTES], header_value(response.headers, 'Content-Type'),
+                                spec.encoding, meta=False)
+        data = load_json_body(response.content, charset)
+        server_data, count, total = parse_api_data(data)
+        server_data = list(relabel_records(server_data, spec))
+    _metrics.count_rows('api', accepted=len(server_data))
+    _metrics.update_source(page_url, source='api', rows=len(server_data))
+    
+    if cache and server_data:
+        cache.store(page_url, response, (record.to_tuple() for record in server_data),
+                    meta={'count': count, 'total': total})
+    return server_data, count, total
+
+def load_json_body(body, charset):
+    """
+    解析JSON响应体：utf-8编码时字节直接交给json.loads，不另外生成整个响应体的字符串；
+    其他编码或含有无效字节时先解码，无法解码的字节替换为U+FFFD
+    """
+    if charset == 'utf-8':
+        try:
+            return json.loads(body)
+        except UnicodeDecodeError:
+            pass
+    return json.loads(body.decode(charset, errors='replace'))
+
+def parse_api_data(data):
+    """从getList接口的一页JSON数据中提取记录，返回(记录列表, 本页原始条数, 总条数)，没有总条数时为None"""
+    # 检查API响应结构 (根据实际返回的数据结构调整)
+    total = None
+    if 'data' in data and 'list' in data['data']:
+        records = data['data']['list']
+        total = data['data'].get('total')
+    elif 'list' in data:
+        records = data['list']
+        total = data.get('total')
+    else:
+        records = data if isinstance(data, list) else []
+    
+    # 提取服务器信息
+    server_data = validate_rows(SOURCE_API, [api_row_fields(record) for record in records])
+    _metrics.count_rows('api', seen=len(records))
+    return server_data, len(records), total if isinstance(total, int) else None
 
-def scrape_api_data(api_url):
+def api_page_count(page_count, page_num, count, total, page_size, duplicate=False):
     """
-    采集API数据
+    根据第page_num页的结果更新API列表的总页数，返回(总页数, 是否已到列表末尾)，scrape_api_data、api_follow_up和
+    iter_api_pages共用：空页或全部与前面的页重复的页（duplicate，接口忽略分页参数）说明已到列表末尾，本页不再使用；
+    否则有总条数时按总条数计算，没有时满页说明后面可能还有数据，总页数不超过API_MAX_PAGES
     """
+    if count == 0 or duplicate:
+        return page_num, True
+    if total is not None:
+        page_count = -(-total // page_size)
+    elif count >= page_size:
+        page_count = max(page_count, page_num + 1)
+    return min(page_count, API_MAX_PAGES), False
+
+def scrape_api_data(api_url, cache=None, known=None, page_size=None, workers=None, sink=None):
+    """
+    分页采集API数据，追加到sink（默认为新的列表）并返回sink
+    先请求第一页得到总条数，其余页每次并发请求workers页；known为上次运行采集到的API记录（按采集顺序），
+    某一页的记录全部出现在known中时不再请求后面的页，其后的记录沿用上次运行的结果；
+    调用方按API_FULL_CRAWL_INTERVAL定期不传known进行完整采集（见full_crawl_due）
+    """
+    import requests
+    page_size = page_size or API_PAGE_SIZE
+    workers = workers or API_PAGE_WORKERS
+    known = known or []
+    known_positions = {record.unique_id: index for index, record in enumerate(known)}
+    sink = [] if sink is None else sink
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-        }
-        
-        response = requests.get(api_url, headers=headers, timeout=15)  # 增加超时时间
-        response.raise_for_status()  # 检查HTTP错误
-        
-        # 解析JSON数据
-        data = response.json()
-        
-        # 检查API响应结构 (根据实际返回的数据结构调整)
-        if 'data' in data and 'list' in data['data']:
-            records = data['data']['list']
-        elif 'list' in data:
-            records = data['list']
-        else:
-            records = data if isinstance(data, list) else []
-        
         server_data = []
-        for record in records:
-            # 提取服务器信息
-            server_info = extract_api_server_info(record)
-            if server_info:
-                server_data.append(server_info)
+        collected = set()
+        carried = []
+        page_count = 1
+        next_page = 1
+        stopped_early = False
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while next_page <= page_count and not stopped_early:
+                # 第一页单独请求，得到总页数后再并发请求其余页
+                batch = [1] if next_page == 1 else list(range(next_page, min(next_page + workers, page_count + 1)))
+                pages = executor.map(lambda page_num: fetch_api_page(api_url, page_num, page_size, cache), batch)
+                next_page = batch[-1] + 1
+                for page_num, (records, count, total) in zip(batch, pages):
+                    new_records = [record for record in records if record.unique_id not in collected]
+                    page_count, ended = api_page_count(page_count, page_num, count, total, page_size,
+                                                       duplicate=bool(records and not new_records))
+                    if ended:
+                        break
+                    server_data.extend(new_records)
+                    collected.update(record.unique_id for record in new_records)
+                    
+                    if (page_num < page_count and records and
+                            all(record.unique_id in known_positions for record in records)):
+                        # 本页全部是已采集过的记录，其后的记录沿用上次运行的结果
+                        carry_from = max(known_positions[record.unique_id] for record in records) + 1
+                        carried = [record for record in known[carry_from:] if record.unique_id not in collected]
+                        stopped_early = True
+                        page_count = page_num
+                        break
         
-        return server_data
+        server_data.extend(carried)
+        _metrics.update_source(api_url, source='api', pages=page_count, stopped_early=stopped_early,
+                               carried=len(carried), rows=len(server_data))
+        sink.extend(server_data)
+        return sink
     except requests.exceptions.RequestException as e:
         print(f"网络请求错误: {e}")
-        return []
+        _metrics.update_source(api_url, source='api', error=str(e))
+        return sink
     except json.JSONDecodeError as e:
         print(f"JSON解析错误: {e}")
-        return []
+        _metrics.update_source(api_url, source='api', error=str(e))
+        return sink
     except Exception as e:
         print(f"采集API {api_url} 时出错: {e}")
-        return []
+        _metrics.update_source(api_url, source='api', error=str(e))
+        return sink
+
+def full_crawl_due(last_full_crawl, now_ts):
+    """距上次完整采集超过API_FULL_CRAWL_INTERVAL（或从未完整采集过）时返回True，此时不应沿用上次的结果"""
+    return last_full_crawl is None or now_ts - last_full_crawl >= API_FULL_CRAWL_INTERVAL
 
-def extract_api_server_info(record):
+def crawled_in_full(run_metrics, api_url):
+    """本次运行是否完整采集了分页接口：没有出错且没有提前结束"""
+    info = run_metrics.sources.get(api_url, {})
+    return not info.get('error') and not info.get('stopped_early')
+
+def api_row_fields(record):
     """
-    从API记录中提取服务器信息
+    从API记录中取出原始字段，serverIp字段的值作为特色；记录不是JSON对象时返回None
     """
-    try:
-        # 根据API返回的数据结构提取信息 (根据实际返回的数据结构调整)
-        server_name = record.get('serverName', '')
-        server_url = record.get('webUrl', '')
-        server_type = record.get('serverType', '')
-        server_ip = record.get('serverIp', '')  # 获取serverIp字段
-        low_consumption = record.get('serviceQq', '')
-        description = record.get('gameIntro', '')
-        
-        # 将serverIp字段的值添加到features字段中
-        features = server_ip
-        
-        # 处理时间字段
-        time_str = record.get('startServerTime', '')
-        timestamp = parse_api_time(time_str)
-        
-        # 如果没有URL链接，则不采集这条数据
-        if not server_url:
-            return None
-        
-        # 如果URL不包含有效的协议，则添加http://前缀
-        if 'http' not in server_url:
-            server_url = 'http://' + server_url
-        
-        # 去除URL中的参数（问号及后面的内容）
-        if '?' in server_url:
-            server_url = server_url.split('?')[0]
-        
-        # 进一步清理URL，确保去除可能的锚点
-        if '#' in server_url:
-            server_url = server_url.split('#')[0]
-        
-        # 如果时间戳不是整数（即解析失败），则不采集
-        if not isinstance(timestamp, int):
-            return None
-        
-        # 如果时间戳为0或负数，则不采集
-        if timestamp <= 0:
-            return None
-        
-        # 创建唯一标识用于去重 (根据URL和时间戳)
-        unique_id = f"{server_url}_{timestamp}"
-        
-        return {
-            'unique_id': unique_id,
-            'server_name': server_name,
-            'server_url': server_url,
-            'server_type': server_type,
-            'timestamp': timestamp,
-            'low_consumption': low_consumption,
-            'description': description,
-            'features': features
-        }
-    except Exception as e:
-        print(f"解析API记录时出错: {e}")
+    if not isinstance(record, dict):
         return None
+    # 根据API返回的数据结构提取信息 (根据实际返回的数据结构调整)
+    return (record.get('serverName', ''), record.get('webUrl', ''), record.get('serverType', ''),
+            record.get('startServerTime', ''), record.get('serviceQq', ''), record.get('gameIntro', ''),
+            record.get('serverIp', ''))
+
+def iter_o4_calls(page_text):
+    """
+    单遍扫描页面原始文本，逐个返回o4(...)调用的参数列表
+    参数可以是单引号或双引号字符串（支持反斜杠转义，字符串中可以包含逗号和括号），
+    也可以是不带引号的值；格式不完整的调用会被跳过
+    """
+    return iter_o4_stream([page_text])
+
+def iter_o4_stream(text_chunks):
+    """
+    与iter_o4_calls相同，但页面文本逐段读入：只解析之后已读入至少O4_STREAM_MARGIN个字符的调用，
+    扫描过的文本随即丢弃（保留一个字符用于判断单词边界），缓冲区大小与页面大小无关
+    """
+    buffer = ''
+    pos = 0
+    for chunk in chain(text_chunks, [None]):
+        final = chunk is None
+        if not final:
+            buffer += chunk
+        horizon = len(buffer) if final else len(buffer) - O4_STREAM_MARGIN
+        if horizon <= pos:
+            continue
+        while True:
+            call = O4_CALL_PATTERN.search(buffer, pos)
+            if not call or call.start() >= horizon:
+                break
+            pos = call.end()
+            params = []
+            while True:
+                arg = O4_ARG_PATTERN.match(buffer, pos)
+                if not arg:
+                    break
+                double_quoted, single_quoted, bare, terminator = arg.groups()
+                pos = arg.end()
+                if double_quoted is not None:
+                    value = double_quoted
+                elif single_quoted is not None:
+                    value = single_quoted
+                else:
+                    value = bare.strip()
+                if '\\' in value:
+                    value = JS_ESCAPE_PATTERN.sub(r'\1', value)
+                params.append(value)
+                if terminator == ')':
+                    yield params
+                    break
+        if final:
+            return
+        cut = (call.start() if call else max(pos, horizon)) - 1
+        buffer = buffer[cut:]
+        pos = max(pos - cut, 1)
 
-def scrape_jjj_data(soup):
+def scrape_jjj_data(page_text):
     """
     专门用于采集jjj.com网站数据的函数
     数据格式为JavaScript函数调用: o4("服务器名称","URL","类型","时间","最低消费","描述","特色");
+    直接在响应文本上扫描o4调用，不构建DOM
     """
-    server_data = []
     try:
-        # 获取页面的所有文本内容
-        page_text = str(soup)
-        print(f"调试: jjj.com页面内容长度: {len(page_text)}")
+        if VERBOSE:
+            print(f"调试: jjj.com页面内容长度: {len(page_text)}")
         
         # 检查页面是否包含特定内容
-        if "o4(" in page_text:
-            print("调试: 页面中包含o4函数调用")
-        else:
-            print("调试: 页面中不包含o4函数调用")
-            # 打印页面前1000个字符进行调试
-            print(f"调试: 页面内容预览: {page_text[:1000]}...")
-            return server_data
-        
-        # 使用更简单的正则表达式匹配o4函数调用
-        import re
-        from bs4 import BeautifulSoup
-        
-        # 匹配o4函数调用，允许参数中有逗号
-        pattern = r'o4\s*\(([^)]*)\)'
-        matches = re.findall(pattern, page_text)
-        print(f"调试: 找到 {len(matches)} 个o4函数调用")
-                    
-        # 如果没有找到匹配项，尝试在原始内容中查找
-        if not matches:
-            print("调试: 在处理后的文本中未找到匹配项，尝试在原始文本中查找")
-            original_matches = re.findall(pattern, str(soup))
-            if original_matches:
-                matches = original_matches
-                print(f"调试: 在原始文本中找到 {len(matches)} 个o4函数调用")
-        
-        for match in matches:
-            # 分割参数，但要注意引号内的逗号
-            params = []
-            current_param = ""
-            in_quotes = False
-            quote_char = None
-            
-            for char in match:
-                if char in ['"', "'"] and (not in_quotes or char == quote_char):
-                    in_quotes = not in_quotes
-                    quote_char = char if in_quotes else None
-                    current_param += char
-                elif char == ',' and not in_quotes:
-                    params.append(current_param.strip())
-                    current_param = ""
-                else:
-                    current_param += char
-            
-            if current_param:
-                params.append(current_param.strip())
-            
-            # 确保有足够多的参数
-            if len(params) < 7:
-                print(f"调试: 参数不足，跳过该项。参数数量: {len(params)}")
-                continue
-            
-            # 提取各个字段并去除引号
-            server_name = params[0].strip('"\'')
-            server_url = params[1].strip('"\'')
-            server_type = params[2].strip('"\'')
-            time_text = params[3].strip('"\'')
-            low_consumption = params[4].strip('"\'')
-            description = params[5].strip('"\'')
-            features = params[6].strip('"\'')
-            
-            print(f"调试: 采集到数据 - 服务器名称: {server_name}, URL: {server_url}")
-            print(f"调试: 时间文本: {time_text}")
-            
-            # 解析时间
-            time_element = BeautifulSoup(f'<td class="time">{time_text}</td>', 'lxml').td
-            timestamp = parse_time_to_timestamp(time_element)
-            print(f"调试: 初始解析时间戳: {timestamp}")
-            
-            # 如果时间解析失败，尝试其他方法
-            if not isinstance(timestamp, int) or timestamp <= 0:
-                print(f"调试: 尝试直接解析时间文本: {time_text}")
-                # 直接使用parse_time_to_timestamp解析原始时间文本
-                fake_element = BeautifulSoup(f'<td class="time">{time_text}</td>', 'lxml').td
-                timestamp = parse_time_to_timestamp(fake_element)
-                print(f"调试: 重新解析时间戳: {timestamp}")
-            
-            # 数据验证
-            if not server_url or len(server_url) < 5 or server_url == 'b' or 'http' not in server_url:
-                print(f"调试: 跳过数据，URL无效: {server_url}")
-                continue
-            
-            # 对于时间戳，即使解析失败也尝试使用当前时间
-            if not isinstance(timestamp, int) or timestamp <= 0:
-                print(f"调试: 时间戳无效: {timestamp}，使用当前时间作为替代")
-                timestamp = int(datetime.now().timestamp())
-                
-            # 检查时间戳是否在合理范围内（最近30天到未来30天）
-            current_time = int(datetime.now().timestamp())
-            if timestamp < current_time - 30*24*3600 or timestamp > current_time + 30*24*3600:
-                print(f"调试: 时间戳超出合理范围: {timestamp}，使用当前时间作为替代")
-                timestamp = current_time
-            
-            # 确保URL包含协议
-            if 'http' not in server_url:
-                server_url = 'http://' + server_url
-            
-            # 去除URL参数
-            if '?' in server_url:
-                server_url = server_url.split('?')[0]
-            if '#' in server_url:
-                server_url = server_url.split('#')[0]
-            
-            # 检查是否为表头数据
-            if is_header_data(server_name, server_type, server_url, low_consumption, description, features):
-                print(f"调试: 跳过数据，识别为表头数据")
-                continue
-            
-            # 创建唯一标识用于去重，并添加jjj标记
-            unique_id = f"{server_url}_{timestamp}_jjj_"
-            
-            server_data.append({
-                'unique_id': unique_id,
-                'server_name': server_name,
-                'server_url': server_url,
-                'server_type': server_type,
-                'timestamp': timestamp,
-                'low_consumption': low_consumption,
-                'description': description,
-                'features': features
-            })
+        if "o4(" not in page_text:
+            print("jjj.com页面中不包含o4函数调用")
+            if VERBOSE:
+                # 打印页面前1000个字符进行调试
+                print(f"调试: 页面内容预览: {page_text[:1000]}...")
+            _metrics.count_rows('jjj', seen=0)
+            return []
         
-        print(f"调试: jjj.com总共采集到 {len(server_data)} 条数据")
-        return server_data
+        return list(iter_jjj_records([page_text]))
     except Exception as e:
         print(f"采集jjj.com数据时出错: {e}")
         import traceback
         traceback.print_exc()
         return []
 
+def iter_jjj_records(text_chunks):
+    """
+    逐条提取jjj.com页面中的服务器信息，text_chunks为逐段读入的页面文本
+    o4调用的参数按批校验后生成记录，时间无效或超出范围时使用当前时间
+    """
+    seen = 0
+    try:
+        batch = []
+        for params in iter_o4_stream(text_chunks):
+            seen += 1
+            batch.append(params)
+            if len(batch) >= ROWS_PER_BLOCK:
+                yield from validate_rows(SOURCE_JJJ, batch)
+                batch = []
+        if batch:
+            yield from validate_rows(SOURCE_JJJ, batch)
+        
+        if not seen:
+            print("jjj.com页面中没有格式完整的o4函数调用")
+    finally:
+        _metrics.count_rows('jjj', seen=seen)
+
+def parse_jjj_time(time_text):
+    """解析jjj.com页面中的时间文本，文本中可能含有HTML实体和首尾空白"""
+    if '&' in time_text:
+        time_text = html.unescape(time_text)
+    return parse_time_text(time_text.strip())
+
 def parse_api_time(time_str):
     """
     解析API时间字符串
     """
-    if not time_str:
-        return int(datetime.now().timestamp())
-    
     try:
-        # 尝试多种时间格式
-        if isinstance(time_str, str):
-            # 尝试解析时间戳字符串
-            if time_str.isdigit():
-                return int(time_str)
-            
-            # 尝试解析常见的时间格式
-            time_formats = [
-                '%Y-%m-%d %H:%M:%S',
-                '%Y-%m-%d %H:%M',
-                '%Y-%m-%d',
-                '%m月%d日/%H:%M',
-                '%m-%d %H:%M'
-            ]
-            
-            for fmt in time_formats:
-                try:
-                    if '%Y' not in fmt:
-                        # 如果没有年份，假设是当前年份
-                        current_year = datetime.now().year
-                        time_obj = datetime.strptime(time_str, fmt).replace(year=current_year)
-                    else:
-                        time_obj = datetime.strptime(time_str, fmt)
-                    return int(time_obj.timestamp())
-                except ValueError:
-                    continue
-        
-        # 如果是数字类型，直接返回
-        if isinstance(time_str, (int, float)):
-            return int(time_str)
-        
-        # 默认返回当前时间戳
-        return int(datetime.now().timestamp())
-    except Exception:
-        return int(datetime.now().timestamp())
+        return _time_parser.parse_api(time_str)
+    except TypeError:
+        # 无法作为缓存键的值（如列表）视为无效时间
+        return _time_parser.now_ts
 
 def deduplicate_data(data):
     """
     去除重复数据
     根据时间和URL来判断重复数据，同一时间段的相同URL视为重复
     """
-    unique_data = {}
+    return list(iter_deduplicated(data))
+
+def iter_deduplicated(data):
+    """逐条去除重复数据，只保存已出现过的(URL, 时间戳)，结果和顺序与deduplicate_data相同"""
+    seen = set()
     for item in data:
-        # 使用URL和时间戳组合作为唯一标识
-        unique_key = f"{item['server_url']}_{item['timestamp']}"
-        if unique_key not in unique_data:
-            unique_data[unique_key] = item
-    return list(unique_data.values())
+        # 使用(URL, 时间戳)元组作为唯一标识，保留第一次出现的记录
+        key = item.dedup_key
+        if key not in seen:
+            seen.add(key)
+            yield item
 
 def save_to_markdown(data, filename):
-    """将数据保存为Markdown格式"""
-    filepath = os.path.join(DATA_DIR, filename)
-    
-    # 清空并写入文件
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write("# 开区信息采集结果\n\n")
-        f.write(f"采集时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        f.write("| 服务器名称 | 服务器链接 | 服务器类型 | 开区时间 | 最低消费 | 描述 | 特色 |\n")
-        f.write("| --- | --- | --- | --- | --- | --- | --- |\n")
-        
-        for item in data:
-            time_display = datetime.fromtimestamp(item['timestamp']).strftime('%Y-%m-%d %H:%M') if isinstance(item['timestamp'], int) else item['timestamp']
-            f.write(f"| {item['server_name']} | {item['server_url']} | {item['server_type']} | {time_display} | {item['low_consumption']} | {item['description']} | {item['features']} |\n")
-    
+    """将数据保存为Markdown格式，data可以是生成器，逐条写入，返回写入的条数"""
+    filepath = data_path(filename)
+    count = write_markdown(data, filepath)
+    _metrics.count(f'written_{filename}', count)
     print(f"数据已保存到 {filepath}")
+    return count
 
 def save_as_lines(data, filename):
-    """将数据保存为每行一条记录的格式，使用制表符分隔"""
-    filepath = os.path.join(DATA_DIR, filename)
-    
-    # 清空并写入文件
-    with open(filepath, 'w', encoding='utf-8') as f:
-        for item in data:
-            time_display = str(item['timestamp']) if isinstance(item['timestamp'], int) else item['timestamp']
-            f.write(f"{item['server_name']}\t{item['server_url']}\t{item['server_type']}\t{time_display}\t{item['low_consumption']}\t{item['description']}\t{item['features']}\n")
-    
+    """
+    将数据保存为每行一条记录的格式，使用制表符分隔；data可以是生成器，逐条写入，返回写入的条数
+    同时把同样的记录保存为同名的列式文件（.col）和时间戳索引（.tsidx）
+    """
+    filepath = data_path(filename)
+    columnar = ColumnarWriter()
+    count = write_lines(columnar.tee(data), filepath)
+    _metrics.count(f'written_{filename}', count)
     print(f"数据已保存到 {filepath} (每行一条记录格式)")
+    columnar_path = data_path(f"{os.path.splitext(filename)[0]}.col")
+    columnar.write(columnar_path)
+    print(f"数据已保存到 {columnar_path} (列式格式，时间戳索引 {index_path_of(columnar_path)})")
+    return count
 
 def main():
-    """主函数"""
-    all_data = []
-    
-    # 采集所有URL的数据
-    for url in URLS:
-        print(f"正在采集: {url}")
-        data = scrape_url(url)
-        all_data.extend(data)
-        print(f"从 {url} 采集到 {len(data)} 条数据")
-    
-    # 采集API数据
-    api_url = "https://k-4-5.fhjkwerv.com:9001/api/gameAd/getList"
-    print(f"正在采集API: {api_url}")
-    api_data = scrape_api_data(api_url)
-    print(f"从API采集到 {len(api_data)} 条数据")
-    
-    # 将API数据添加到总数据中
-    all_data.extend(api_data)
+    """
+    主函数
+    按注册表并发采集各数据源，记录逐条写入临时文件，再由publish_run合并并生成存储记录、输出文件和变更文件
+    """
+    cache = ResponseCache()
+    archive = ResponseArchive()
+    reset_time_parser()
+    run_metrics = reset_metrics()
+    specs = registry()
     
-    # 去重
-    unique_data = deduplicate_data(all_data)
-    print(f"去重后共有 {len(unique_data)} 条数据")
+    # 上次运行采集到的API记录，用于分页采集时提前结束（只有一个API数据源时使用）；
+    # 距上次完整采集超过API_FULL_CRAWL_INTERVAL时不沿用，重新请求全部页以发现上游删除的记录
+    api_specs = [spec for spec in specs if spec.parser == PARSER_JSON_API]
+    known_api_data = None
+    if len(api_specs) == 1 and api_specs[0].source == SOURCE_API:
+        store = RecordStore()
+        try:
+            if not full_crawl_due(store.last_full_crawl(api_specs[0].url), _time_parser.now_ts):
+                known_api_data = store.last_run(SOURCE_API)
+        finally:
+            store.close()
     
-    # 过滤出需要保存到9pk的数据（排除API数据和jjj.com数据）
-    # API数据的unique_id包含API记录的unique_id
-    # jjj.com数据的server_url包含jjj.com
-    api_unique_ids = [api_item['unique_id'] for api_item in api_data]
-    filtered_data = [item for item in unique_data 
-                    if item['unique_id'] not in api_unique_ids 
-                    and "jjj.com" not in item['server_url']]
+    # 所有网页和API并发采集，总耗时取决于最慢的数据源
+    jobs = [partial(scrape_api_data, known=known_api_data) if spec.parser == PARSER_JSON_API else scrape_url
+            for spec in specs]
+    for spec in specs:
+        print(f"正在采集: {spec.url}")
+    spools = [RecordSpool() for _ in specs]
+    set_archive(archive)
+    try:
+        try:
+            with run_metrics.stage('scrape'), ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(jobs))) as executor:
+                futures = [executor.submit(func, spec.url, cache, sink=spool)
+                           for spec, func, spool in zip(specs, jobs, spools)]
+                for future in futures:
+                    future.result()
+        finally:
+            set_archive(None)
+            close_sessions()
+            close_parse_pool()
+        
+        publish_run(specs, spools, _time_parser.now_ts, run_metrics)
+        
+        # 记录完整采集的时间，下次运行据此决定能否提前结束分页
+        full_crawls = [spec.url for spec in api_specs if crawled_in_full(run_metrics, spec.url)]
+        if full_crawls:
+            store = RecordStore()
+            try:
+                for url in full_crawls:
+                    store.save_full_crawl(url, _time_parser.now_ts)
+            finally:
+                store.close()
+    finally:
+        for spool in spools:
+            spool.close()
     
-    # 保存到Markdown文件
-    save_to_markdown(filtered_data, "9pk.md")
+    cache.evict()
+    print(cache.summary())
+    for key, value in cache.stats.items():
+        run_metrics.count(f'cache_{key}', value)
+    archive.evict()
+    print(archive.summary())
+    for key, value in archive.stats.items():
+        run_metrics.count(f'archive_{key}', value)
+    print(f"运行报告已保存到 {run_metrics.write_report()}")
+    print("采集完成!")
+
+def publish_run(specs, spools, run_at, run_metrics):
+    """
+    合并一次运行中各数据源的记录（spools与注册表specs一一对应）并生成输出
+    按注册表顺序逐条去重后直接写入存储；输出文件和变更文件都从存储中逐条读出本次运行的记录，
+    内存中不保存整个记录列表。返回各类变更的条数
+    """
+    for spec, spool in zip(specs, spools):
+        if spec.parser == PARSER_JSON_API:
+            print(f"从API采集到 {len(spool)} 条数据")
+        else:
+            print(f"从 {spec.url} 采集到 {len(spool)} 条数据")
     
-    # 保存为每行一条记录的格式
-    save_as_lines(filtered_data, "9pk.txt")
+    # 按数据源原有顺序逐条去重并写入SQLite存储，输出文件由存储中本次运行出现的记录生成
+    store = RecordStore()
+    try:
+        with run_metrics.stage('store'):
+            stored = store.upsert(iter_deduplicated(chain.from_iterable(spools)), run_at)
+        run_metrics.count('dedup_input', sum(len(spool) for spool in spools))
+        run_metrics.count('dedup_output', stored)
+        print(f"去重后共有 {stored} 条数据")
+        print(f"已写入存储 {store.path}，共 {store.count()} 条历史记录")
+        
+        # 把本次首次出现的记录累加到按开区时间分桶的汇总表
+        with run_metrics.stage('rollup'):
+            rolled = Rollups(store).ingest(run_at)
+        run_metrics.count('rollup_records', rolled)
+        print(f"开区数汇总: 累加 {rolled} 条首次出现的记录")
+        
+        # 近似重复聚类不在每次运行中进行，需要时运行 python cli.py cluster
+        with run_metrics.stage('output'):
+            # 保存到Markdown文件，同时统计各输出文件的条数
+            sink_counts = Counter()
+            save_to_markdown(iter_sink(tally_sinks(store.iter_seen_at(SOURCES, run_at), sink_counts), SINK_9PK),
+                             "9pk.md")
+            
+            # 保存为每行一条记录的格式
+            save_as_lines(iter_sink(store.iter_seen_at(SOURCES, run_at), SINK_9PK), "9pk.txt")
+            
+            # 保存API数据到30ok.txt
+            if any(len(spool) for spec, spool in zip(specs, spools) if spec.sink == SINK_30OK):
+                count = save_as_lines(iter_sink(store.iter_seen_at(SOURCES, run_at), SINK_30OK), "30ok.txt")
+                print(f"API数据已保存到 30ok.txt，共 {count} 条数据")
+            
+            # 保存jjj.com数据到jjj.txt
+            if sink_counts[SINK_JJJ]:
+                count = save_as_lines(iter_sink(store.iter_seen_at(SOURCES, run_at), SINK_JJJ), "jjj.txt")
+                print(f"jjj.com数据已保存到 jjj.txt，共 {count} 条数据")
+            else:
+                print(f"jjj.com数据未找到，本次运行共有 {stored} 条数据")
+                if VERBOSE:
+                    # 调试：检查前几条数据的来源
+                    for i, item in enumerate(islice(store.iter_seen_at(SOURCES, run_at), 5)):
+                        print(f"调试数据 {i}: source = {item.source}, unique_id = {item.unique_id}")
+        
+        # 与上一次运行比较，把新增、删除和变化的记录追加到变更文件
+        # 本次没有采集到数据的来源（请求失败等）保留原有记录，不输出为删除；
+        # 开区时间无效、改用运行时间的记录每次重新解析后unique_id都不同，不写入变更文件
+        failed_sources = {spec.source for spec, spool in zip(specs, spools) if not len(spool)}
+        with run_metrics.stage('feed'):
+            feed = ChangeFeed()
+            changes = feed.append(store.iter_seen_at(SOURCES, run_at, skip_substituted=True), run_at,
+                                  keep_sources=failed_sources)
+    finally:
+        store.close()
+    for change, count in changes.items():
+        run_metrics.count(f'feed_{change}', count)
+    print(f"变更已追加到 {feed.path}（第 {feed.seq} 次运行）: 新增 {changes[CHANGE_ADDED]} 条，"
+          f"删除 {changes[CHANGE_REMOVED]} 条，变化 {changes[CHANGE_MODIFIED]} 条")
+    return changes
+
+def write_changes(changes, filename="watch.jsonl"):
+    """将watch模式下新增或变化的记录追加到JSON Lines文件，每行一条"""
+    filepath = data_path(filename)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    detected_at = datetime.now().isoformat(timespec='seconds')
+    with open(filepath, 'a', encoding='utf-8') as f:
+        for change, record in changes:
+            f.write(json.dumps(dict(record.to_dict(), change=change, detected_at=detected_at),
+                               ensure_ascii=False) + "\n")
+    return filepath
+
+def watch(min_interval=watch_config.WATCH_MIN_INTERVAL, max_interval=watch_config.WATCH_MAX_INTERVAL,
+          requests_per_minute=watch_config.WATCH_REQUESTS_PER_MINUTE, stop_event=None, emit=write_changes):
+    """
+    常驻运行，按各数据源的变化频率分别轮询，每次轮询只输出新增或变化的记录
+    Session、HTTP缓存、时间解析缓存和去重索引在多次轮询之间保留在内存中，跨天时重置时间解析器
+    """
+    stop_event = stop_event or threading.Event()
+    cache = ResponseCache()
+    state = WatchState()
+    schedules = [SourceSchedule(spec.url, min_interval, max_interval) for spec in registry()]
+    known_api_data = {}
+    full_crawled_at = {}
+    parsed_on = None
+    archive = ResponseArchive()
+    set_rate_budget(RateBudget(requests_per_minute))
+    set_archive(archive)
+    try:
+        while not stop_event.is_set():
+            schedule = min(schedules, key=lambda item: item.next_due)
+            wait = schedule.next_due - time.time()
+            if wait > 0 and stop_event.wait(wait):
+                break
+            
+            # "今日14:00"等相对时间依赖当天日期，跨天时重新创建时间解析器
+            if parsed_on != date.today():
+                reset_time_parser()
+                cache.evict()
+                archive.evict()
+                parsed_on = date.today()
+            
+            url = schedule.url
+            is_api = spec_of(url).parser == PARSER_JSON_API
+            run_metrics = reset_metrics()
+            if is_api:
+                # 距上次完整采集超过API_FULL_CRAWL_INTERVAL时请求全部页
+                known = None if full_crawl_due(full_crawled_at.get(url), time.time()) else known_api_data.get(url)
+                records = scrape_api_data(url, cache, known=known)
+            else:
+                records = scrape_url(url, cache)
+            
+            # 采集失败或列表为空时保留原有记录，避免下次轮询把所有记录当作新增
+            if not records or run_metrics.sources.get(url, {}).get('error'):
+                schedule.record(False, time.time(), failed=True)
+                print(f"[{datetime.now():%H:%M:%S}] {url}: 未采集到数据，{schedule.interval:.0f}秒后重试")
+                continue
+            if is_api:
+                known_api_data[url] = records
+                if crawled_in_full(run_metrics, url):
+                    full_crawled_at[url] = time.time()
+            
+            changes = state.apply(url, records)
+            schedule.record(bool(changes), time.time())
+            if changes:
+                emit(changes)
+            added = sum(1 for change, _ in changes if change == CHANGE_ADDED)
+            print(f"[{datetime.now():%H:%M:%S}] {url}: {len(records)} 条记录，新增 {added} 条，"
+                  f"变化 {len(changes) - added} 条，下次轮询间隔 {schedule.interval:.0f}秒")
+    finally:
+        set_rate_budget(None)
+        set_archive(None)
+        close_sessions()
+        close_parse_pool()
+
+def _reparse_response(archive_dir, digest, run_at, parser_source, encoding, source, content_type=None):
+    """
+    在解析进程中执行：读取存档中的响应体，按数据源的解析方式、用抓取时所属运行的参考时间解析，
+    编码与抓取时相同按存档的Content-Type响应头、BOM和<meta>识别，都没有时使用encoding（为None时使用来源的默认编码）。
+    返回记录（来源改为source）的元组列表和行统计，响应体不存在时记录为None
+    """
+    try:
+        body = read_blob(archive_dir, digest)
+    except OSError:
+        return None, {}
+    charset = sniff_charset(body[:SNIFF_BYTES], content_type, encoding or body_encoding(parser_source),
+                            meta=parser_source != SOURCE_API)
+    values, rows = _parse_chunk(parser_source, page_content(parser_source, body, charset), datetime.fromtimestamp(run_at))
+    if source != parser_source:
+        values = [(source, *record[1:]) for record in values]
+    return values, rows
+
+def _reparse_args(archive_dir, entry):
+    """
+    重新解析一个存档条目的参数：解析方式和默认编码取自当前注册表中该URL所属的数据源，
+    不在注册表中的URL按存档中记录的来源解析
+    """
+    spec = next((spec for spec in registry() if spec.matches(entry['url'])), None)
+    content_type = header_value(entry.get('headers'), 'Content-Type')
+    if spec is None:
+        return archive_dir, entry['body'], entry['run_at'], entry['source'], None, entry['source'], content_type
+    return archive_dir, entry['body'], entry['run_at'], spec.parser_source, spec.encoding, spec.source, content_type
+
+def _replay(entries, archive_dir, window):
+    """按存档顺序解析各个响应，同时在解析进程池中的响应不超过window个，按顺序返回(条目, 记录元组列表, 行统计)"""
+    pool = get_parse_pool()
+    if pool is None:
+        for entry in entries:
+            yield (entry, *_reparse_response(*_reparse_args(archive_dir, entry)))
+        return
+    pending = deque()
+    for entry in entries:
+        pending.append((entry, pool.submit(_reparse_response, *_reparse_args(archive_dir, entry))))
+        if len(pending) >= window:
+            entry, future = pending.popleft()
+            yield (entry, *future.result())
+    while pending:
+        entry, future = pending.popleft()
+        yield (entry, *future.result())
+
+def reparse(archive_dir=ARCHIVE_DIR, db_path=None, source=None, since=None):
+    """
+    离线重放存档中的响应：不访问网络，用当前的解析逻辑重新解析，每个响应使用抓取时所属运行的参考时间
+    逐行读取存档索引，多个响应在解析进程池中并行解析，内存占用与同时解析的响应数有关；
+    传入db_path时把每次运行的记录去重后按运行时间写入该存储，用于回填历史。返回运行指标
+    """
+    run_metrics = RunMetrics()
+    archive = ResponseArchive(archive_dir)
+    store = RecordStore(db_path) if db_path else None
+    rollups = Rollups(store) if store is not None else None
+    current_run, run_records = None, []
+    try:
+        with run_metrics.stage('reparse'):
+            for entry, values, rows in _replay(archive.entries(source, since), archive_dir, 2 * max(PARSE_WORKERS, 1)):
+                run_metrics.count('responses')
+                if values is None:
+                    run_metrics.count('missing_bodies')
+                    continue
+                run_metrics.merge_rows(rows)
+                run_metrics.count_rows(entry['source'], accepted=len(values))
+                run_metrics.count('bytes', entry['size'])
+                if store is None:
+                    continue
+                # 同一次运行的响应在存档中相邻，运行变化时写入上一次运行的记录
+                if entry['run_at'] != current_run and run_records:
+                    store.upsert(deduplicate_data(run_records), current_run)
+                    rollups.ingest(current_run)
+                    run_records = []
+                current_run = entry['run_at']
+                run_records.extend(ServerRecord.from_tuple(record) for record in values)
+            if store is not None and run_records:
+                store.upsert(deduplicate_data(run_records), current_run)
+                rollups.ingest(current_run)
+    finally:
+        close_parse_pool()
+        if store is not None:
+            store.close()
+    return run_metrics
+
+def reparse_main(args):
+    """reparse模式入口：重放存档并输出各来源的解析结果统计"""
+    from query import parse_time_arg
     
-    # 保存API数据到30ok.txt
-    if api_data:
-        api_unique_ids = [api_item['unique_id'] for api_item in api_data]
-        api_filtered_data = [item for item in unique_data if item['unique_id'] in api_unique_ids]
-        save_as_lines(api_filtered_data, "30ok.txt")
-        print(f"API数据已保存到 30ok.txt，共 {len(api_filtered_data)} 条数据")
+    since = parse_time_arg(args.since) if args.since else None
+    run_metrics = reparse(args.archive, args.db, args.source, since)
+    elapsed = run_metrics.stages.get('reparse', 0.0)
+    responses = run_metrics.counters['responses']
+    megabytes = run_metrics.counters['bytes'] / 1e6
+    print(f"重新解析 {responses} 个响应（{megabytes:.1f}MB），耗时 {elapsed:.2f}s"
+          + (f"，{megabytes / elapsed:.1f}MB/s" if elapsed else ""))
+    if run_metrics.counters['missing_bodies']:
+        print(f"存档中缺少 {run_metrics.counters['missing_bodies']} 个响应体")
+    for source, rows in run_metrics.row_counts().items():
+        print(f"{source}: 处理 {rows['seen']} 行，保留 {rows['accepted']} 条，丢弃 {dict(rows['rejected'])}，"
+              f"修正 {dict(rows['adjusted'])}")
+    if args.db:
+        print(f"记录已写入存储 {args.db}")
+    print(f"运行报告已保存到 {run_metrics.write_report(data_path('reparse_report.json'))}")
+
+def watch_main(args):
+    """watch模式入口，收到SIGTERM或Ctrl+C时在当前轮询结束后退出"""
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    print(f"watch模式已启动，新增或变化的记录写入 {data_path('watch.jsonl')}")
+    try:
+        watch(args.min_interval, args.max_interval, args.rate, stop_event)
+    except KeyboardInterrupt:
+        pass
+    print("watch模式已停止")
+
+def enqueue_run(queue):
+    """按当前注册表在队列中创建一次运行，每个数据源一个任务（API为第一页），返回运行编号"""
+    specs = registry()
+    config = {'sources': [spec.to_dict() for spec in specs], 'page_size': API_PAGE_SIZE}
+    tasks = [(position, spec.url, 1 if spec.parser == PARSER_JSON_API else 0) for position, spec in enumerate(specs)]
+    return queue.create_run(int(time.time()), config, tasks)
+
+def api_follow_up(page_num, count, total, page_size):
+    """API的一页完成后需要追加的页码，总页数的计算与scrape_api_data相同（见api_page_count）"""
+    page_count, ended = api_page_count(page_num, page_num, count, total, page_size)
+    return [] if ended else list(range(page_num + 1, page_count + 1))
+
+def run_task(queue, task, cache, page_size):
+    """
+    执行一个任务并把记录提交到队列，处理期间在后台续租；API的页面任务同时追加其后的页。
+    失败时交给队列重试，返回结果是否被接受
+    """
+    spec = registry()[task.position]
+    run_metrics = reset_metrics()
+    follow_up = []
+    page = None
+    error = None
+    with RecordSpool() as spool:
+        with LeaseHeartbeat(queue, task) as heartbeat, run_metrics.stage('task'):
+            if spec.parser == PARSER_JSON_API:
+                try:
+                    records, count, total = fetch_api_page(spec.url, task.page_num, page_size, cache)
+                    spool.extend(records)
+                    page = {'count': count, 'total': total}
+                    # 没有总条数时逐页追加，与前面的页全部重复的页（接口忽略分页参数）说明已到列表末尾
+                    if total is not None or not records or not _repeats_earlier_pages(queue, task, records):
+                        follow_up = [(spec.url, page_num)
+                                     for page_num in api_follow_up(task.page_num, count, total, page_size)]
+                except Exception as e:
+                    error = str(e)
+            else:
+                scrape_url(spec.url, cache, sink=spool)
+                error = run_metrics.sources.get(spec.url, {}).get('error')
+        if heartbeat.lost:
+            print(f"任务 {task.url} 的租约已过期并被其他worker租用，丢弃本次结果")
+            return False
+        meta = {'page': page, 'rows': run_metrics.row_counts(), 'sources': run_metrics.sources,
+                'stages': dict(run_metrics.stages)}
+        if error is not None:
+            state = queue.fail(task, error, meta)
+            print(f"任务 {task.url}（第 {task.attempts} 次尝试）失败: {error}"
+                  + ("，不再重试" if state == TASK_FAILED else ""))
+            return False
+        return queue.complete(task, (record.to_tuple() for record in spool), meta, follow_up)
+
+def _repeats_earlier_pages(queue, task, records):
+    """API某一页的记录是否全部出现在同一次运行中该数据源之前的页中"""
+    pending = {record.unique_id for record in records}
+    for earlier in queue.tasks(task.run_id):
+        if earlier.position != task.position or earlier.page_num >= task.page_num:
+            continue
+        pending.difference_update(ServerRecord.from_tuple(values).unique_id for values in queue.records(earlier.task_id))
+        if not pending:
+            return True
+    return False
+
+def work(queue_path=QUEUE_PATH, run_id=None, owner=None, stop_event=None):
+    """
+    worker进程：反复从队列中租用任务并执行，直到队列中没有等待中或租用中的任务，返回提交的任务数
+    各任务使用创建运行时保存的注册表和参考时间，多个worker的结果与单进程采集时相同
+    """
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    stop_event = stop_event or threading.Event()
+    queue = WorkQueue(queue_path)
+    cache = ResponseCache()
+    previous_registry = _registry
+    current_run = None
+    page_size = API_PAGE_SIZE
+    done = 0
+    set_archive(ResponseArchive())
+    try:
+        while not stop_event.is_set():
+            task = queue.lease(owner, run_id)
+            if task is None:
+                # 其他worker仍持有租约时等待，租约过期或追加了新的分页后可以继续租用
+                if not queue.unfinished(run_id):
+                    break
+                stop_event.wait(QUEUE_POLL_INTERVAL)
+                continue
+            if task.run_id != current_run:
+                current_run, run_at, config, _ = queue.run(task.run_id)
+                set_registry([SourceSpec(**entry) for entry in config['sources']])
+                reset_time_parser(datetime.fromtimestamp(run_at))
+                page_size = config['page_size']
+            if run_task(queue, task, cache, page_size):
+                done += 1
+    finally:
+        set_archive(None)
+        set_registry(previous_registry)
+        close_sessions()
+        close_parse_pool()
+        queue.close()
+    cache.evict()
+    return done
+
+def iter_api_pages(queue, tasks, page_size):
+    """
+    按页码顺序逐条读出API各页的记录，结束条件与scrape_api_data相同（见api_page_count）：
+    超出总页数、空页或全部与前面的页重复的页（接口忽略分页参数）之后的页不再使用，与前面的页重复的记录只保留一次
+    """
+    collected = set()
+    page_count = 1
+    for task in tasks:
+        if task.page_num > page_count:
+            break
+        count, total = task.meta['page']['count'], task.meta['page']['total']
+        records = [ServerRecord.from_tuple(values) for values in queue.records(task.task_id)]
+        new_records = [record for record in records if record.unique_id not in collected]
+        page_count, ended = api_page_count(page_count, task.page_num, count, total, page_size,
+                                           duplicate=bool(records and not new_records))
+        if ended:
+            break
+        collected.update(record.unique_id for record in new_records)
+        yield from new_records
+
+def merge_run(queue_path=QUEUE_PATH, run_id=None):
+    """
+    合并阶段：按注册表顺序读出一次运行（默认为最近一次）中各任务的记录，交给publish_run生成与main相同的
+    存储记录、9pk/30ok/jjj输出文件和变更文件。运行中还有未完成的任务或已合并时不合并，返回None；否则返回运行指标
+    """
+    queue = WorkQueue(queue_path)
+    try:
+        run = queue.run(run_id)
+        if run is None:
+            print(f"队列 {queue_path} 中没有运行")
+            return None
+        run_id, run_at, config, merged_at = run
+        if merged_at is not None:
+            print(f"运行 {run_id} 已合并")
+            return None
+        unfinished = queue.unfinished(run_id)
+        if unfinished:
+            print(f"运行 {run_id} 还有 {unfinished} 个任务未完成，暂不合并")
+            return None
+        
+        specs = [SourceSpec(**entry) for entry in config['sources']]
+        tasks = {}
+        for task in queue.tasks(run_id):
+            tasks.setdefault(task.position, []).append(task)
+        run_metrics = reset_metrics()
+        spools = [RecordSpool() for _ in specs]
+        try:
+            with run_metrics.stage('merge'):
+                for position, spec in enumerate(specs):
+                    source_tasks = tasks.get(position, [])
+                    for task in source_tasks:
+                        run_metrics.merge_rows(task.meta.get('rows', {}))
+                        run_metrics.merge_stages(task.meta.get('stages', {}))
+                        for url, fields in task.meta.get('sources', {}).items():
+                            run_metrics.update_source(url, **fields)
+                    # 与单进程采集相同，数据源的任一任务最终失败时该数据源没有记录
+                    failed = [task for task in source_tasks if task.state == TASK_FAILED]
+                    if failed:
+                        run_metrics.update_source(spec.url, source=spec.source, error=failed[0].error)
+                        continue
+                    if spec.parser == PARSER_JSON_API:
+                        records = iter_api_pages(queue, source_tasks, config['page_size'])
+                    else:
+                        records = (ServerRecord.from_tuple(values)
+                                   for task in source_tasks for values in queue.records(task.task_id))
+                    spools[position].extend(records)
+                    if spec.parser == PARSER_JSON_API:
+                        run_metrics.update_source(spec.url, source=spec.source, pages=len(source_tasks),
+                                                  rows=len(spools[position]))
+            publish_run(specs, spools, run_at, run_metrics)
+        finally:
+            for spool in spools:
+                spool.close()
+        queue.mark_merged(run_id)
+    finally:
+        queue.close()
+    print(f"运行报告已保存到 {run_metrics.write_report()}")
+    return run_metrics
+
+def _worker_process(queue_path, run_id):
+    """本机worker子进程入口"""
+    try:
+        work(queue_path, run_id)
+    except KeyboardInterrupt:
+        pass
+
+def queue_main(args):
+    """
+    队列模式入口
+    --enqueue创建一次运行；--worker从队列中租用并执行任务（可在多台机器上共用同一个队列文件）；
+    --merge合并已完成的运行；--workers N创建运行、在本机启动N个worker进程并在完成后合并
+    """
+    queue = WorkQueue(args.queue)
+    try:
+        run_id = args.run_id
+        if args.enqueue or args.workers:
+            run_id = enqueue_run(queue)
+            print(f"已在队列 {args.queue} 中创建运行 {run_id}，共 {len(registry())} 个数据源")
+    finally:
+        queue.close()
     
-    # 保存jjj.com数据到jjj.txt
-    # 在采集jjj.com数据时，我们在unique_id中添加标记
-    jjj_data = [item for item in unique_data if '_jjj_' in item.get('unique_id', '')]
-    if jjj_data:
-        save_as_lines(jjj_data, "jjj.txt")
-        print(f"jjj.com数据已保存到 jjj.txt，共 {len(jjj_data)} 条数据")
+    if args.worker:
+        try:
+            done = work(args.queue, run_id)
+        except KeyboardInterrupt:
+            # 未完成的任务在租约过期后由其他worker重新执行
+            print("worker已停止")
+            return
+        print(f"worker已完成 {done} 个任务")
+    if args.workers:
+        context = multiprocessing.get_context('spawn')
+        workers = [context.Process(target=_worker_process, args=(args.queue, run_id)) for _ in range(args.workers)]
+        start = time.perf_counter()
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        print(f"{args.workers} 个worker完成运行 {run_id} 的任务，耗时 {time.perf_counter() - start:.2f}s")
+    if args.merge or args.workers:
+        merge_run(args.queue, run_id)
+
+def scrape_main(args):
+    """
+    采集命令入口（cli.py scrape，参数见cli.add_scrape_arguments），注册表已由调用方设置
+    按参数进入watch模式、reparse模式或队列模式，默认采集一次
+    """
+    if args.watch:
+        watch_main(args)
+    elif args.reparse:
+        reparse_main(args)
+    elif args.enqueue or args.worker or args.merge or args.workers:
+        queue_main(args)
     else:
-        print(f"jjj.com数据未找到，unique_data中共有 {len(unique_data)} 条数据")
-        # 调试：检查前几条数据的unique_id
-        for i, item in enumerate(unique_data[:5]):
-            print(f"调试数据 {i}: unique_id = {item.get('unique_id', 'N/A')}")
-    
-    print("采集完成!")
+        main()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 命令行参数由cli.py解析，python scraper.py [选项] 等同于 python cli.py scrape [选项]
+    from cli import main as cli_main
+    raise SystemExit(cli_main())
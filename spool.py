@@ -0,0 +1,70 @@
+"""
+记录暂存文件
+采集线程把记录逐条写入临时文件而不是保存在列表中，合并阶段再按数据源顺序逐条读出，
+内存占用只与写缓冲区的大小有关，与页面和记录数无关
+"""
+import pickle
+import tempfile
+
+from records import ServerRecord
+
+# 每批序列化的记录数
+SPOOL_BATCH = 1000
+
+
+class RecordSpool:
+    """只追加的记录暂存文件，接口与list的append/extend/clear一致，可以多次从头遍历"""
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._batch = []
+        self._count = 0
+
+    def append(self, record):
+        self._batch.append(record.to_tuple())
+        self._count += 1
+        if len(self._batch) >= SPOOL_BATCH:
+            self._flush()
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def clear(self):
+        """丢弃已写入的记录，如数据源采集中途失败时"""
+        self._batch = []
+        self._count = 0
+        self._file.seek(0)
+        self._file.truncate()
+
+    def _flush(self):
+        if self._batch:
+            pickle.dump(self._batch, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+            self._batch = []
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        """按写入顺序逐条读出记录"""
+        self._flush()
+        position = 0
+        while True:
+            self._file.seek(position)
+            try:
+                batch = pickle.load(self._file)
+            except EOFError:
+                break
+            position = self._file.tell()
+            for values in batch:
+                yield ServerRecord.from_tuple(values)
+        self._file.seek(0, 2)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
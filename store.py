@@ -0,0 +1,219 @@
+"""
+基于SQLite的开区信息存储
+以unique_id为主键增量保存每次采集的记录，并记录首次/最近出现时间
+data目录下的.md/.txt文件由该存储生成，不再是唯一的数据来源
+"""
+import os
+import sqlite3
+
+from records import ProbeResult, ServerRecord
+
+DB_PATH = os.path.join("data", "records.db")
+
+# 记录字段，顺序与ServerRecord的构造参数一致
+RECORD_FIELDS = ['source', 'server_name', 'server_url', 'server_type', 'timestamp',
+                 'low_consumption', 'description', 'features', 'time_substituted']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    unique_id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    server_name TEXT NOT NULL,
+    server_url TEXT NOT NULL,
+    server_type TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    low_consumption TEXT NOT NULL,
+    description TEXT NOT NULL,
+    features TEXT NOT NULL,
+    time_substituted INTEGER NOT NULL DEFAULT 0,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    run_order INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_records_timestamp ON records (timestamp);
+CREATE INDEX IF NOT EXISTS idx_records_server_url ON records (server_url);
+CREATE INDEX IF NOT EXISTS idx_records_source_seen ON records (source, last_seen);
+CREATE INDEX IF NOT EXISTS idx_records_last_seen ON records (last_seen);
+CREATE INDEX IF NOT EXISTS idx_records_first_seen ON records (first_seen);
+CREATE TABLE IF NOT EXISTS probes (
+    endpoint TEXT PRIMARY KEY,
+    alive INTEGER NOT NULL,
+    latency_ms REAL,
+    status INTEGER,
+    error TEXT,
+    checked_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS full_crawls (
+    url TEXT PRIMARY KEY,
+    crawled_at INTEGER NOT NULL
+);
+"""
+
+# 早期版本的records表没有time_substituted列，打开时补上（已有的记录视为未代替，下次出现时更新）
+MIGRATIONS = {
+    'time_substituted': "ALTER TABLE records ADD COLUMN time_substituted INTEGER NOT NULL DEFAULT 0",
+}
+
+# 探测结果字段，顺序与ProbeResult的构造参数一致
+PROBE_FIELDS = ['endpoint', 'alive', 'latency_ms', 'status', 'error', 'checked_at']
+
+UPSERT_SQL = """
+INSERT INTO records (unique_id, source, server_name, server_url, server_type, timestamp,
+                     low_consumption, description, features, time_substituted, first_seen, last_seen, run_order)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (unique_id) DO UPDATE SET
+    source = excluded.source,
+    server_name = excluded.server_name,
+    server_type = excluded.server_type,
+    low_consumption = excluded.low_consumption,
+    description = excluded.description,
+    features = excluded.features,
+    time_substituted = excluded.time_substituted,
+    last_seen = excluded.last_seen,
+    run_order = excluded.run_order
+"""
+
+
+def text_value(value):
+    """文本列的值：None保存为空字符串，数字转换为字符串，其他类型（如嵌套对象）无法保存，也改为空字符串"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return str(value)
+    return ''
+
+
+def normalize_record(record):
+    """文本字段都是字符串时原样返回，否则返回各文本字段经text_value转换后的记录，写入时不会违反NOT NULL约束"""
+    values = (record.server_name, record.server_url, record.server_type, record.low_consumption,
+              record.description, record.features)
+    try:
+        # 字段都是字符串时join不会出错，比逐个检查类型快
+        ''.join(values)
+        return record
+    except TypeError:
+        pass
+    name, url, server_type, low_consumption, description, features = map(text_value, values)
+    return ServerRecord(record.source, name, url, server_type, record.timestamp, low_consumption, description,
+                        features, record.time_substituted)
+
+
+class RecordStore:
+    """开区信息的持久化存储（WAL模式）"""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(records)")}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                self.conn.execute(statement)
+
+    def upsert(self, records, seen_at):
+        """
+        在一个事务中批量写入记录
+        records为ServerRecord序列，已存在的记录只更新内容和最近出现时间；文本字段不是字符串时按normalize_record转换；
+        records可以是生成器，逐条写入而不在内存中保存整批数据，返回写入的条数
+        """
+        count = 0
+
+        def rows():
+            nonlocal count
+            for order, record in enumerate(map(normalize_record, records)):
+                count += 1
+                yield (record.unique_id, record.source, record.server_name, record.server_url, record.server_type,
+                       record.timestamp, record.low_consumption, record.description, record.features,
+                       int(record.time_substituted), seen_at, seen_at, order)
+
+        with self.conn:
+            self.conn.executemany(UPSERT_SQL, rows())
+        return count
+
+    def seen_at(self, sources, seen_at):
+        """按采集顺序返回指定来源在某次运行中出现的记录（ServerRecord列表）"""
+        return list(self.iter_seen_at(sources, seen_at))
+
+    def iter_seen_at(self, sources, seen_at, skip_substituted=False):
+        """
+        与seen_at相同，但从游标中逐条读出记录，可以多次调用分别遍历
+        skip_substituted为True时跳过开区时间被运行时间代替的记录（time_substituted列）
+        """
+        placeholders = ",".join("?" * len(sources))
+        condition = " AND NOT time_substituted" if skip_substituted else ""
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(RECORD_FIELDS)} FROM records "
+            f"WHERE source IN ({placeholders}) AND last_seen = ?{condition} ORDER BY run_order",
+            (*sources, seen_at),
+        )
+        for row in cursor:
+            yield ServerRecord(*row)
+
+    def last_run(self, source):
+        """按采集顺序返回某个来源最近一次运行中出现的记录"""
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(RECORD_FIELDS)} FROM records "
+            f"WHERE source = ? AND last_seen = (SELECT MAX(last_seen) FROM records WHERE source = ?) "
+            f"ORDER BY run_order",
+            (source, source),
+        )
+        return [ServerRecord(*row) for row in cursor]
+
+    def seen_since(self, since):
+        """返回最近出现时间晚于since的记录及其中最大的最近出现时间，用于增量同步"""
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(RECORD_FIELDS)}, last_seen FROM records "
+            f"WHERE last_seen > ? ORDER BY last_seen, run_order",
+            (since,),
+        )
+        records = []
+        latest = since
+        for row in cursor:
+            records.append(ServerRecord(*row[:-1]))
+            latest = row[-1]
+        return records, latest
+
+    def latest_run(self, sources):
+        """按采集顺序返回指定来源最近一次运行中出现的记录"""
+        placeholders = ",".join("?" * len(sources))
+        row = self.conn.execute(
+            f"SELECT MAX(last_seen) FROM records WHERE source IN ({placeholders})", tuple(sources)).fetchone()
+        return self.seen_at(sources, row[0]) if row[0] is not None else []
+
+    def save_probes(self, results):
+        """在一个事务中写入探测结果，每个地址只保留最近一次的结果"""
+        rows = [(result.endpoint, int(result.alive), result.latency_ms, result.status, result.error,
+                 result.checked_at) for result in results]
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO probes ({', '.join(PROBE_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def probes(self, checked_since=0):
+        """返回探测时间不早于checked_since的探测结果，{地址: ProbeResult}"""
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(PROBE_FIELDS)} FROM probes WHERE checked_at >= ?", (checked_since,))
+        return {row[0]: ProbeResult(*row) for row in cursor}
+
+    def last_full_crawl(self, url):
+        """返回分页接口最近一次完整采集（未提前结束）的运行时间，从未完整采集过时返回None"""
+        row = self.conn.execute("SELECT crawled_at FROM full_crawls WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def save_full_crawl(self, url, crawled_at):
+        """记录分页接口的一次完整采集"""
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO full_crawls (url, crawled_at) VALUES (?, ?)",
+                              (url, crawled_at))
+
+    def count(self):
+        """存储中的记录总数"""
+        return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self):
+        """合并WAL日志并关闭连接"""
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.conn.close()
@@ -0,0 +1,154 @@
+"""
+开区时间解析
+所有数据源共用的字符串时间解析：预编译的格式匹配、按原始文本缓存的结果，
+以及每次运行固定的参考时间（用于"今日"和无年份日期的年份推断）
+"""
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+# 每次运行缓存的不同时间文本数量上限
+TIME_CACHE_SIZE = 4096
+
+# 无年份的日期与参考时间相差超过半年时，视为跨年（如12月采集到的1月开区）
+YEAR_ROLLOVER = timedelta(days=183)
+
+# 中文数字映射
+CHINESE_NUMBERS = {
+    '零': 0, '一': 1, '二': 2, '三': 3, '四': 4,
+    '五': 5, '六': 6, '七': 7, '八': 8, '九': 9, '十': 10,
+    '十一': 11, '十二': 12, '十三': 13, '十四': 14, '十五': 15,
+    '十六': 16, '十七': 17, '十八': 18, '十九': 19, '二十': 20
+}
+
+DIGITS_PATTERN = re.compile(r'\d+')
+# 今日14:00
+TODAY_PATTERN = re.compile(r'今日\s*(\d{1,2})[:：](\d{1,2})')
+# 10月9日/9点开放、10月9日 九点（从文本开头匹配）
+MONTH_DAY_PATTERN = re.compile(r'(\d+)月(\d+)日[/\s]*([\d零一二三四五六七八九十]+)[点时]([\d零一二三四五六七八九十]*)')
+# API时间: 2025-10-10 13:00:00、2025-10-10 13:00、2025-10-10
+API_DATE_PATTERN = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})(?: (\d{1,2}):(\d{1,2})(?::(\d{1,2}))?)?')
+# API时间: 10月10日/13:00、10-10 13:00
+API_MONTH_DAY_PATTERN = re.compile(r'(\d{1,2})(?:月|-)(\d{1,2})(?:日/| )(\d{1,2}):(\d{1,2})')
+
+
+def chinese_to_num(chinese_str):
+    """将中文数字转换为阿拉伯数字"""
+    if isinstance(chinese_str, int):
+        return chinese_str
+    if isinstance(chinese_str, str) and chinese_str.isdigit():
+        return int(chinese_str)
+    if not chinese_str:
+        return 0
+
+    if chinese_str in CHINESE_NUMBERS:
+        return CHINESE_NUMBERS[chinese_str]
+
+    # 尝试提取字符串中的数字
+    numbers = DIGITS_PATTERN.findall(chinese_str)
+    return int(numbers[0]) if numbers else 0
+
+
+class TimeParser:
+    """
+    带缓存的时间解析器，每次运行创建一个
+    同一次运行中的所有行共用一个参考时间，相同的时间文本只解析一次
+    """
+
+    def __init__(self, now=None, cache_size=TIME_CACHE_SIZE):
+        self.now = now or datetime.now()
+        self.now_ts = int(self.now.timestamp())
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+        self.parse_api = lru_cache(maxsize=cache_size)(self._parse_api)
+
+    def _timestamp(self, month, day, hour=0, minute=0, second=0, year=None):
+        """生成时间戳，未给出年份时根据参考时间推断（跨年见YEAR_ROLLOVER），日期无效时返回None"""
+        if year is not None:
+            try:
+                return int(datetime(year, month, day, hour, minute, second).timestamp())
+            except ValueError:
+                return None
+        # 依次尝试今年、去年和明年，取第一个与参考时间相差不超过半年的日期；
+        # 2月29日只在闰年有效，附近都没有闰年时取有效的日期中最接近参考时间的
+        candidates = []
+        for year in (self.now.year, self.now.year - 1, self.now.year + 1):
+            try:
+                candidates.append(datetime(year, month, day, hour, minute, second))
+            except ValueError:
+                continue
+        if not candidates:
+            return None
+        for dt in candidates:
+            if abs(dt - self.now) <= YEAR_ROLLOVER:
+                return int(dt.timestamp())
+        return int(min(candidates, key=lambda dt: abs(dt - self.now)).timestamp())
+
+    def _parse(self, time_text):
+        """
+        解析网页上的时间文本并转换为时间戳
+        "精品全天推荐"等无法解析的文本原样返回
+        """
+        # 格式1: 精品全天推荐，不更改
+        if "精品全天推荐" in time_text:
+            return time_text
+
+        # 格式2: 今日时间
+        match = TODAY_PATTERN.search(time_text)
+        if match:
+            hour, minute = int(match.group(1)), int(match.group(2))
+            try:
+                return int(self.now.replace(hour=hour, minute=minute, second=0, microsecond=0).timestamp())
+            except ValueError:
+                return time_text
+
+        # 格式3: 依次取出数字作为月、日、时、分（如10月10日/13:00）
+        numbers = DIGITS_PATTERN.findall(time_text)
+        if len(numbers) >= 2:
+            month, day = int(numbers[0]), int(numbers[1])
+            hour = int(numbers[2]) if len(numbers) > 2 else 0
+            minute = int(numbers[3]) if len(numbers) > 3 else 0
+            timestamp = self._timestamp(month, day, hour, minute)
+            if timestamp is not None:
+                return timestamp
+
+        # 格式4: 月日/时分，小时和分钟可以是中文数字；与原parse_time_to_timestamp相同，在格式3之后尝试
+        match = MONTH_DAY_PATTERN.match(time_text)
+        if match:
+            month, day, hour, minute = match.groups()
+            timestamp = self._timestamp(int(month), int(day), chinese_to_num(hour),
+                                        chinese_to_num(minute) if minute else 0)
+            if timestamp is not None:
+                return timestamp
+
+        return time_text
+
+    def _parse_api(self, time_str):
+        """
+        解析API返回的时间
+        支持时间戳、带年份和不带年份的日期时间，无法解析时返回参考时间
+        """
+        if not time_str:
+            return self.now_ts
+
+        if isinstance(time_str, (int, float)):
+            return int(time_str)
+
+        if isinstance(time_str, str):
+            # 时间戳字符串
+            if time_str.isdigit():
+                return int(time_str)
+
+            match = API_DATE_PATTERN.fullmatch(time_str)
+            if match:
+                year, month, day, hour, minute, second = (int(value) if value else 0 for value in match.groups())
+                timestamp = self._timestamp(month, day, hour, minute, second, year=year)
+                if timestamp is not None:
+                    return timestamp
+
+            match = API_MONTH_DAY_PATTERN.fullmatch(time_str)
+            if match:
+                timestamp = self._timestamp(*(int(value) for value in match.groups()))
+                if timestamp is not None:
+                    return timestamp
+
+        return self.now_ts
@@ -0,0 +1,109 @@
+"""
+常驻采集（watch模式）的调度与状态
+每个数据源按自己的间隔轮询：内容有变化时缩短间隔，没有变化时逐渐放慢，每次间隔加入随机抖动；
+所有数据源的请求共用一个全局速率预算。WatchState在内存中保存各数据源当前的记录，每次轮询只给出新增或变化的记录
+"""
+import random
+import threading
+import time
+
+from changefeed import CHANGE_ADDED, CHANGE_MODIFIED
+
+# 轮询间隔（秒）的上下限和初始值，以及随机抖动的比例
+WATCH_MIN_INTERVAL = 120
+WATCH_MAX_INTERVAL = 3600
+WATCH_INITIAL_INTERVAL = 600
+WATCH_JITTER = 0.2
+
+# 有变化时间隔乘以WATCH_SPEEDUP，无变化或采集失败时乘以WATCH_SLOWDOWN
+WATCH_SPEEDUP = 0.5
+WATCH_SLOWDOWN = 1.5
+
+# 全局速率预算：所有数据源每分钟最多发出的请求数
+WATCH_REQUESTS_PER_MINUTE = 20
+
+
+class RateBudget:
+    """全局请求速率预算（令牌桶），可在多个线程中同时使用"""
+
+    def __init__(self, per_minute=WATCH_REQUESTS_PER_MINUTE, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or max(per_minute // 4, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取得一次请求的额度，预算不足时等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SourceSchedule:
+    """单个数据源的轮询间隔和下次轮询时间"""
+
+    def __init__(self, url, min_interval=WATCH_MIN_INTERVAL, max_interval=WATCH_MAX_INTERVAL,
+                 initial_interval=WATCH_INITIAL_INTERVAL, jitter=WATCH_JITTER, rng=None):
+        self.url = url
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min(max(initial_interval, min_interval), max_interval)
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        # 启动后立即轮询一次
+        self.next_due = 0.0
+
+    def record(self, changed, now, failed=False):
+        """根据本次轮询的结果调整间隔并安排下次轮询"""
+        if changed and not failed:
+            self.interval = max(self.min_interval, self.interval * WATCH_SPEEDUP)
+        else:
+            self.interval = min(self.max_interval, self.interval * WATCH_SLOWDOWN)
+        self.next_due = now + self.interval * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class WatchState:
+    """
+    各数据源当前记录的内存索引
+    以去重键(URL, 时间戳)索引所有数据源的记录，同一记录出现在多个数据源时归先采集到它的数据源所有，
+    与deduplicate_data的规则一致；每个数据源只保留最近一次轮询的记录，内存占用与当前列表大小相当
+    """
+
+    def __init__(self):
+        self.index = {}    # 去重键 -> (数据源URL, 记录内容)
+        self.owned = {}    # 数据源URL -> 该数据源拥有的去重键
+
+    def apply(self, url, records):
+        """用数据源最新的记录更新索引，返回[(变化类型, 记录)]，只包含新增或内容变化的记录"""
+        current = {}
+        for record in records:
+            current.setdefault(record.dedup_key, record)
+
+        # 从列表中消失的记录不再占用去重键
+        for key in self.owned.get(url, set()) - current.keys():
+            del self.index[key]
+
+        changes = []
+        owned = set()
+        for key, record in current.items():
+            fingerprint = record.to_tuple()
+            entry = self.index.get(key)
+            if entry is None:
+                changes.append((CHANGE_ADDED, record))
+            elif entry[0] != url:
+                # 已由其他数据源采集到的重复记录
+                continue
+            elif entry[1] != fingerprint:
+                changes.append((CHANGE_MODIFIED, record))
+            self.index[key] = (url, fingerprint)
+            owned.add(key)
+        self.owned[url] = owned
+        return changes
@@ -0,0 +1,288 @@
+"""
+基于SQLite的持久化任务队列
+一次采集运行（run）按注册表为每个数据源生成一个任务，API的其余分页由第一页的任务完成时追加。
+同一台机器上的多个worker进程共用一个数据库文件，从队列中租用任务（WAL模式依赖本机的共享内存，
+数据库文件不能放在网络文件系统上由多台机器共用）：
+- 租用时设置租约到期时间（可见性超时），worker崩溃或超时未完成的任务在到期后可以被其他worker重新租用
+- 完成任务时只有当前租约的持有者能提交结果，过期后被重新租用的任务的旧结果被丢弃
+- 失败的任务在延迟后重试，尝试次数达到上限后标记为失败
+任务的记录与任务状态在同一个事务中写入，合并阶段按数据源和页码顺序读出
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+QUEUE_PATH = os.path.join(".cache", "queue.db")
+
+# 租约时长（秒），worker在处理期间定期续租；任务的最多尝试次数，以及失败后重试前的等待时间（秒，按尝试次数递增）
+VISIBILITY_TIMEOUT = 120
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 5
+
+# 等待其他连接释放写锁的最长时间（秒）
+BUSY_TIMEOUT = 30
+
+# 任务状态
+TASK_PENDING = 'pending'
+TASK_LEASED = 'leased'
+TASK_DONE = 'done'
+TASK_FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_at INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    config TEXT NOT NULL,
+    merged_at REAL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    page_num INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    meta TEXT,
+    UNIQUE (run_id, position, page_num)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks (state, available_at);
+CREATE TABLE IF NOT EXISTS task_records (
+    task_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (task_id, seq)
+);
+"""
+
+
+class Task:
+    """队列中的一个任务：运行编号、数据源在注册表中的位置、地址、页码（不分页的数据源为0）和租约信息"""
+
+    __slots__ = ('task_id', 'run_id', 'position', 'url', 'page_num', 'state', 'attempts',
+                 'lease_owner', 'error', 'meta')
+
+    def __init__(self, task_id, run_id, position, url, page_num, state, attempts, lease_owner, error, meta):
+        self.task_id = task_id
+        self.run_id = run_id
+        self.position = position
+        self.url = url
+        self.page_num = page_num
+        self.state = state
+        self.attempts = attempts
+        self.lease_owner = lease_owner
+        self.error = error
+        self.meta = json.loads(meta) if meta else {}
+
+    def __repr__(self):
+        return (f"Task(task_id={self.task_id!r}, run_id={self.run_id!r}, url={self.url!r}, "
+                f"page_num={self.page_num!r}, state={self.state!r}, attempts={self.attempts!r})")
+
+
+TASK_FIELDS = ', '.join(Task.__slots__)
+
+
+class WorkQueue:
+    """任务队列（WAL模式），每个进程或线程使用各自的实例"""
+
+    def __init__(self, path=QUEUE_PATH, visibility_timeout=VISIBILITY_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # 事务由BEGIN IMMEDIATE显式开始，租用任务时先取得写锁，多个worker不会租到同一个任务
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def _transaction(self):
+        return _Transaction(self.conn)
+
+    def create_run(self, run_at, config, urls):
+        """创建一次运行并为每个数据源生成一个任务，config为可序列化为JSON的运行配置，返回运行编号"""
+        now = time.time()
+        with self._transaction():
+            run_id = self.conn.execute(
+                "INSERT INTO runs (run_at, created_at, config) VALUES (?, ?, ?)",
+                (run_at, now, json.dumps(config, ensure_ascii=False))).lastrowid
+            self.conn.executemany(
+                "INSERT INTO tasks (run_id, position, url, page_num, state, available_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, position, url, page_num, TASK_PENDING, now) for position, url, page_num in urls])
+        return run_id
+
+    def run(self, run_id=None):
+        """返回运行的(运行编号, 参考时间, 配置, 合并时间)，未指定时为最近创建的运行，不存在时返回None"""
+        if run_id is None:
+            row = self.conn.execute(
+                "SELECT run_id, run_at, config, merged_at FROM runs ORDER BY run_id DESC LIMIT 1").fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT run_id, run_at, config, merged_at FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return (row[0], row[1], json.loads(row[2]), row[3]) if row else None
+
+    def lease(self, owner, run_id=None):
+        """
+        租用一个可执行的任务（等待中且已到重试时间，或租约已过期），未指定run_id时从尚未合并的运行中按创建顺序租用
+        没有可租用的任务时返回None；租约过期且尝试次数已达上限的任务标记为失败
+        """
+        now = time.time()
+        run_filter = "run_id = ?" if run_id is not None else "run_id IN (SELECT run_id FROM runs WHERE merged_at IS NULL)"
+        run_args = (run_id,) if run_id is not None else ()
+        with self._transaction():
+            self.conn.execute(
+                f"UPDATE tasks SET state = ?, error = ?, lease_owner = NULL "
+                f"WHERE state = ? AND lease_expires < ? AND attempts >= ? AND {run_filter}",
+                (TASK_FAILED, "租约过期", TASK_LEASED, now, self.max_attempts, *run_args))
+            row = self.conn.execute(
+                f"SELECT task_id FROM tasks WHERE {run_filter} AND "
+                f"((state = ? AND available_at <= ?) OR (state = ? AND lease_expires < ?)) "
+                f"ORDER BY run_id, position, page_num LIMIT 1",
+                (*run_args, TASK_PENDING, now, TASK_LEASED, now)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE tasks SET state = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ? "
+                "WHERE task_id = ?",
+                (TASK_LEASED, owner, now + self.visibility_timeout, row[0]))
+            return self._task(row[0])
+
+    def extend(self, task):
+        """续租，返回租约是否仍由该任务的持有者持有"""
+        cursor = self.conn.execute(
+            "UPDATE tasks SET lease_expires = ? WHERE task_id = ? AND state = ? AND lease_owner = ? AND attempts = ?",
+            (time.time() + self.visibility_timeout, task.task_id, TASK_LEASED, task.lease_owner, task.attempts))
+        return cursor.rowcount == 1
+
+    def complete(self, task, records, meta=None, follow_up=()):
+        """
+        提交任务的结果：records为记录元组的可迭代对象，meta为可序列化为JSON的任务信息，
+        follow_up为需要追加的(地址, 页码)，如API的其余分页。租约已被他人持有时丢弃结果并返回False
+        """
+        with self._transaction():
+            if not self._holds(task):
+                return False
+            self.conn.execute("DELETE FROM task_records WHERE task_id = ?", (task.task_id,))
+            self.conn.executemany(
+                "INSERT INTO task_records (task_id, seq, record) VALUES (?, ?, ?)",
+                ((task.task_id, seq, json.dumps(values, ensure_ascii=False)) for seq, values in enumerate(records)))
+            self.conn.execute(
+                "UPDATE tasks SET state = ?, lease_owner = NULL, lease_expires = NULL, error = NULL, meta = ? "
+                "WHERE task_id = ?",
+                (TASK_DONE, json.dumps(meta or {}, ensure_ascii=False), task.task_id))
+            now = time.time()
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tasks (run_id, position, url, page_num, state, available_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(task.run_id, task.position, url, page_num, TASK_PENDING, now) for url, page_num in follow_up])
+        return True
+
+    def fail(self, task, error, meta=None):
+        """任务失败：尝试次数未达上限时延迟后重试，否则标记为失败。返回任务的新状态，租约已被他人持有时返回None"""
+        with self._transaction():
+            if not self._holds(task):
+                return None
+            state = TASK_FAILED if task.attempts >= self.max_attempts else TASK_PENDING
+            self.conn.execute(
+                "UPDATE tasks SET state = ?, available_at = ?, lease_owner = NULL, lease_expires = NULL, "
+                "error = ?, meta = ? WHERE task_id = ?",
+                (state, time.time() + RETRY_DELAY * task.attempts, error,
+                 json.dumps(meta or {}, ensure_ascii=False), task.task_id))
+        return state
+
+    def _holds(self, task):
+        row = self.conn.execute(
+            "SELECT 1 FROM tasks WHERE task_id = ? AND state = ? AND lease_owner = ? AND attempts = ?",
+            (task.task_id, TASK_LEASED, task.lease_owner, task.attempts)).fetchone()
+        return row is not None
+
+    def _task(self, task_id):
+        row = self.conn.execute(f"SELECT {TASK_FIELDS} FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return Task(*row)
+
+    def tasks(self, run_id):
+        """按数据源位置和页码顺序返回运行的所有任务"""
+        cursor = self.conn.execute(
+            f"SELECT {TASK_FIELDS} FROM tasks WHERE run_id = ? ORDER BY position, page_num", (run_id,))
+        return [Task(*row) for row in cursor]
+
+    def unfinished(self, run_id=None):
+        """尚未完成或失败的任务数，未指定run_id时统计所有尚未合并的运行"""
+        run_filter = "run_id = ?" if run_id is not None else "run_id IN (SELECT run_id FROM runs WHERE merged_at IS NULL)"
+        run_args = (run_id,) if run_id is not None else ()
+        return self.conn.execute(
+            f"SELECT COUNT(*) FROM tasks WHERE state IN (?, ?) AND {run_filter}",
+            (TASK_PENDING, TASK_LEASED, *run_args)).fetchone()[0]
+
+    def records(self, task_id):
+        """按写入顺序逐条读出任务的记录元组"""
+        cursor = self.conn.execute("SELECT record FROM task_records WHERE task_id = ? ORDER BY seq", (task_id,))
+        for row in cursor:
+            yield json.loads(row[0])
+
+    def mark_merged(self, run_id):
+        """标记运行已合并，并删除其任务的记录"""
+        with self._transaction():
+            self.conn.execute("UPDATE runs SET merged_at = ? WHERE run_id = ?", (time.time(), run_id))
+            self.conn.execute(
+                "DELETE FROM task_records WHERE task_id IN (SELECT task_id FROM tasks WHERE run_id = ?)", (run_id,))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LeaseHeartbeat:
+    """处理任务期间在后台线程中定期续租，后台线程使用独立的数据库连接"""
+
+    def __init__(self, queue, task):
+        self.path = queue.path
+        self.visibility_timeout = queue.visibility_timeout
+        self.task = task
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        queue = WorkQueue(self.path, self.visibility_timeout)
+        try:
+            while not self._stop.wait(self.visibility_timeout / 3):
+                if not queue.extend(self.task):
+                    self.lost = True
+                    return
+        finally:
+            queue.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE开始的事务，正常结束时提交，出错时回滚"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")